@@ -1,13 +1,18 @@
 # Trying to make the app work
 
+from __future__ import annotations
+
 import customtkinter as tk
 import os
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.spatial import Delaunay
 from PIL import Image, ImageDraw
-from typing import Callable, Optional
+from typing import TYPE_CHECKING, Callable, Optional
 from enum import Enum
+from delaunay_art import STARRY_NIGHT
+
+# scipy is only imported once something is triangulated, so the window opens quicker
+if TYPE_CHECKING:
+    from scipy.spatial import Delaunay
 
 # Enumerated class for our distribution options
 class Distribution(Enum):
@@ -35,34 +40,41 @@ def draw_triangulation(img: Image, triangulation: Delaunay, points: np.ndarray)
     triangulation_art = Image.new("RGB", (img_width, img_height), "white")
     draw = ImageDraw.Draw(triangulation_art)
 
-    for simplex in triangulation.simplices:
+    # Colors for every triangle in one batch
+    colors = triangle_colors(img, triangulation, points)
 
-        # Gather the vertices of the triangle
-        triangle = []
-        for i in simplex:
-            triangle.append(tuple(points[i]))
+    # Flatten each triangle to [x1, y1, x2, y2, x3, y3] for the polygon calls
+    triangles = points[triangulation.simplices].reshape(-1, 6).tolist()
+    for triangle, color in zip(triangles, colors.tolist()):
+        # Fill the triangle with the average color
+        draw.polygon(triangle, tuple(color))
 
-             # Calculate the average color of the triangles
-        red_channel = []
-        green_channel = []
-        blue_channel = []
-        for pixel in triangle:
-            red_channel.append(img.getpixel(pixel)[0])
-            green_channel.append(img.getpixel(pixel)[1])
-            blue_channel.append(img.getpixel(pixel)[2])
+    return triangulation_art
 
-        # Calculate the mean for each channel
-        avg_red = int(np.mean(red_channel))
-        avg_green = int(np.mean(green_channel))
-        avg_blue = int(np.mean(blue_channel))
+def triangle_colors(img: Image, triangulation: Delaunay, points: np.ndarray) -> np.ndarray:
+    """
+    Calculates the color of every triangle as the average of its three corner pixels.
 
-        # Create a tuple with the average values for each channel
-        avg_color = (avg_red, avg_green, avg_blue)
+    PARAMETERS:
+    img (image) - the original image
+    triangulation (Delanay object) - the object that contains the information of the triangulation
+    points (array) - 2D array with the generated coordinates for the triangulation
 
-        # Fill the triangle with the average color
-        draw.polygon(triangle, avg_color)
+    OUTPUT:
+    colors (array) - (number of triangles, 3) uint8 array with the RGB color of each triangle
+    """
+    # Decode the image once instead of calling getpixel for every vertex
+    pixels = np.asarray(img.convert("RGB"))
+    img_height, img_width = pixels.shape[:2]
 
-    return triangulation_art
+    # Pixel coordinates of every corner, shape (triangles, 3, 2). getpixel truncates, so do the same
+    corners = points[triangulation.simplices].astype(np.intp)
+    x = np.clip(corners[..., 0], 0, img_width - 1)
+    y = np.clip(corners[..., 1], 0, img_height - 1)
+
+    # Gather the corner colors, shape (triangles, 3, 3), and average them per triangle
+    corner_colors = pixels[y, x].astype(np.uint16)
+    return (corner_colors.sum(axis=1) // 3).astype(np.uint8)
 
 def generate_points(img, num_points, distribution):
     """
@@ -138,6 +150,8 @@ def del_triangulation(points):
     OUTPUT:
     del_triangulation - the triangulation
     """
+    from scipy.spatial import Delaunay
+
     # Perform Delaunay triangulation
     del_triangulation = Delaunay(points)
     return del_triangulation
@@ -152,12 +166,14 @@ def FSdel_triangulation(points):
     OUTPUT:
     FSdel_triangulation - the triangulation
     """
+    from scipy.spatial import Delaunay
+
     # Perform Delanay triangulation with furthest point turned on
     FSdel_triangulation = Delaunay(points, furthest_site=True)
     print(points)
     return FSdel_triangulation
 
-def GUI_event_handler(image: Image, num_points_entry: tk.CTkEntry, distribution_dropdown: tk.CTkOptionMenu) -> Callable[[], None]:
+def GUI_event_handler(image: Image, num_points_entry: tk.CTkEntry, distribution_dropdown: tk.CTkOptionMenu, art_img: tk.CTkImage) -> Callable[[], None]:
     """
     Handles the generate button function.
     """
@@ -182,41 +198,47 @@ def GUI_event_handler(image: Image, num_points_entry: tk.CTkEntry, distribution_
 
 
 # GUI
-# Creating the top-level frames
-main = tk.CTk()
-img_frame = tk.CTkFrame(main)
-options_frame= tk.CTkFrame(main)
-bottom_frame = tk.CTkFrame(main)
-
-# Packing them
-img_frame.pack(side="top")
-options_frame.pack(side="top")
-bottom_frame.pack(side="top")
-
-# Getting the image to create the app
-image = Image.open("starry_night.jpg")
-img_width, img_height = image.size
-
-# Creating the widgets and packing
-orig_img = tk.CTkImage(light_image= image, dark_image= image, size=(300, 300))
-art_img = tk.CTkImage(light_image= image, dark_image= image, size=(300, 300))
-art_img_lab = tk.CTkLabel(img_frame, text="", image=art_img)
-orig_img_lab = tk.CTkLabel(img_frame, text="", image=orig_img)
-
-orig_img_lab.pack(side="left")
-art_img_lab.pack(side="left")
-
-# More widgets and packing
-num_points_lab = tk.CTkLabel(options_frame, text="Number of Points:")
-num_points_entry = tk.CTkEntry(options_frame)
-distribution_dropdown = tk.CTkOptionMenu(options_frame, values= ["Random", "Uniform", "Centered"])
-num_points_entry.insert(0, 1000) # Putting a default value so that app starts with a triangulated image
-generate_button = tk.CTkButton(bottom_frame, text="Generate Image", command=GUI_event_handler(image, num_points_entry, distribution_dropdown))
-
-num_points_lab.pack(side="left")
-num_points_entry.pack(side="left")
-distribution_dropdown.pack(side="left")
-generate_button.pack(side="top")
-
-# Starting the mainloop
-main.mainloop()
\ No newline at end of file
+def main() -> None:
+    """Builds the window and runs the app
+    """
+    # Creating the top-level frames
+    window = tk.CTk()
+    img_frame = tk.CTkFrame(window)
+    options_frame= tk.CTkFrame(window)
+    bottom_frame = tk.CTkFrame(window)
+
+    # Packing them
+    img_frame.pack(side="top")
+    options_frame.pack(side="top")
+    bottom_frame.pack(side="top")
+
+    # Getting the image to create the app
+    image = Image.open(STARRY_NIGHT)
+    img_width, img_height = image.size
+
+    # Creating the widgets and packing
+    orig_img = tk.CTkImage(light_image= image, dark_image= image, size=(300, 300))
+    art_img = tk.CTkImage(light_image= image, dark_image= image, size=(300, 300))
+    art_img_lab = tk.CTkLabel(img_frame, text="", image=art_img)
+    orig_img_lab = tk.CTkLabel(img_frame, text="", image=orig_img)
+
+    orig_img_lab.pack(side="left")
+    art_img_lab.pack(side="left")
+
+    # More widgets and packing
+    num_points_lab = tk.CTkLabel(options_frame, text="Number of Points:")
+    num_points_entry = tk.CTkEntry(options_frame)
+    distribution_dropdown = tk.CTkOptionMenu(options_frame, values= ["Random", "Uniform", "Centered"])
+    num_points_entry.insert(0, 1000) # Putting a default value so that app starts with a triangulated image
+    generate_button = tk.CTkButton(bottom_frame, text="Generate Image", command=GUI_event_handler(image, num_points_entry, distribution_dropdown, art_img))
+
+    num_points_lab.pack(side="left")
+    num_points_entry.pack(side="left")
+    distribution_dropdown.pack(side="left")
+    generate_button.pack(side="top")
+
+    # Starting the mainloop
+    window.mainloop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+# Delaunay triangulation art. The Model and its render stages import without the GUI (customtkinter), scipy or
+# matplotlib, see gui.py for the app
+
+from importlib import resources
+
+# The image the GUI starts with and the benchmarks draw, installed with the package as package data
+STARRY_NIGHT = str(resources.files(__name__).joinpath("starry_night.jpg"))
+
+from .model import Distribution, Coloring, LRUCache, Model, Mesh
+from .instrumentation import Instrument
+
+__all__ = ["Distribution", "Coloring", "LRUCache", "Model", "Mesh", "Instrument", "STARRY_NIGHT"]
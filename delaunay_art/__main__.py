@@ -0,0 +1,5 @@
+# python -m delaunay_art opens the GUI
+
+from .gui import main
+
+main()
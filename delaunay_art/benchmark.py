@@ -0,0 +1,282 @@
+# Benchmarks for the generate -> triangulate -> draw pipeline of the Model
+
+import argparse
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import numpy as np
+# The Model imports scipy when it first triangulates, load it here so the first case isn't charged for that
+import scipy.spatial
+import PIL
+from PIL import Image, ImageDraw
+from typing import Optional
+
+from . import STARRY_NIGHT
+from .model import Model, Distribution, Coloring
+
+STAGES = ("generate", "triangulate", "draw")
+# Extra stages timed with --palette: saving the RGB art as a PNG, and drawing and saving the paletted art
+PALETTE_STAGES = ("save", "palette_draw", "palette_save")
+
+# Sweeps that are reasonable to run, the full one takes a long time
+PRESETS = {
+    "quick": {"sizes": ["512", "1024"], "points": [1000, 10000]},
+    "full": {"sizes": ["512", "1024", "2048", "4096", "7680x4320"], "points": [1000, 10000, 100000, 1000000]},
+}
+
+# Adaptive refinement inserts points one at a time, more than this takes far too long per run
+ADAPTIVE_MAX_POINTS = 1000
+
+def parse_size(text: str) -> tuple:
+    """Reads "512" as 512x512 and "7680x4320" as (7680, 4320)
+    """
+    width, _, height = text.lower().partition("x")
+    return int(width), int(height or width)
+
+def synthetic_image(size: tuple, seed: int = 0) -> Image:
+    """
+    Draws a reproducible test image: a gradient with random circles and triangles on top, so there are smooth areas
+    and hard edges like in a photo.
+
+    PARAMETERS:
+    size (tuple) - (width, height) of the image
+    seed (integer) - the same seed gives the same image
+
+    OUTPUT:
+    image (image) - RGB image of the given size
+    """
+    width, height = size
+    rng = np.random.RandomState(seed)
+    xs = np.linspace(0, 1, width, dtype=np.float32)
+    ys = np.linspace(0, 1, height, dtype=np.float32)[:, None]
+    gradient = np.empty((height, width, 3), dtype=np.uint8)
+    gradient[..., 0] = 255 * xs
+    gradient[..., 1] = 255 * ys
+    gradient[..., 2] = 255 * (1 - xs * ys)
+    img = Image.fromarray(gradient)
+
+    draw = ImageDraw.Draw(img)
+    scale = min(width, height)
+    for _ in range(40):
+        x, y = rng.rand(2) * (width, height)
+        radius = (0.02 + 0.1 * rng.rand()) * scale
+        color = tuple(int(c) for c in rng.randint(0, 256, 3))
+        if rng.rand() < 0.5:
+            draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=color)
+        else:
+            corners = (rng.rand(3, 2) - 0.5) * 2 * radius + (x, y)
+            draw.polygon([tuple(corner) for corner in corners.tolist()], fill=color)
+    return img
+
+def load_image(kind: str, size: tuple, images: dict) -> Image:
+    """Makes (or reuses) the benchmark image of a kind and size, "synthetic" or "starry" for starry_night.jpg
+    """
+    key = (kind, size)
+    if key not in images:
+        if kind == "starry":
+            with Image.open(STARRY_NIGHT) as source:
+                images[key] = source.convert("RGB").resize(size, Image.LANCZOS)
+        else:
+            images[key] = synthetic_image(size)
+    return images[key]
+
+def png_size(art: Image) -> tuple:
+    """Saves an image as a PNG in memory, returns (seconds, bytes)
+    """
+    buffer = io.BytesIO()
+    start = time.perf_counter()
+    art.save(buffer, "PNG")
+    return time.perf_counter() - start, buffer.tell()
+
+def time_case(model: Model, img: Image, num_points: int, distribution: Distribution, coloring: Coloring, seed: int, repeat: int, workers: int = 1, palette: Optional[int] = None) -> dict:
+    """
+    Times every stage of one case. Each stage is run repeat times with the same seed, so every run does the same work.
+
+    PARAMETERS:
+    model (Model) - the model to benchmark
+    img (image) - the image to draw
+    num_points (integer) - the number of points
+    distribution (Distribution) - how the points are placed
+    coloring (Coloring) - how the triangles are colored
+    seed (integer) - seed for the point generation
+    repeat (integer) - how many times each stage is timed
+    workers (integer) - processes drawing the triangles
+    palette (integer) - also time saving the art as a PNG against drawing and saving it with this many colors
+
+    OUTPUT:
+    timings (dict) - min and median seconds of every stage, plus the triangle count (and PNG sizes with palette)
+    """
+    times = {stage: [] for stage in STAGES + (PALETTE_STAGES if palette else ())}
+    for _ in range(repeat):
+        # Collect garbage from the previous run so it isn't charged to this one
+        gc.collect()
+        start = time.perf_counter()
+        points = model.generate_points(img, num_points, distribution, seed)
+        times["generate"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        triangulation = model.del_triangulation(points)
+        times["triangulate"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        art = model.draw_triangulation(img, triangulation, points, coloring, workers=workers)
+        times["draw"].append(time.perf_counter() - start)
+
+        if palette:
+            seconds, png_bytes = png_size(art)
+            times["save"].append(seconds)
+            start = time.perf_counter()
+            art = model.draw_triangulation(img, triangulation, points, coloring, workers=workers, palette=palette)
+            times["palette_draw"].append(time.perf_counter() - start)
+            seconds, palette_bytes = png_size(art)
+            times["palette_save"].append(seconds)
+
+    result = {stage: {"min": min(values), "median": statistics.median(values)} for stage, values in times.items()}
+    result["triangles"] = len(triangulation.simplices)
+    if palette:
+        result["png_bytes"] = png_bytes
+        result["palette_png_bytes"] = palette_bytes
+    return result
+
+def case_key(case: dict) -> tuple:
+    """What identifies a case when comparing against a baseline
+    """
+    return (case["image"], case["width"], case["height"], case["points"], case["distribution"], case["coloring"])
+
+def cases(args: argparse.Namespace):
+    """Yields (image kind, size, points, distribution) for every combination the options ask for
+    """
+    for size in map(parse_size, args.sizes):
+        for kind in args.images:
+            for num_points in args.points:
+                # More points than a quarter of the pixels doesn't make sense for art
+                if num_points > size[0] * size[1] // 4:
+                    continue
+                for name in args.distributions:
+                    distribution = Distribution[name.upper()]
+                    if distribution == Distribution.ADAPTIVE and num_points > ADAPTIVE_MAX_POINTS:
+                        continue
+                    yield kind, size, num_points, distribution
+
+def run(args: argparse.Namespace) -> dict:
+    """
+    Runs every case and collects the results with a description of the machine.
+
+    PARAMETERS:
+    args (Namespace) - the command line options
+
+    OUTPUT:
+    results (dict) - "machine", "settings" and a list of "results", ready to be saved as JSON
+    """
+    model = Model()
+    coloring = Coloring[args.coloring.upper()]
+    images = {}
+    results = []
+    for kind, size, num_points, distribution in cases(args):
+        img = load_image(kind, size, images)
+        timings = time_case(model, img, num_points, distribution, coloring, args.seed, args.repeat, args.workers, args.palette)
+        case = {"image": kind, "width": size[0], "height": size[1], "points": num_points,
+                "distribution": distribution.name, "coloring": coloring.name, **timings}
+        results.append(case)
+        if not args.quiet:
+            print(f"{kind:9} {size[0]:>5}x{size[1]:<5} {num_points:>8} {distribution.name:8} "
+                  + "  ".join(f"{stage} {case[stage]['min']:.4f}s" for stage in STAGES)
+                  + f"  ({case['triangles']} triangles)")
+            if args.palette:
+                rgb = case["draw"]["min"] + case["save"]["min"]
+                paletted = case["palette_draw"]["min"] + case["palette_save"]["min"]
+                print(f"{'':40}RGB draw + PNG {rgb:.4f}s {case['png_bytes'] / 1024:9.1f} KB   "
+                      f"{args.palette} colors {paletted:.4f}s {case['palette_png_bytes'] / 1024:9.1f} KB "
+                      f"({case['png_bytes'] / case['palette_png_bytes']:.1f}x smaller)")
+
+    return {"machine": {"python": platform.python_version(), "numpy": np.__version__, "scipy": scipy.__version__,
+                        "pillow": PIL.__version__, "platform": platform.platform(), "processor": platform.processor(),
+                        "cpus": os.cpu_count()},
+            "settings": {"seed": args.seed, "repeat": args.repeat, "coloring": coloring.name, "workers": args.workers,
+                         "palette": args.palette},
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "results": results}
+
+def compare(results: dict, baseline: dict, threshold: float, min_time: float) -> list:
+    """
+    Finds the stages that got slower than the baseline. Compares the min times, which are the least noisy.
+
+    PARAMETERS:
+    results (dict) - output of run
+    baseline (dict) - an earlier output of run
+    threshold (float) - how much slower counts as a regression, 0.2 is 20% slower
+    min_time (float) - stages that got slower by fewer seconds than this are ignored, they are mostly noise
+
+    OUTPUT:
+    regressions (list) - (case, stage, baseline seconds, new seconds) for every regression
+    """
+    previous = {case_key(case): case for case in baseline["results"]}
+    regressions = []
+    for case in results["results"]:
+        old = previous.get(case_key(case))
+        if old is None:
+            continue
+        for stage in STAGES:
+            before, after = old[stage]["min"], case[stage]["min"]
+            if after > before * (1 + threshold) and after - before > min_time:
+                regressions.append((case, stage, before, after))
+    return regressions
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    """
+    Reads the command line options for the benchmarks.
+    """
+    parser = argparse.ArgumentParser(description="Time generate_points, del_triangulation and draw_triangulation separately.")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="quick", help="default sizes and point counts")
+    parser.add_argument("--sizes", nargs="+", help="image sizes like 512 or 7680x4320")
+    parser.add_argument("-n", "--points", type=int, nargs="+", help="point counts to sweep")
+    parser.add_argument("-d", "--distributions", nargs="+", default=[d.name.lower() for d in Distribution],
+                        choices=[d.name.lower() for d in Distribution], help="distributions to sweep (default: all)")
+    parser.add_argument("--images", nargs="+", default=["synthetic", "starry"], choices=["synthetic", "starry"],
+                        help="generated test image and/or starry_night.jpg")
+    parser.add_argument("-c", "--coloring", default="vertex", choices=[c.name.lower() for c in Coloring])
+    parser.add_argument("-s", "--seed", type=int, default=0, help="seed for the point generation")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="processes drawing the triangles (0 for all cores)")
+    parser.add_argument("-p", "--palette", type=int, default=None,
+                        help="also compare drawing and saving a PNG against a paletted one with this many colors")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="times every stage is timed, the fastest counts")
+    parser.add_argument("-o", "--output", help="save the results to this JSON file")
+    parser.add_argument("-b", "--baseline", help="JSON results to compare against")
+    parser.add_argument("-t", "--threshold", type=float, default=0.25, help="slowdown that counts as a regression (0.25 = 25%%)")
+    parser.add_argument("--min-time", type=float, default=0.02, help="ignore slowdowns smaller than this many seconds")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print the regressions")
+    args = parser.parse_args(argv)
+    args.sizes = args.sizes or PRESETS[args.preset]["sizes"]
+    args.points = args.points or PRESETS[args.preset]["points"]
+    args.workers = args.workers or None
+    return args
+
+def main(argv: Optional[list] = None) -> int:
+    """Runs the benchmarks, returns 1 if anything regressed so it can fail a CI job. argv defaults to sys.argv[1:]
+    """
+    args = parse_args(argv)
+    results = run(args)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=1)
+        print(f"Saved {len(results['results'])} results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold, args.min_time)
+        for case, stage, before, after in regressions:
+            print(f"REGRESSION {case['image']} {case['width']}x{case['height']} {case['points']} points "
+                  f"{case['distribution']} {stage}: {before:.4f}s -> {after:.4f}s ({after / before - 1:+.0%})")
+        print(f"{len(regressions)} regressions against {args.baseline} (threshold {args.threshold:.0%})")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,378 @@
+# Batch rendering: every combination of images, point counts, distributions and seeds rendered across a process
+# pool without any prompts. Installed as delaunay-art-batch, and the version 3 script runs it when given arguments
+
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import queue
+import sys
+import time
+import numpy as np
+from typing import Optional
+from collections import Counter, deque
+from functools import partial
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from .model import Distribution, Model
+from .instrumentation import Instrument
+from . import metrics
+from . import saving
+from . import vector
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp")
+STAGES = ("load", "generate", "triangulate", "color", "quantize", "draw", "save", "metrics")
+
+def find_images(sources: list) -> list:
+    """
+    Expands directories and glob patterns into a sorted list of image paths.
+
+    PARAMETERS:
+    sources (list) - directories, glob patterns or image paths
+
+    OUTPUT:
+    paths (list) - the image files that were found, without duplicates
+    """
+    paths = set()
+    for source in sources:
+        if os.path.isdir(source):
+            matches = [os.path.join(source, name) for name in os.listdir(source)]
+        else:
+            matches = glob.glob(source)
+        for path in matches:
+            if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS):
+                paths.add(os.path.abspath(path))
+    return sorted(paths)
+
+def source_names(images: list) -> dict:
+    """
+    Names the renders of every image after its file name. Images with the same name in different directories get
+    their path below the directory they share instead, so a/x.png and b/x.png get a/x_... and b/x_... rather than
+    overwriting each other. Images that still share a name, like x.jpg and x.png, keep their extension in it.
+
+    PARAMETERS:
+    images (list) - absolute image paths, like find_images returns
+
+    OUTPUT:
+    names (dict) - the name of every image, without extension, with the subdirectories it is in if it needs them
+    """
+    stems = {path: os.path.splitext(os.path.basename(path))[0] for path in images}
+    groups = {}
+    for path, stem in stems.items():
+        groups.setdefault(stem, []).append(path)
+
+    names = {}
+    for stem, paths in groups.items():
+        if len(paths) == 1:
+            names[paths[0]] = stem
+            continue
+        root = os.path.commonpath([os.path.dirname(path) for path in paths])
+        for path in paths:
+            names[path] = os.path.splitext(os.path.relpath(path, root))[0]
+
+    counts = Counter(names.values())
+    for path, name in names.items():
+        if counts[name] > 1:
+            names[path] = f"{name}_{os.path.splitext(path)[1][1:]}"
+    return names
+
+def output_name(name: str, num_points: int, distribution: int, seed: int, output_format: str = "png") -> str:
+    """
+    Builds the deterministic file name for one render of a sweep, relative to the output directory.
+
+    PARAMETERS:
+    name (string) - the name of the image, see source_names
+    num_points, distribution, seed (integers) - the parameters of the render
+    output_format (string) - the extension of the output
+    """
+    return f"{name}_{num_points}p_d{distribution}_s{seed}.{output_format}"
+
+# Every pool worker encodes its raster images on its own saver threads and reports the files on a queue of the main
+# process, see start_encoder
+encoder = None
+encoder_options = {}
+reports = None
+
+def start_encoder(threads: int, options: dict, report_queue: multiprocessing.Queue) -> None:
+    """
+    Sets up the saver of a pool worker, runs once in every worker process.
+
+    PARAMETERS:
+    threads (integer) - threads encoding images in this worker
+    options (dict) - sizes, compress_level, optimize and quality, see saving.save_image
+    report_queue (Queue) - where the worker reports the files of every image, see report_files
+    """
+    global encoder, encoder_options, reports
+    encoder = saving.Saver(workers=threads)
+    encoder_options = options
+    reports = report_queue
+
+def report_files(output: str, encoding: Future) -> None:
+    """
+    Puts (output path, files written or None, error or None) on the queue of the main process once the saver of the
+    worker is done with an image.
+    """
+    error = encoding.exception()
+    if error is None:
+        reports.put((output, encoding.result(), None))
+    else:
+        reports.put((output, None, f"{type(error).__name__}: {error}"))
+
+def render_job(job: tuple) -> dict:
+    """
+    Renders one (image, points, distribution, seed) combination. Runs inside the process pool. Vector formats are
+    saved right away, raster images are handed to the saver threads of the worker (see start_encoder), so the worker
+    can start on its next job while they are encoded. Their files are reported on the queue instead.
+
+    PARAMETERS:
+    job (tuple) - (image path, output path, profile path or None, number of points, distribution, seed, compute metrics,
+                   palette colors or None, measure peak memory)
+
+    OUTPUT:
+    result (dict) - the output path, the seconds spent in every stage, the full record of every stage and whether the
+                    files will be reported on the queue ("encoding")
+    """
+    image_path, output_path, profile_path, num_points, distribution, seed, with_metrics, palette, trace_memory = job
+    result = {"output": output_path}
+
+    # A Model per job, so a worker doesn't keep the images of earlier jobs in its caches
+    model = Model()
+    with Instrument(trace_memory=trace_memory, profile_path=profile_path) as run:
+        with run.stage("load"):
+            img = model.open_image(image_path)
+
+        # Seeded per job so results don't depend on which worker picked the job up
+        with run.stage("generate", num_points):
+            points = model.generate_points(img, num_points, Distribution(distribution), seed)
+
+        with run.stage("triangulate", len(points)) as record:
+            triangulation = model.del_triangulation(points)
+            record["triangles"] = len(triangulation.simplices)
+
+        # Vector formats are written straight from the mesh, the art is only drawn if it is saved or measured
+        is_vector = result["output"].endswith(vector.EXTENSIONS)
+        if with_metrics or not is_vector:
+            # Records its own color and draw stages, and quantize with a palette
+            art = model.draw_triangulation(img, triangulation, points, instrument=run, palette=palette)
+
+        if is_vector:
+            # Records its own color, quantize and save stages, vector art always gets a palette (255 colors without -p)
+            if palette is None:
+                model.export_vector(img, triangulation, points, result["output"], instrument=run)
+            else:
+                model.export_vector(img, triangulation, points, result["output"], instrument=run, palette=palette)
+        else:
+            # Waits here if the saver threads fell behind, so images don't pile up in memory
+            encoding = encoder.submit(art, result["output"], **encoder_options)
+            encoding.add_done_callback(partial(report_files, output_path))
+            result["encoding"] = True
+
+        if with_metrics:
+            with run.stage("metrics"):
+                result["metrics"] = metrics.report(img, art)
+
+    result["times"] = {record["stage"]: record["seconds"] for record in run.stages}
+    result["run"] = run.to_dict(image=image_path, output=result["output"], points=num_points,
+                                distribution=distribution, seed=seed)
+    return result
+
+def failed(job: tuple, error: BaseException) -> dict:
+    """
+    The result of a job that raised an error, so the batch can report it and carry on.
+    """
+    image_path, output_path, _, num_points, distribution, seed = job[:6]
+    message = f"{type(error).__name__}: {error}"
+    run = {"image": image_path, "output": output_path, "points": num_points, "distribution": distribution,
+           "seed": seed, "date": time.strftime("%Y-%m-%d %H:%M:%S"), "error": message, "stages": []}
+    return {"output": output_path, "error": message, "run": run}
+
+def rendered(pool: ProcessPoolExecutor, jobs: list, limit: int):
+    """
+    Yields the result of every job in order, with at most limit of them rendering or waiting to be picked up.
+    map would submit every job at once and pile up finished images in memory whenever saving falls behind.
+    A job that raised an error, like an unreadable image, gives the result of failed instead.
+    """
+    pending = deque()
+    for job in jobs:
+        pending.append((job, pool.submit(render_job, job)))
+        if len(pending) >= limit:
+            yield outcome(*pending.popleft())
+    while pending:
+        yield outcome(*pending.popleft())
+
+def outcome(job: tuple, future) -> dict:
+    """
+    Waits for a job and returns its result, or the result of failed if it raised an error.
+    """
+    try:
+        return future.result()
+    except Exception as error:
+        return failed(job, error)
+
+def batch(args: argparse.Namespace) -> None:
+    """
+    Renders every image for every combination of the parameter sweep across a process pool. Every worker encodes its
+    raster images on its own threads while it renders the next ones.
+    """
+    images = find_images(args.inputs)
+    if not images:
+        sys.exit("No images found in: " + ", ".join(args.inputs))
+
+    names = source_names(images)
+    jobs = []
+    for image in images:
+        for num_points in args.points:
+            for distribution in args.distributions:
+                for seed in args.seeds:
+                    name = output_name(names[image], num_points, distribution, seed, args.format)
+                    output_path = os.path.join(args.output, name)
+                    if args.skip_existing and os.path.exists(output_path):
+                        continue
+                    profile_path = os.path.join(args.profile, os.path.splitext(name)[0] + ".pstats") if args.profile else None
+                    jobs.append((image, output_path, profile_path, num_points, distribution, seed, args.metrics,
+                                 args.palette, args.memory))
+    # Images in subdirectories get the same subdirectories in the output
+    for job in jobs:
+        os.makedirs(os.path.dirname(job[1]), exist_ok=True)
+        if job[2]:
+            os.makedirs(os.path.dirname(job[2]), exist_ok=True)
+
+    totals = dict.fromkeys(STAGES, 0.0)
+    peaks = dict.fromkeys(STAGES, 0.0)
+    rates = {stage: [] for stage in STAGES}
+    # How many renders ran every stage, vector outputs are only drawn for metrics and rasters only quantized with -p
+    counts = dict.fromkeys(STAGES, 0)
+    quality = {"mse": 0.0, "psnr": 0.0, "ssim": 0.0}
+    written = {"files": 0, "bytes": 0}
+    options = saving.options_from_args(args)
+    failures = []
+    done = 0
+
+    def finish(result: dict, files: Optional[list] = None, error: Optional[str] = None) -> None:
+        # Adds a render to the summary once its files are written. A failed render is logged and the batch goes on
+        nonlocal done
+        done += 1
+        if error is not None:
+            result["error"] = result["run"]["error"] = error
+        elif files is not None:
+            record = {"stage": "save", "seconds": sum(file["seconds"] for file in files), "files": len(files),
+                      "bytes": sum(file["bytes"] for file in files)}
+            result["run"]["stages"].append(record)
+            written["files"] += record["files"]
+            written["bytes"] += record["bytes"]
+        if args.log:
+            with open(args.log, "a") as file:
+                file.write(json.dumps(result["run"]) + "\n")
+        if "error" in result:
+            failures.append(result)
+            print(f"[{done}/{len(jobs)}] FAILED {result['output']}: {result['error']}")
+            return
+        for record in result["run"]["stages"]:
+            totals[record["stage"]] += record["seconds"]
+            counts[record["stage"]] += 1
+            peaks[record["stage"]] = max(peaks[record["stage"]], record.get("peak_mb", 0.0))
+            if "points_per_sec" in record:
+                rates[record["stage"]].append(record["points_per_sec"])
+        for name, value in result.get("metrics", {}).items():
+            quality[name] += value
+        if not args.quiet:
+            print(f"[{done}/{len(jobs)}] {result['output']}")
+
+    # Renders whose files haven't been reported yet, and reports that came in before their render's result
+    encoding = {}
+    early = {}
+
+    def report(output: str, files: Optional[list], error: Optional[str]) -> None:
+        if output in encoding:
+            finish(encoding.pop(output), files, error)
+        else:
+            early[output] = (files, error)
+
+    start = time.perf_counter()
+    report_queue = multiprocessing.Queue()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=start_encoder,
+                             initargs=(args.encoders, options, report_queue)) as pool:
+        for result in rendered(pool, jobs, 2 * (args.workers or os.cpu_count() or 1)):
+            if not result.pop("encoding", False):
+                finish(result)
+            elif result["output"] in early:
+                finish(result, *early.pop(result["output"]))
+            else:
+                encoding[result["output"]] = result
+            while True:
+                try:
+                    report(*report_queue.get_nowait())
+                except queue.Empty:
+                    break
+        while encoding:
+            try:
+                report(*report_queue.get(timeout=1))
+            except queue.Empty:
+                # A worker that died while encoding never reports, and then the pool takes no more jobs
+                try:
+                    pool.submit(int)
+                except BrokenProcessPool as error:
+                    for output in list(encoding):
+                        finish(encoding.pop(output), error=f"{type(error).__name__}: {error}")
+    elapsed = time.perf_counter() - start
+
+    # Summary, the averages are over the renders that succeeded
+    rendered_count = len(jobs) - len(failures)
+    print(f"Rendered {rendered_count} images in {elapsed:.2f}s ({rendered_count / elapsed if elapsed else 0:.2f} images/sec)")
+    if failures:
+        print(f"  {len(failures)} of {len(jobs)} renders failed:")
+        for result in failures:
+            print(f"    {result['output']}: {result['error']}")
+    if written["files"]:
+        print(f"  wrote {written['files']} files, {saving.format_bytes(written['bytes'])}")
+    for stage in STAGES:
+        if not counts[stage]:
+            continue
+        average = totals[stage] / counts[stage]
+        line = f"  {stage:<12} total {totals[stage]:9.2f}s   avg {average * 1000:9.1f}ms"
+        if args.memory:
+            line += f"   peak {peaks[stage]:8.1f} MB"
+        if rates[stage]:
+            line += f"   {np.mean(rates[stage]):12,.0f} points/sec"
+        print(line)
+    if args.metrics and rendered_count:
+        print(f"  average MSE {quality['mse'] / rendered_count:.1f}, PSNR {quality['psnr'] / rendered_count:.2f} dB, SSIM {quality['ssim'] / rendered_count:.4f}")
+    if failures:
+        sys.exit(1)
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    """
+    Reads the command line options for batch rendering.
+    """
+    parser = argparse.ArgumentParser(description="Render Delaunay triangulation art for many images without any prompts.")
+    parser.add_argument("inputs", nargs="+", help="image files, directories or glob patterns")
+    parser.add_argument("-o", "--output", default="renders", help="directory for the rendered images")
+    parser.add_argument("-n", "--points", type=int, nargs="+", default=[1000], help="point counts to sweep")
+    parser.add_argument("-d", "--distributions", type=int, nargs="+", default=[0], choices=[d.value for d in Distribution],
+                        help="random (0), uniform (1), centered (2), edges (3), adaptive (4) or poisson disk (5)")
+    parser.add_argument("-s", "--seeds", type=int, nargs="+", default=[0], help="random seeds to sweep")
+    parser.add_argument("-f", "--format", default="png", choices=["png", "jpg", "webp", "svg", "svgz", "pdf"],
+                        help="output format, svg/svgz/pdf are vector images that print at any size")
+    parser.add_argument("-p", "--palette", type=int, default=None,
+                        help="cluster the triangle colors into this many colors (at most 255), PNGs are saved paletted and "
+                             "svg/svgz/pdf get this many colors instead of 255")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of processes (default: all cores)")
+    parser.add_argument("--encoders", type=int, default=1,
+                        help="threads encoding and writing raster images in every worker process (default: 1)")
+    saving.add_arguments(parser)
+    parser.add_argument("--skip-existing", action="store_true", help="don't re-render outputs that already exist")
+    parser.add_argument("-m", "--metrics", action="store_true", help="compare every render to its source (MSE, PSNR, SSIM)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print the summary")
+    parser.add_argument("--profile", metavar="DIR", help="write a cProfile .pstats file of every render to this directory")
+    parser.add_argument("--memory", action="store_true", help="measure the peak memory of every stage, makes rendering much slower")
+    parser.add_argument("--log", metavar="FILE", help="append the stage timings of every render to this JSONL file")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[list] = None) -> None:
+    """Renders a batch from the command line, argv defaults to sys.argv[1:]
+    """
+    batch(parse_args(argv))
+
+if __name__ == "__main__":
+    main()
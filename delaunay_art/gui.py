@@ -0,0 +1,706 @@
+# The GUI of the app, an MVC around the Model. Only this module needs customtkinter
+
+from __future__ import annotations
+
+import customtkinter as tk
+import os
+import importlib
+import time
+import numpy as np
+from concurrent.futures import Future, ThreadPoolExecutor
+from PIL import Image
+from typing import TYPE_CHECKING, Callable, Optional, Union
+from . import STARRY_NIGHT
+from . import meshfile
+from . import saving
+from . import tiled
+from . import vector
+from .instrumentation import Instrument
+from .model import Coloring, Distribution, Mesh, Model
+
+if TYPE_CHECKING:
+    from scipy.spatial import Delaunay
+
+class View(tk.CTkFrame):
+    """View class for the app. Handles the widgets
+    """
+
+    # Instance vars (need to be able to access these in the controller)
+    orig_img: tk.CTkImage
+    art_img: tk.CTkImage
+    art_label: tk.CTkLabel
+    num_points_entry: tk.CTkEntry
+    distribution_dropdown: tk.CTkOptionMenu
+    coloring_dropdown: tk.CTkOptionMenu
+    seed_entry: tk.CTkEntry
+    shuffle_button: tk.CTkButton
+    generate_button: tk.CTkButton
+    optimize_button: tk.CTkButton
+    change_image_button: tk.CTkButton
+    save_button: tk.CTkButton
+    quality_dropdown: tk.CTkOptionMenu
+    thumbnail_check: tk.CTkCheckBox
+    load_button: tk.CTkButton
+    status_label: tk.CTkLabel
+    busy_bar: tk.CTkProgressBar
+    stats_label: tk.CTkLabel
+
+    model: Model
+
+    # Size the images are shown at, the interactive art is rendered to fit in it
+    DISPLAY_SIZE = (300, 300)
+    
+    def __init__(self, parent: tk.CTkFrame, model: Model) -> None:
+        super().__init__(parent)
+        self.model = model
+        self.create_layout()
+
+    # Methods:
+    def create_layout(self) -> None:
+        """Creaes the GUI layout
+        """
+        # First create the top level frams
+        img_frame = tk.CTkFrame(self)
+        options_frame= tk.CTkFrame(self)
+        bottom_frame = tk.CTkFrame(self)
+        stats_frame = tk.CTkFrame(self)
+
+        # Packing them
+        img_frame.pack(side="top")
+        options_frame.pack(side="top")
+        bottom_frame.pack(side="top")
+        stats_frame.pack(side="top", fill="x")
+
+        # Getting the image to create the app, it is installed with the package. Only a copy scaled to the display is
+        # decoded, the art is generated from it
+        if os.path.exists(STARRY_NIGHT):
+            image = self.model.open_image(STARRY_NIGHT, self.DISPLAY_SIZE)
+        else:
+            image = Image.new("RGB", self.DISPLAY_SIZE, "white")
+
+        # Creating the widgets and packing
+        orig_img = tk.CTkImage(light_image= image, dark_image= image, size=self.DISPLAY_SIZE)
+        art_img = tk.CTkImage(light_image= image, dark_image= image, size=self.DISPLAY_SIZE)
+        art_img_lab = tk.CTkLabel(img_frame, text="", image=art_img)
+        orig_img_lab = tk.CTkLabel(img_frame, text="", image=orig_img)
+
+        orig_img_lab.pack(side="left")
+        art_img_lab.pack(side="left")
+
+        # More widgets and packing
+        # Options frame
+        num_points_lab = tk.CTkLabel(options_frame, text="Number of Points:")
+        num_points_entry = tk.CTkEntry(options_frame)
+        distribution_dropdown = tk.CTkOptionMenu(options_frame, values= ["Random", "Uniform", "Centered", "Edges", "Adaptive", "Poisson Disk"])
+        coloring_dropdown = tk.CTkOptionMenu(options_frame, values= ["Corner Average", "Mean", "Median", "Dominant", "Gradient"])
+        seed_lab = tk.CTkLabel(options_frame, text="Seed:")
+        seed_entry = tk.CTkEntry(options_frame, width=80)
+        change_image_button = tk.CTkButton(options_frame, text="Change Image")
+        num_points_entry.insert(0, 1000) # Putting a default value so that app starts with a triangulated image
+        seed_entry.insert(0, np.random.randint(1_000_000)) # Same seed gives the same points, so results can be cached
+
+        # Bottom Frame
+        generate_button = tk.CTkButton(bottom_frame, text="Generate Image")
+        shuffle_button = tk.CTkButton(bottom_frame, text="New Seed")
+        optimize_button = tk.CTkButton(bottom_frame, text="Optimize")
+        save_button = tk.CTkButton(bottom_frame, text="Save")
+        quality_dropdown = tk.CTkOptionMenu(bottom_frame, values= ["Balanced", "Smallest", "Fastest"], width=110)
+        thumbnail_check = tk.CTkCheckBox(bottom_frame, text="+ Thumbnail")
+        load_button = tk.CTkButton(bottom_frame, text="Load Mesh")
+        busy_bar = tk.CTkProgressBar(bottom_frame, mode="indeterminate", width=120)
+        status_label = tk.CTkLabel(bottom_frame, text="")
+
+        # Status bar with the timings of the last run
+        stats_label = tk.CTkLabel(stats_frame, text="", anchor="w", font=("", 11))
+
+        num_points_lab.pack(side="left")
+        num_points_entry.pack(side="left")
+        distribution_dropdown.pack(side="left")
+        coloring_dropdown.pack(side="left")
+        seed_lab.pack(side="left")
+        seed_entry.pack(side="left")
+        change_image_button.pack(side="left")
+
+        generate_button.pack(side="left")
+        shuffle_button.pack(side="left")
+        optimize_button.pack(side="left")
+        save_button.pack(side="left")
+        quality_dropdown.pack(side="left")
+        thumbnail_check.pack(side="left")
+        load_button.pack(side="left")
+        status_label.pack(side="left")
+
+        stats_label.pack(side="left", fill="x", padx=5)
+
+        # Assigning the instance vars
+        self.orig_img = orig_img
+        self.art_img = art_img
+        self.art_label = art_img_lab
+        self.num_points_entry = num_points_entry
+        self.distribution_dropdown = distribution_dropdown
+        self.coloring_dropdown = coloring_dropdown
+        self.seed_entry = seed_entry
+        self.shuffle_button = shuffle_button
+        self.optimize_button = optimize_button
+        self.generate_button = generate_button
+        self.change_image_button = change_image_button
+        self.save_button= save_button
+        self.quality_dropdown = quality_dropdown
+        self.thumbnail_check = thumbnail_check
+        self.load_button = load_button
+        self.status_label = status_label
+        self.busy_bar = busy_bar
+        self.stats_label = stats_label
+
+    def set_busy(self, busy: bool, message: str = "") -> None:
+        """Shows or hides the busy indicator next to the buttons
+        """
+        if busy:
+            self.busy_bar.pack(side="left", before=self.status_label)
+            self.busy_bar.start()
+        else:
+            self.busy_bar.stop()
+            self.busy_bar.pack_forget()
+        self.show_status(message)
+
+    def show_status(self, message: str) -> None:
+        """Sets the text next to the buttons
+        """
+        self.status_label.configure(text=message)
+
+    def show_stats(self, message: str) -> None:
+        """Sets the text of the status bar under the buttons
+        """
+        self.stats_label.configure(text=message)
+
+class Controller:
+    """Controller that connects the View and Model. Handles operations between the two
+    """
+    # Instance Vars
+    model: Model
+    view: View
+    executor: ThreadPoolExecutor
+    # Encodes and writes saved images, so the worker is free for the next generation while a big PNG compresses
+    saver: saving.Saver
+    job: Optional[Future]
+    generation: int
+    # Last generated mesh: (triangulation, points, preview size, coloring, generation parameters), redrawn at full
+    # size on save
+    mesh: Optional[tuple]
+    # Mesh opened from a file, shown and saved instead of a generated one
+    loaded: Optional[meshfile.MeshFile]
+    # File of the image on display, decoded at full size when saving. None for the blank start image
+    source: Optional[str]
+    # Editable version of the mesh, created on the first click on the art
+    live: Optional[Mesh]
+    preview: Optional[Image.Image]
+    # Latest progress message from the worker thread, shown while polling
+    progress: str
+    # Latest progress message from the saver thread
+    save_progress: str
+    # Opt-in: every run is profiled to profile_path (the latest run overwrites it) and appended to the JSONL log_path,
+    # trace_memory adds the peak memory of every stage
+    profile_path: Optional[str]
+    log_path: Optional[str]
+    trace_memory: bool
+
+    # How often (ms) the Tk loop checks on a running generation
+    POLL_INTERVAL = 30
+    # Saves with more pixels than this are drawn tile by tile instead of on one full-size canvas, see meshfile.is_tiled
+    TILED_PIXELS = meshfile.TILED_PIXELS
+    # Saves with more pixels than this are drawn on all cores, smaller ones finish before a process pool starts up
+    PARALLEL_PIXELS = 8_000_000
+    # Formats offered by the save dialog, the vector ones don't depend on the resolution
+    SAVE_TYPES = [("PNG image", "*.png"), ("JPEG image", "*.jpg"), ("WebP image", "*.webp"), ("SVG vector image", "*.svg"),
+                  ("Compressed SVG", "*.svgz"), ("PDF document", "*.pdf"), ("Delaunay mesh", "*" + meshfile.EXTENSION),
+                  ("All files", "*.*")]
+    # Encoder settings of the save quality options, see saving.save_options
+    SAVE_QUALITY = {"Balanced": {"compress_level": 6, "quality": 90},
+                    "Smallest": {"compress_level": 9, "optimize": True, "quality": 80},
+                    "Fastest": {"compress_level": 1, "quality": 95}}
+    # Longest side of the thumbnail saved next to the art
+    THUMBNAIL_SIZE = 512
+
+    def __init__(self, model: Model, view: View, profile_path: Optional[str] = None, log_path: Optional[str] = None, trace_memory: bool = False) -> None:
+        self.model = model
+        self.view = view
+        self.profile_path = profile_path
+        self.log_path = log_path
+        self.trace_memory = trace_memory
+        # One background worker, newer clicks replace older jobs instead of queueing behind them
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.saver = saving.Saver()
+        self.job = None
+        self.generation = 0
+        self.mesh = None
+        self.loaded = None
+        self.source = STARRY_NIGHT if os.path.exists(STARRY_NIGHT) else None
+        self.live = None
+        self.preview = None
+        self.progress = ""
+        self.save_progress = ""
+        self.set_generate()
+        self.set_change_image()
+        self.set_save()
+        self.set_load()
+        self.set_edit()
+        # The window shows up without scipy, load it in the background so the first generate doesn't wait for it
+        self.executor.submit(importlib.import_module, "scipy.spatial")
+
+    # Methods
+    def set_change_image(self) -> None:
+        """Sets the command of the change_image button
+        """
+        self.view.change_image_button.configure(command= self.browseFiles)
+
+    def set_save(self) -> None:
+        """Sets the command of the save button
+        """
+        self.view.save_button.configure(command = self.save_file)
+
+    def set_load(self) -> None:
+        """Sets the command of the load button
+        """
+        self.view.load_button.configure(command = self.load_file)
+
+    def set_edit(self) -> None:
+        """Left click on the art adds a point there, right click removes the closest point
+        """
+        self.view.art_label.bind("<Button-1>", self.add_point)
+        self.view.art_label.bind("<Button-3>", self.remove_point)
+
+    def click_position(self, event) -> Optional[tuple]:
+        """Converts a click on the art into pixel coordinates of the preview
+        """
+        if self.mesh is None:
+            return None
+        width, height = self.mesh[2]
+        return (event.x * width / max(event.widget.winfo_width(), 1),
+                event.y * height / max(event.widget.winfo_height(), 1))
+
+    def add_point(self, event) -> None:
+        """Adds a point where the art was clicked
+        """
+        position = self.click_position(event)
+        if position is not None:
+            self.edit_mesh(lambda mesh: mesh.add_point(position), "Points can only be added inside the art, not on another point")
+
+    def remove_point(self, event) -> None:
+        """Removes the point closest to where the art was clicked
+        """
+        position = self.click_position(event)
+        if position is not None:
+            self.edit_mesh(lambda mesh: mesh.remove_point(mesh.nearest_point(position)), "Points on the border can't be changed")
+
+    def edit_mesh(self, edit: Callable[[Mesh], np.ndarray], failed: str) -> None:
+        """Applies an edit to the live mesh and shows the result, or the failed message if nothing changed. Only the
+        changed triangles are redrawn
+        """
+        if self.live is None:
+            triang, points, preview_size, col, params = self.mesh
+            self.live = self.model.start_editing(self.preview, triang, points, self.view.art_img._light_image, col)
+
+        if len(edit(self.live)) == 0:
+            self.view.set_busy(False, failed)
+            return
+
+        self.mesh = (self.live, self.live.points) + self.mesh[2:]
+        self.view.art_img.configure(light_image = self.live.art, dark_image = self.live.art)
+        self.view.set_busy(False, f"{len(self.live.points)} points")
+
+    def save_file(self) -> None:
+        """Save the current triangulation art, redrawn from the same mesh at the full size of the source image
+        """
+        filename = tk.filedialog.asksaveasfilename(defaultextension=".png", filetypes=self.SAVE_TYPES)
+        if not filename:
+            return
+        if self.mesh is None and self.loaded is None:
+            self.view.set_busy(False, "Generate an image before saving")
+            return
+
+        # Tiled images are streamed out without ever being a whole image in memory, which JPEG and WebP can't be
+        size = self.loaded.size if self.mesh is None else self.source_size()
+        if meshfile.is_tiled(filename, size) and not filename.lower().endswith(tiled.EXTENSIONS):
+            self.view.set_busy(False, f"Images over {self.TILED_PIXELS // 1_000_000} megapixels save as PNG, TIFF or NPY")
+            return
+
+        options = dict(self.SAVE_QUALITY[self.view.quality_dropdown.get()])
+        if self.view.thumbnail_check.get():
+            options["sizes"] = [None, self.THUMBNAIL_SIZE]
+
+        self.view.set_busy(True, "Rendering full size...")
+        if self.mesh is None:
+            job = self.executor.submit(self.export_loaded, self.loaded, filename, options)
+        else:
+            job = self.executor.submit(self.create_full_art, self.source or self.view.orig_img._light_image, filename, *self.mesh, options)
+        self.view.after(self.POLL_INTERVAL, self.finish_save, job, filename)
+
+    def create_full_art(self, source: Union[str, Image.Image], filename: str, triang: Delaunay, points: np.ndarray, preview_size: tuple, col: Coloring, params: dict, options: Optional[dict] = None) -> tuple:
+        """Draws the mesh at the size of the source image (a path, or the image itself) and saves it. Called on the worker thread.
+        Raster images are handed to the saver, so the future of their encoding is returned with the run. Other formats
+        are written here, with their thumbnails drawn from the mesh, and the list of files is returned instead
+        """
+        options = dict(options or {})
+        sizes = options.pop("sizes", None)
+        with self.instrument() as run:
+            if isinstance(source, str):
+                # Decoded once per save, and kept for the next save if it fits in the image cache
+                with run.stage("decode"):
+                    source = self.model.open_image(source)
+            image = source
+            if isinstance(triang, Mesh):
+                # An edited mesh is triangulated once more so the area colorings can locate pixels in it
+                with run.stage("triangulate", len(points)) as record:
+                    triang = self.model.del_triangulation(points)
+                    record["triangles"] = len(triang.simplices)
+            full_points = self.model.scale_points(points, preview_size, image.size)
+            if not filename.lower().endswith(vector.EXTENSIONS + (meshfile.EXTENSION,)) and not meshfile.is_tiled(filename, image.size):
+                workers = None if image.width * image.height > self.PARALLEL_PIXELS else 1
+                art = self.model.draw_triangulation(image, triang, full_points, col, run, workers)
+                # Encoding happens on the saver thread, the worker can start on the next generation
+                self.save_progress = ""
+                saved = self.saver.submit(art, filename, sizes, progress=self.report_save, **options)
+                self.log_run(run, "save", image.size, len(points), col)
+                return run, saved
+
+            start = time.perf_counter()
+            if filename.lower().endswith(vector.EXTENSIONS):
+                self.model.export_vector(image, triang, full_points, filename, col, instrument=run)
+            elif filename.lower().endswith(meshfile.EXTENSION):
+                self.model.save_mesh(image, triang, full_points, filename, col, params, run)
+            else:
+                # Drawing and saving happen together, tile by tile
+                compress_level = options.get("compress_level", saving.PNG_COMPRESS_LEVEL)
+                self.model.render_tiled(image, triang, full_points, filename, coloring=col, workers=None, instrument=run,
+                                        compress_level=compress_level)
+            saved = [saving.written(filename, image.size, time.perf_counter() - start)]
+            if any(sizes or []):
+                with run.stage("thumbnails", len(points)):
+                    mesh = meshfile.from_pixels(full_points, triang.simplices,
+                                                self.model.mesh_colors(image, triang, full_points, col), image.size)
+                    saved += meshfile.thumbnails(mesh, filename, sizes, **options)
+        self.log_run(run, "save", image.size, len(points), col)
+        return run, saved
+
+    def export_loaded(self, mesh: meshfile.MeshFile, filename: str, options: Optional[dict] = None) -> tuple:
+        """Saves a loaded mesh at the size it was made at, with its stored colors. Called on the worker thread.
+        Returns the run and the list of files written, like create_full_art
+        """
+        with self.instrument() as run:
+            with run.stage("save", len(mesh.points)) as record:
+                workers = None if mesh.size[0] * mesh.size[1] > self.PARALLEL_PIXELS else 1
+                saved = meshfile.export(mesh, filename, workers=workers, **(options or {}))
+                record["triangles"] = len(mesh)
+        self.log_run(run, "save", mesh.size, len(mesh.points), Coloring[mesh.params.get("coloring", "VERTEX")])
+        return run, saved
+
+    def report_save(self, done: int, total: int, result: dict) -> None:
+        """Progress of the saver, called on its thread. finish_encode shows it
+        """
+        self.save_progress = f"Encoded {done}/{total} files, {os.path.basename(result['path'])} ({saving.format_bytes(result['bytes'])})"
+
+    def load_file(self) -> None:
+        """Opens a saved mesh and shows it. Saving afterwards redraws the loaded mesh instead of a generated one
+        """
+        filename = tk.filedialog.askopenfilename(filetypes=[("Delaunay mesh", "*" + meshfile.EXTENSION), ("All files", "*.*")])
+        if not filename:
+            return
+
+        # Whatever is generating now would replace the loaded mesh
+        if self.job is not None:
+            self.job.cancel()
+        self.generation += 1
+
+        self.view.set_busy(True, "Loading mesh...")
+        job = self.executor.submit(self.create_loaded_art, filename)
+        self.view.after(self.POLL_INTERVAL, self.finish_load, job, self.generation, filename)
+
+    def create_loaded_art(self, filename: str) -> tuple:
+        """Opens a mesh file and draws it to fit the display. Called on the worker thread.
+        """
+        with self.instrument() as run:
+            with run.stage("load"):
+                mesh = self.model.load_mesh(filename)
+            preview = Image.new("RGB", mesh.size)
+            preview.thumbnail(self.view.DISPLAY_SIZE)
+            art = self.model.render_mesh(mesh, preview.size, instrument=run)
+        return art, mesh, run
+
+    def finish_load(self, job: Future, generation: int, filename: str) -> None:
+        """Shows a loaded mesh. Runs on the Tk thread through after().
+        """
+        if not job.done():
+            self.view.after(self.POLL_INTERVAL, self.finish_load, job, generation, filename)
+            return
+        if generation != self.generation:
+            return
+        if job.exception() is not None:
+            self.view.set_busy(False, f"Loading failed: {job.exception()}")
+            return
+
+        art, self.loaded, run = job.result()
+        self.mesh = None
+        self.live = None
+        self.view.art_img.configure(light_image = art, dark_image = art)
+        self.view.set_busy(False, f"Loaded {os.path.basename(filename)}, {len(self.loaded)} triangles")
+        self.view.show_stats(run.summary())
+
+    def finish_save(self, job: Future, filename: str) -> None:
+        """Reports the result of a save. Runs on the Tk thread through after().
+        """
+        if not job.done():
+            self.view.after(self.POLL_INTERVAL, self.finish_save, job, filename)
+        elif job.exception() is not None:
+            self.view.set_busy(False, f"Saving failed: {job.exception()}")
+        else:
+            run, saved = job.result()
+            self.view.show_stats(run.summary())
+            if isinstance(saved, Future):
+                self.view.show_status(f"Encoding {os.path.basename(filename)}...")
+                self.view.after(self.POLL_INTERVAL, self.finish_encode, saved, filename)
+            else:
+                self.view.set_busy(False, self.saved_message(saved))
+
+    def finish_encode(self, encoding: Future, filename: str) -> None:
+        """Reports the files written by the saver. Runs on the Tk thread through after().
+        """
+        if not encoding.done():
+            if self.save_progress:
+                self.view.show_status(self.save_progress)
+            self.view.after(self.POLL_INTERVAL, self.finish_encode, encoding, filename)
+            return
+        if encoding.exception() is not None:
+            message = f"Saving failed: {encoding.exception()}"
+        else:
+            message = self.saved_message(encoding.result())
+        # A generation started meanwhile keeps the busy indicator until it is done
+        if self.job is None:
+            self.view.set_busy(False, message)
+        else:
+            self.view.show_status(message)
+
+    def saved_message(self, results: list) -> str:
+        """The files of a save and their sizes, for the status text
+        """
+        return "Saved " + ", ".join(f"{os.path.basename(result['path'])} ({saving.format_bytes(result['bytes'])})"
+                                    for result in results)
+
+    def source_size(self) -> tuple:
+        """(width, height) of the image on display at full size, a save of the generated art is drawn at it. Only the
+        header of the file is read
+        """
+        if self.source is None:
+            return self.view.orig_img._light_image.size
+        with Image.open(self.source) as source:
+            return source.size
+
+    def browseFiles(self) -> None:
+        """Function for allowing the user to select an image. Sets the GUI image as the one selected
+        """
+        filename = tk.filedialog.askopenfilename()
+        if not filename:
+            return
+
+        # A generation still running for the old image would put its mesh on top of the new one
+        if self.job is not None:
+            self.job.cancel()
+            self.job = None
+        self.generation += 1
+
+        # Decoded on the worker, a big PNG or TIFF takes a while. Only a copy scaled to the display is decoded (JPEGs
+        # at a reduced scale), the art is generated from it and the full size is decoded when saving
+        self.view.set_busy(True, "Opening image...")
+        job = self.executor.submit(self.model.open_image, filename, self.view.DISPLAY_SIZE)
+        self.view.after(self.POLL_INTERVAL, self.finish_open, job, self.generation, filename)
+
+    def finish_open(self, job: Future, generation: int, filename: str) -> None:
+        """Shows a newly opened image. Runs on the Tk thread through after().
+        """
+        if not job.done():
+            self.view.after(self.POLL_INTERVAL, self.finish_open, job, generation, filename)
+            return
+        if generation != self.generation:
+            return
+        if job.exception() is not None:
+            self.view.set_busy(False, f"Opening failed: {job.exception()}")
+            return
+
+        new_image = job.result()
+        self.view.orig_img.configure(light_image = new_image, dark_image = new_image)
+        self.source = filename
+        self.mesh = None
+        self.loaded = None
+        self.live = None
+        self.view.set_busy(False, f"Opened {os.path.basename(filename)}")
+
+    def set_generate(self) -> None:
+        """Sets the command and bind of the generate button
+        """
+        self.view.generate_button.configure(command= self.update_art)
+        self.view.shuffle_button.configure(command= self.new_seed)
+        self.view.optimize_button.configure(command= self.optimize)
+
+    def new_seed(self) -> None:
+        """Picks a new random seed and generates with it
+        """
+        self.view.seed_entry.delete(0, "end")
+        self.view.seed_entry.insert(0, np.random.randint(1_000_000))
+        self.update_art()
+
+    def update_art(self) -> None:
+        """Starts generating the art in the background. The GUI is updated once it finishes.
+        """
+        # Gather the inputs from GUI
+        try:
+            num_points = int(self.view.num_points_entry.get())
+        except ValueError:
+            self.view.set_busy(False, "Number of points must be a whole number")
+            return
+        # An empty seed means fresh random points every time (and no caching)
+        seed = self.view.seed_entry.get().strip()
+        try:
+            seed = int(seed) if seed else None
+        except ValueError:
+            self.view.set_busy(False, "Seed must be a whole number")
+            return
+        dis = self.view.distribution_dropdown.get()
+        if dis == "Random":
+            dis = Distribution.RANDOM
+        elif dis == "Uniform":
+            dis = Distribution.UNIFORM
+        elif dis == "Edges":
+            dis = Distribution.EDGES
+        elif dis == "Adaptive":
+            dis = Distribution.ADAPTIVE
+        elif dis == "Poisson Disk":
+            dis = Distribution.POISSON_DISK
+        else:
+            dis = Distribution.CENTERED
+
+        col = self.view.coloring_dropdown.get()
+        if col == "Mean":
+            col = Coloring.MEAN
+        elif col == "Median":
+            col = Coloring.MEDIAN
+        elif col == "Dominant":
+            col = Coloring.DOMINANT
+        elif col == "Gradient":
+            col = Coloring.GOURAUD
+        else:
+            col = Coloring.VERTEX
+
+        # A job that hasn't started yet is stale now, a running one gets its result discarded
+        if self.job is not None:
+            self.job.cancel()
+        self.generation += 1
+
+        self.view.set_busy(True, "Generating...")
+        # The image on display is already scaled to it and decoded by the Model, every generation reuses its pixels
+        preview = self.view.orig_img._light_image
+        self.job = self.executor.submit(self.create_art, preview, num_points, dis, col, seed)
+        self.view.after(self.POLL_INTERVAL, self.finish_art, self.job, self.generation)
+
+    def create_art(self, image: Image, num_points: int, dis: Distribution, col: Coloring, seed: Optional[int]) -> tuple:
+        """Runs the Model stages. Called on the worker thread, so it must not touch any widgets.
+        """
+        with self.instrument() as run:
+            art, triang, points = self.model.create_art(image, num_points, dis, col, seed, run)
+        self.log_run(run, "generate", image.size, len(points), col, distribution=dis.name, seed=seed)
+        params = {"distribution": dis.name, "seed": seed, "num_points": num_points}
+        return art, (triang, points, image.size, col, params), image, run
+
+    def instrument(self) -> Instrument:
+        """A new Instrument for a run, with the profiling and memory tracing that were opted into
+        """
+        return Instrument(trace_memory=self.trace_memory, profile_path=self.profile_path)
+
+    def log_run(self, run: Instrument, action: str, size: tuple, num_points: int, col: Coloring, **info) -> None:
+        """Appends a run to the JSONL log, if there is one
+        """
+        if self.log_path:
+            run.append_log(self.log_path, action=action, width=size[0], height=size[1], points=num_points,
+                           coloring=col.name, **info)
+
+    def optimize(self) -> None:
+        """Starts moving the points of the current mesh to better fit the image, in the background
+        """
+        if self.mesh is None:
+            self.view.set_busy(False, "Generate an image before optimizing")
+            return
+
+        if self.job is not None:
+            self.job.cancel()
+        self.generation += 1
+
+        self.progress = ""
+        self.view.set_busy(True, "Optimizing...")
+        self.job = self.executor.submit(self.create_optimized_art, self.preview, self.mesh[1], self.mesh[3], self.mesh[4])
+        self.view.after(self.POLL_INTERVAL, self.finish_art, self.job, self.generation)
+
+    def create_optimized_art(self, image: Image, points: np.ndarray, col: Coloring, params: dict) -> tuple:
+        """Runs the optimization and draws the result. Called on the worker thread.
+        """
+        generation = self.generation
+
+        def report(iteration: int, energy: float, step: float) -> None:
+            if generation == self.generation:
+                self.progress = f"Optimizing: iteration {iteration}, error {energy:.1f}"
+
+        with self.instrument() as run:
+            with run.stage("optimize", len(points)) as record:
+                points, triang, history = self.model.optimize_points(image, points, callback=report)
+                record["triangles"] = len(triang.simplices)
+                record["iterations"] = len(history)
+            art = self.model.draw_triangulation(image, triang, points, col, run)
+        self.log_run(run, "optimize", image.size, len(points), col)
+        return art, (triang, points, image.size, col, dict(params, optimized=True)), image, run
+
+    def finish_art(self, job: Future, generation: int) -> None:
+        """Puts the finished art in the GUI. Runs on the Tk thread through after().
+        """
+        if not job.done():
+            if self.progress and generation == self.generation:
+                self.view.show_status(self.progress)
+            self.view.after(self.POLL_INTERVAL, self.finish_art, job, generation)
+            return
+
+        # A newer click superseded this job
+        if generation != self.generation:
+            return
+
+        self.job = None
+        self.progress = ""
+        if job.exception() is not None:
+            self.view.set_busy(False, f"Generation failed: {job.exception()}")
+            return
+
+        # Update the GUI
+        art, self.mesh, self.preview, run = job.result()
+        self.loaded = None
+        self.live = None
+        self.view.art_img.configure(light_image = art, dark_image = art)
+        self.view.set_busy(False)
+        self.view.show_stats(run.summary())
+
+def main():
+    """Connects the MVC to run the app
+    """
+    # Create the window for the app
+    window = tk.CTk()
+    window.title("Delaunay Art Generator")
+
+    # Create the MVC
+    m = Model()
+    v = View(window, m)
+    # Set DELAUNAY_PROFILE to a .pstats path to profile every run, DELAUNAY_LOG to a .jsonl path to log them and
+    # DELAUNAY_MEMORY=1 to measure the peak memory of every stage (slow)
+    c = Controller(m, v, os.environ.get("DELAUNAY_PROFILE"), os.environ.get("DELAUNAY_LOG"),
+                   os.environ.get("DELAUNAY_MEMORY", "") not in ("", "0"))
+
+    # Pack the view
+    v.pack(side="top")
+
+    window.mainloop()
+    c.executor.shutdown(wait=False, cancel_futures=True)
+    # Files still being written are finished before the app exits
+    c.saver.close(wait=True)
@@ -0,0 +1,177 @@
+# Timing, memory and profiling of the stages of a run (generate, triangulate, color, draw...)
+
+import cProfile
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Optional
+
+class Instrument:
+    """Records the wall time, peak memory, triangle count and points/sec of every stage of a run. Can also profile the
+    whole run with cProfile and append the results to a JSONL log
+    """
+
+    # Instance vars
+    # One dict per stage in the order they ran: "stage", "seconds", "peak_mb", "points", "triangles", "points_per_sec"
+    stages: list
+    enabled: bool
+    trace_memory: bool
+    profile_path: Optional[str]
+
+    def __init__(self, enabled: bool = True, trace_memory: bool = False, profile_path: Optional[str] = None) -> None:
+        """
+        PARAMETERS:
+        enabled (bool) - False makes every stage a no-op, so code can always go through an Instrument
+        trace_memory (bool) - measure the peak memory of every stage with tracemalloc. Off by default, it makes the
+                              Python-heavy stages many times slower. It sees Python and NumPy allocations, not the
+                              buffers inside PIL images or Qhull
+        profile_path (string) - dump a cProfile (pstats) file of the run here, None to not profile
+        """
+        self.stages = []
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.profile_path = profile_path
+        self._profiler = None
+        self._start = None
+        self._seconds = None
+
+    # Methods:
+    def __enter__(self) -> "Instrument":
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        """Starts timing the whole run, and profiling it if there is a profile_path
+        """
+        self._start = time.perf_counter()
+        if self.enabled and self.profile_path:
+            # cProfile only sees the thread that enabled it, so start and stop on the thread doing the work
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def stop(self) -> None:
+        """Stops timing the run and writes the profile
+        """
+        if self._start is not None:
+            self._seconds = time.perf_counter() - self._start
+        if self._profiler is not None:
+            self._profiler.disable()
+            self._profiler.dump_stats(self.profile_path)
+            self._profiler = None
+
+    @contextmanager
+    def stage(self, name: str, points: Optional[int] = None):
+        """
+        Measures the code in a with block as one stage. Stages shouldn't be nested, the memory peak is shared.
+
+        PARAMETERS:
+        name (string) - name of the stage
+        points (integer) - how many points the stage handles, for points/sec
+
+        OUTPUT:
+        record (dict) - the record of the stage, set record["triangles"] inside the block to count triangles
+        """
+        record = {"stage": name}
+        if points is not None:
+            record["points"] = int(points)
+        if not self.enabled:
+            yield record
+            return
+
+        # Only stop tracing afterwards if this stage started it
+        tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.start()
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record["seconds"] = time.perf_counter() - start
+            if self.trace_memory:
+                record["peak_mb"] = (tracemalloc.get_traced_memory()[1] - baseline) / 2 ** 20
+            if tracing:
+                tracemalloc.stop()
+            if "points" in record and record["seconds"] > 0:
+                record["points_per_sec"] = record["points"] / record["seconds"]
+            self.stages.append(record)
+
+    def cached(self, name: str) -> None:
+        """Notes a stage that was skipped because its result was cached
+        """
+        if self.enabled:
+            self.stages.append({"stage": name, "seconds": 0.0, "cached": True})
+
+    def total_seconds(self) -> float:
+        """Wall time of the whole run, or the sum of the stages if the run wasn't started
+        """
+        if self._seconds is not None:
+            return self._seconds
+        return sum(record["seconds"] for record in self.stages)
+
+    def triangles(self) -> Optional[int]:
+        """Triangle count of the last stage that recorded one
+        """
+        counts = [record["triangles"] for record in self.stages if "triangles" in record]
+        return counts[-1] if counts else None
+
+    def summary(self) -> str:
+        """
+        One line with the time of every stage, for the status bar.
+        """
+        parts = [f"{record['stage']} cached" if record.get("cached") else f"{record['stage']} {record['seconds'] * 1000:.0f} ms"
+                 for record in self.stages]
+        text = ", ".join(parts) + f" | total {self.total_seconds() * 1000:.0f} ms"
+        if self.triangles() is not None:
+            text += f", {self.triangles()} triangles"
+        peaks = [record["peak_mb"] for record in self.stages if "peak_mb" in record]
+        if peaks:
+            text += f", peak {max(peaks):.1f} MB"
+        return text
+
+    def report(self) -> str:
+        """
+        Table with every recorded number, for printing from the scripts.
+        """
+        lines = [f"  {'stage':<12} {'time':>10} {'peak MB':>9} {'triangles':>10} {'points/sec':>12}"]
+        for record in self.stages:
+            if record.get("cached"):
+                lines.append(f"  {record['stage']:<12} {'cached':>10}")
+                continue
+            peak = f"{record['peak_mb']:.1f}" if "peak_mb" in record else "-"
+            triangles = record.get("triangles", "-")
+            rate = f"{record['points_per_sec']:,.0f}" if "points_per_sec" in record else "-"
+            lines.append(f"  {record['stage']:<12} {record['seconds'] * 1000:8.1f}ms {peak:>9} {triangles:>10} {rate:>12}")
+        lines.append(f"  {'total':<12} {self.total_seconds() * 1000:8.1f}ms")
+        return "\n".join(lines)
+
+    def to_dict(self, **info) -> dict:
+        """
+        Everything about the run as a JSON-friendly dict.
+
+        PARAMETERS:
+        info - extra fields describing the run, like the image or the number of points
+
+        OUTPUT:
+        run (dict) - the info plus "date", "total_seconds" and the list of "stages"
+        """
+        return {**info, "date": time.strftime("%Y-%m-%d %H:%M:%S"), "total_seconds": self.total_seconds(),
+                "stages": self.stages}
+
+    def append_log(self, path: str, **info) -> None:
+        """
+        Appends the run as one line of a JSONL file, so performance can be tracked over time.
+
+        PARAMETERS:
+        path (string) - the log file, created if it doesn't exist
+        info - extra fields describing the run
+        """
+        with open(path, "a") as file:
+            file.write(json.dumps(self.to_dict(**info), default=str) + "\n")
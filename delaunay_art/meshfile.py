@@ -0,0 +1,328 @@
+# Compact binary mesh files (.dmesh): the points, triangles and colors of a piece plus how it was generated, so it
+# can be drawn again at any size without triangulating. The arrays are stored raw and aligned, so opening a file
+# memory-maps them instead of parsing anything
+
+import argparse
+import json
+import os
+import struct
+import time
+import numpy as np
+from PIL import Image
+from typing import Optional
+from . import saving
+from . import tiled
+from . import vector
+
+EXTENSION = ".dmesh"
+MAGIC = b"DLNYMESH"
+VERSION = 1
+
+# magic, version, width, height, reserved, number of points, number of triangles, length of the parameters
+HEADER = struct.Struct("<8s4I3Q")
+
+# Every array starts on a multiple of this, so the memory-mapped views are aligned
+ALIGNMENT = 64
+
+# Outputs with more pixels than this are drawn tile by tile straight into the file
+TILED_PIXELS = 64_000_000
+
+class MeshFile:
+    """A stored mesh. The arrays are read-only views of the file when it was memory-mapped
+    """
+
+    # Instance vars
+    # (number of points, 2) float32, (0, 0) is the top left corner point and (1, 1) the bottom right one
+    points: np.ndarray
+    # (number of triangles, 3) int32 indices into points
+    simplices: np.ndarray
+    # (number of triangles, 3) uint8 RGB color of every triangle
+    colors: np.ndarray
+    # (width, height) the mesh was made at
+    size: tuple
+    # How the mesh was generated: number of points, distribution, coloring, seed, ...
+    params: dict
+
+    def __init__(self, points: np.ndarray, simplices: np.ndarray, colors: np.ndarray, size: tuple, params: dict) -> None:
+        self.points = points
+        self.simplices = simplices
+        self.colors = colors
+        self.size = tuple(size)
+        self.params = params
+
+    def pixel_points(self, size: Optional[tuple] = None) -> np.ndarray:
+        """
+        The points in pixels of an output size, placed the way Model.scale_points places them.
+
+        PARAMETERS:
+        size (tuple) - (width, height) of the output, None for the size the mesh was made at
+
+        OUTPUT:
+        points (np.ndarray) - (number of points, 2) float64 array
+        """
+        size = np.array(self.size if size is None else size, dtype=float)
+        return 1 + self.points.astype(np.float64) * (size - 2)
+
+    def triangles(self, size: Optional[tuple] = None) -> np.ndarray:
+        """
+        Every triangle as [x1, y1, x2, y2, x3, y3] in pixels of an output size, what the tiled renderer draws.
+
+        PARAMETERS:
+        size (tuple) - (width, height) of the output, None for the size the mesh was made at
+
+        OUTPUT:
+        triangles (np.ndarray) - (number of triangles, 6) float64 array
+        """
+        return self.pixel_points(size)[self.simplices].reshape(-1, 6)
+
+    def __len__(self) -> int:
+        return len(self.simplices)
+
+def _aligned(offset: int) -> int:
+    """The first multiple of ALIGNMENT at or after offset
+    """
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+def _layout(num_points: int, num_triangles: int, params_length: int) -> tuple:
+    """Offsets of the points, simplices and colors, and the length of the whole file
+    """
+    points_start = _aligned(HEADER.size + params_length)
+    simplices_start = _aligned(points_start + num_points * 2 * 4)
+    colors_start = _aligned(simplices_start + num_triangles * 3 * 4)
+    return points_start, simplices_start, colors_start, colors_start + num_triangles * 3
+
+def from_pixels(points: np.ndarray, simplices: np.ndarray, colors: np.ndarray, size: tuple, params: Optional[dict] = None) -> MeshFile:
+    """
+    A mesh in memory, stored the way a file stores it.
+
+    PARAMETERS:
+    points (np.ndarray) - 2D array with the coordinates of the triangulation, in pixels of size
+    simplices (np.ndarray) - (number of triangles, 3) array of point indices
+    colors (np.ndarray) - (number of triangles, 3) uint8 array with the color of every triangle
+    size (tuple) - (width, height) the points are in
+    params (dict) - JSON-serializable generation parameters kept with the mesh
+
+    OUTPUT:
+    mesh (MeshFile) - the mesh
+    """
+    width, height = size
+    # Same mapping as Model.scale_points, the corner points end up on exactly 0 and 1
+    normalized = ((np.asarray(points, dtype=np.float64) - 1) / (np.array([width, height], dtype=float) - 2)).astype("<f4")
+    simplices = np.ascontiguousarray(simplices, dtype="<i4")
+    colors = np.ascontiguousarray(colors, dtype=np.uint8)
+    if len(colors) != len(simplices):
+        raise ValueError(f"Got {len(colors)} colors for {len(simplices)} triangles")
+    return MeshFile(normalized, simplices, colors, size, params or {})
+
+def save(path: str, points: np.ndarray, simplices: np.ndarray, colors: np.ndarray, size: tuple, params: Optional[dict] = None) -> None:
+    """
+    Writes a mesh file. A mesh has about twice as many triangles as points, so it takes about 19 bytes per triangle.
+
+    PARAMETERS:
+    path (string) - where to save the mesh, usually ending in .dmesh
+    points (np.ndarray) - 2D array with the coordinates of the triangulation, in pixels of size
+    simplices (np.ndarray) - (number of triangles, 3) array of point indices
+    colors (np.ndarray) - (number of triangles, 3) uint8 array with the color of every triangle
+    size (tuple) - (width, height) the points are in
+    params (dict) - JSON-serializable generation parameters kept with the mesh
+    """
+    mesh = from_pixels(points, simplices, colors, size, params)
+    text = json.dumps(mesh.params, sort_keys=True).encode("utf-8")
+    starts = _layout(len(mesh.points), len(mesh), len(text))
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, *mesh.size, 0, len(mesh.points), len(mesh), len(text)))
+        file.write(text)
+        for start, array in zip(starts, (mesh.points, mesh.simplices, mesh.colors)):
+            file.write(b"\0" * (start - file.tell()))
+            file.write(memoryview(array).cast("B"))
+
+def load(path: str, mmap: bool = True) -> MeshFile:
+    """
+    Opens a mesh file.
+
+    PARAMETERS:
+    path (string) - the mesh file
+    mmap (bool) - memory-map the arrays, nothing is read until they are used. False reads the whole file in
+
+    OUTPUT:
+    mesh (MeshFile) - the stored mesh
+    """
+    with open(path, "rb") as file:
+        header = file.read(HEADER.size)
+        if len(header) < HEADER.size or header[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a mesh file")
+        _, version, width, height, _, num_points, num_triangles, params_length = HEADER.unpack(header)
+        if version != VERSION:
+            raise ValueError(f"{path} is a version {version} mesh file, only version {VERSION} can be read")
+        params = json.loads(file.read(params_length).decode("utf-8"))
+
+    points_start, simplices_start, colors_start, length = _layout(num_points, num_triangles, params_length)
+    if os.path.getsize(path) < length:
+        raise ValueError(f"{path} is cut off, expected {length} bytes")
+
+    data = np.memmap(path, dtype=np.uint8, mode="r", shape=(length,)) if mmap else np.fromfile(path, np.uint8, length)
+    points = data[points_start:points_start + num_points * 8].view("<f4").reshape(-1, 2)
+    simplices = data[simplices_start:simplices_start + num_triangles * 12].view("<i4").reshape(-1, 3)
+    colors = data[colors_start:length].reshape(-1, 3)
+    return MeshFile(points, simplices, colors, (width, height), params)
+
+def output_size(mesh: MeshFile, width: Optional[int] = None, height: Optional[int] = None) -> tuple:
+    """
+    The size to draw a mesh at. Giving only a width or a height keeps the aspect ratio of the mesh.
+
+    PARAMETERS:
+    mesh (MeshFile) - the stored mesh
+    width (integer) - width of the output, None to follow the height
+    height (integer) - height of the output, None to follow the width
+
+    OUTPUT:
+    size (tuple) - (width, height)
+    """
+    mesh_width, mesh_height = mesh.size
+    if width is None and height is None:
+        return mesh.size
+    if width is None:
+        width = max(1, round(height * mesh_width / mesh_height))
+    if height is None:
+        height = max(1, round(width * mesh_height / mesh_width))
+    return width, height
+
+def render(mesh: MeshFile, size: Optional[tuple] = None, workers: Optional[int] = 1) -> Image:
+    """
+    Draws a stored mesh at any size. Every triangle keeps its stored color, a mesh saved with Gouraud shading is
+    drawn with flat triangles.
+
+    PARAMETERS:
+    mesh (MeshFile) - the stored mesh
+    size (tuple) - (width, height) of the output, None for the size the mesh was made at
+    workers (integer) - processes drawing at the same time, None for all cores
+
+    OUTPUT:
+    art (image) - the drawn image
+    """
+    size = mesh.size if size is None else tuple(size)
+    if workers != 1:
+        return tiled.draw(mesh.triangles(size), mesh.colors, size, workers)
+    # One tile as big as the image is a plain full-size draw
+    width, height = size
+    return Image.fromarray(tiled.draw_tile((height, width), (0, 0, width, height), mesh.triangles(size), mesh.colors))
+
+def is_tiled(path: str, size: tuple) -> bool:
+    """
+    Whether export draws a raster tile by tile instead of on one canvas, which only .png, .tif/.tiff and .npy can be
+    saved from. Vector images and mesh files never are.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in vector.EXTENSIONS or extension == EXTENSION:
+        return False
+    return size[0] * size[1] > TILED_PIXELS or extension == ".npy"
+
+def thumbnails(mesh: MeshFile, path: str, sizes: list, **options) -> list:
+    """
+    Draws small copies of a mesh for an output that isn't encoded by saving.save_image, like a tiled PNG or an SVG.
+    They are drawn from the triangles at their own size, nothing big is shrunk. Formats PIL can't encode small
+    copies in (.npy, vector images, mesh files) get PNG ones.
+
+    PARAMETERS:
+    mesh (MeshFile) - the mesh
+    path (string) - the output they go with, they are saved next to it (see saving.sized_path)
+    sizes (list) - longest side of every copy, None entries are skipped
+    options - compress_level, optimize and quality, see saving.save_options
+
+    OUTPUT:
+    results (list) - what saving.save_image reports for every copy
+    """
+    stem, extension = os.path.splitext(path)
+    if extension.lower() not in (".png", ".jpg", ".jpeg", ".webp", ".tif", ".tiff"):
+        extension = ".png"
+    results = []
+    for longest in sizes:
+        if longest is None:
+            continue
+        size = saving.fit(mesh.size, longest)
+        results += saving.save_image(render(mesh, size), saving.sized_path(stem + extension, size), **options)
+    return results
+
+def export(mesh: MeshFile, path: str, size: Optional[tuple] = None, workers: Optional[int] = 1, sizes: Optional[list] = None, palette: Optional[int] = 255, **options) -> list:
+    """
+    Saves a stored mesh as an image in the format of path: vector (.svg, .svgz, .pdf), another mesh file, or a raster
+    image. Rasters bigger than TILED_PIXELS are drawn tile by tile, which needs .png, .tif/.tiff or .npy, any other
+    format raises a ValueError before anything is drawn.
+
+    PARAMETERS:
+    mesh (MeshFile) - the stored mesh
+    path (string) - where to save
+    size (tuple) - (width, height) of the output, None for the size the mesh was made at
+    workers (integer) - processes drawing at the same time, None for all cores
+    sizes (list) - what to save, see saving.save_image. The small copies of vector images and mesh files are PNGs
+    palette (integer) - the most colors in a vector image, like Model.export_vector. None keeps the stored colors
+    options - compress_level, optimize and quality of the rasters, see saving.save_options. Tiled rasters only use
+              compress_level
+
+    OUTPUT:
+    results (list) - a dict per file written, see saving.save_image
+    """
+    size = mesh.size if size is None else tuple(size)
+    extension = os.path.splitext(path)[1].lower()
+    tile = is_tiled(path, size)
+    if tile and extension not in tiled.EXTENSIONS:
+        raise ValueError(f"Images over {TILED_PIXELS // 1_000_000} megapixels are drawn tile by tile and saved as "
+                         f".png, .tif, .tiff or .npy, not {extension or 'no extension'}")
+    if not tile and extension not in vector.EXTENSIONS and extension != EXTENSION:
+        return saving.save_image(render(mesh, size, workers), path, sizes, **options)
+
+    start = time.perf_counter()
+    if extension in vector.EXTENSIONS:
+        # The model imports this module, so it is only imported here
+        from .model import Model
+
+        points = mesh.pixel_points(size)
+        colors = mesh.colors if palette is None else Model().palette_colors(mesh.colors, points[mesh.simplices], palette)
+        vector.save(path, points, mesh.simplices, colors, size)
+    elif extension == EXTENSION:
+        save(path, mesh.pixel_points(size), mesh.simplices, mesh.colors, size, mesh.params)
+    else:
+        compress_level = options.get("compress_level")
+        tiled.save(mesh.triangles(size), mesh.colors, size, path, workers=workers,
+                   compress_level=saving.PNG_COMPRESS_LEVEL if compress_level is None else compress_level)
+    return [saving.written(path, size, time.perf_counter() - start)] + thumbnails(mesh, path, sizes or [], **options)
+
+def argument_parser() -> argparse.ArgumentParser:
+    """
+    The command line options for re-rendering a mesh, main also reports bad meshes and outputs through it.
+    """
+    parser = argparse.ArgumentParser(description="Draw a saved Delaunay mesh (.dmesh) at any size.")
+    parser.add_argument("mesh", help="the mesh file")
+    parser.add_argument("output", help="image to save: .png, .jpg, .tif, .npy, .svg, .svgz, .pdf or .dmesh")
+    parser.add_argument("--width", type=int, default=None, help="output width (default: the size of the mesh)")
+    parser.add_argument("--height", type=int, default=None, help="output height, keeps the aspect ratio if only one is given")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="number of processes, 0 for all cores")
+    saving.add_arguments(parser)
+    return parser
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    """
+    Reads the command line options for re-rendering a mesh.
+    """
+    return argument_parser().parse_args(argv)
+
+def main(argv: Optional[list] = None) -> None:
+    """Re-renders a mesh from the command line, argv defaults to sys.argv[1:]
+    """
+    parser = argument_parser()
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    try:
+        mesh = load(args.mesh)
+        size = output_size(mesh, args.width, args.height)
+        results = export(mesh, args.output, size, args.workers or None, **saving.options_from_args(args))
+    except ValueError as error:
+        # Not a mesh file or an output it can't be saved as, shown like a bad option instead of a traceback
+        parser.error(str(error))
+    print(f"Drew {len(mesh)} triangles at {size[0]}x{size[1]} in {time.perf_counter() - start:.2f}s")
+    for result in results:
+        print(f"  {result['path']} {result['size'][0]}x{result['size'][1]} {saving.format_bytes(result['bytes'])} "
+              f"saved in {result['seconds']:.2f}s")
+
+if __name__ == "__main__":
+    main()
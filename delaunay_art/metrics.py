@@ -0,0 +1,195 @@
+# Error metrics between the original image and the triangulation art
+
+from __future__ import annotations
+
+import numpy as np
+from PIL import Image
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from scipy.spatial import Delaunay
+
+# Rows are processed in chunks of about this many pixels, so memory stays bounded for very large images
+CHUNK_PIXELS = 1 << 20
+
+def _as_array(img) -> np.ndarray:
+    """Returns an (height, width, 3) uint8 array for a PIL image or an array
+    """
+    if isinstance(img, Image.Image):
+        return np.asarray(img.convert("RGB"))
+    return np.asarray(img)
+
+def _row_chunks(height: int, width: int, chunk_pixels: int):
+    """Yields (start, stop) row ranges of about chunk_pixels pixels
+    """
+    rows = max(1, chunk_pixels // max(width, 1))
+    for start in range(0, height, rows):
+        yield start, min(height, start + rows)
+
+def squared_error_sum(img1, img2, chunk_pixels: int = CHUNK_PIXELS) -> float:
+    """
+    Sums the squared difference of every channel of every pixel.
+
+    PARAMETERS:
+    img1 (image or array) - first image
+    img2 (image or array) - second image, same size as the first
+
+    OUTPUT:
+    total (float) - the sum of the squared differences
+    """
+    a, b = _as_array(img1), _as_array(img2)
+    if a.shape != b.shape:
+        raise ValueError(f"Images must have the same size, got {a.shape} and {b.shape}")
+
+    total = 0.0
+    for start, stop in _row_chunks(a.shape[0], a.shape[1], chunk_pixels):
+        difference = a[start:stop].astype(np.float32) - b[start:stop]
+        total += float(np.square(difference).sum(dtype=np.float64))
+    return total
+
+def mse(img1, img2, chunk_pixels: int = CHUNK_PIXELS) -> float:
+    """
+    Mean squared error between two images, over all pixels and channels.
+
+    PARAMETERS:
+    img1 (image or array) - first image
+    img2 (image or array) - second image, same size as the first
+
+    OUTPUT:
+    mse (float) - 0 for identical images, up to 255^2
+    """
+    a = _as_array(img1)
+    return squared_error_sum(a, img2, chunk_pixels) / a.size
+
+def psnr(img1, img2, chunk_pixels: int = CHUNK_PIXELS) -> float:
+    """
+    Peak signal-to-noise ratio in decibels. Higher is better, identical images give infinity.
+
+    PARAMETERS:
+    img1 (image or array) - first image
+    img2 (image or array) - second image, same size as the first
+
+    OUTPUT:
+    psnr (float) - the PSNR in dB
+    """
+    error = mse(img1, img2, chunk_pixels)
+    if error == 0:
+        return float("inf")
+    return float(10 * np.log10(255 ** 2 / error))
+
+def ssim(img1, img2, window: int = 7, chunk_pixels: int = CHUNK_PIXELS) -> float:
+    """
+    Mean structural similarity (Wang et al. 2004) of the luminance of two images, using a square window.
+
+    PARAMETERS:
+    img1 (image or array) - first image
+    img2 (image or array) - second image, same size as the first
+    window (integer) - odd width of the window the local statistics are computed over
+
+    OUTPUT:
+    ssim (float) - 1 for identical images, lower is worse
+    """
+    a, b = _as_array(img1), _as_array(img2)
+    if a.shape != b.shape:
+        raise ValueError(f"Images must have the same size, got {a.shape} and {b.shape}")
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+    radius = window // 2
+    height, width = a.shape[:2]
+
+    total = 0.0
+    for start, stop in _row_chunks(height, width, chunk_pixels):
+        # Take radius extra rows on both sides so windows at the chunk border see their real neighbors
+        low, high = max(0, start - radius), min(height, stop + radius)
+        pad = ((radius - (start - low), radius - (high - stop)), (radius, radius))
+        x = np.pad(_luminance(a[low:high]), pad, mode="edge")
+        y = np.pad(_luminance(b[low:high]), pad, mode="edge")
+
+        mean_x, mean_y = _box_mean(x, window), _box_mean(y, window)
+        var_x = _box_mean(x * x, window) - mean_x ** 2
+        var_y = _box_mean(y * y, window) - mean_y ** 2
+        covariance = _box_mean(x * y, window) - mean_x * mean_y
+
+        ssim_map = ((2 * mean_x * mean_y + c1) * (2 * covariance + c2)) / ((mean_x ** 2 + mean_y ** 2 + c1) * (var_x + var_y + c2))
+        total += float(ssim_map.sum(dtype=np.float64))
+    return total / (height * width)
+
+def _luminance(pixels: np.ndarray) -> np.ndarray:
+    """ITU-R 601 luma of an RGB (or gray) array, as float64
+    """
+    if pixels.ndim == 2:
+        return pixels.astype(np.float64)
+    return pixels[..., :3].astype(np.float64) @ np.array([0.299, 0.587, 0.114])
+
+def _box_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Mean over every window x window block of a padded array, using an integral image
+    """
+    integral = np.zeros((values.shape[0] + 1, values.shape[1] + 1))
+    np.cumsum(np.cumsum(values, axis=0), axis=1, out=integral[1:, 1:])
+    sums = integral[window:, window:] - integral[:-window, window:] - integral[window:, :-window] + integral[:-window, :-window]
+    return sums / (window * window)
+
+def triangle_errors(source, art, triangulation: Delaunay, points: np.ndarray = None, chunk_pixels: int = CHUNK_PIXELS) -> np.ndarray:
+    """
+    Mean squared error of every triangle: how far the art is from the source over the pixels the triangle covers.
+    Works with any render mode since it compares the drawn art. Pixels are located and summed a chunk of rows at a
+    time, so the full triangle-ID map is never stored.
+
+    PARAMETERS:
+    source (image or array) - the original image
+    art (image or array) - the triangulation art, same size as the source
+    triangulation (Delanay object) - the triangulation the art was drawn with
+    points (array) - the points the art was drawn with, if they were scaled from the triangulation's points
+    chunk_pixels (integer) - how many pixels are processed at once
+
+    OUTPUT:
+    errors (np.ndarray) - mean squared error per triangle (over pixels and channels), 0 for triangles without pixels
+    """
+    a, b = _as_array(source), _as_array(art)
+    if a.shape != b.shape:
+        raise ValueError(f"Images must have the same size, got {a.shape} and {b.shape}")
+    height, width = a.shape[:2]
+    num_triangles = len(triangulation.simplices)
+
+    # Same affine mapping as Model.triangle_id_map when the art was drawn from scaled points
+    scale, offset = np.ones(2), np.zeros(2)
+    if points is not None and points is not triangulation.points:
+        mesh_min, mesh_max = triangulation.points.min(axis=0), triangulation.points.max(axis=0)
+        points_min, points_max = points.min(axis=0), points.max(axis=0)
+        scale = (mesh_max - mesh_min) / (points_max - points_min)
+        offset = mesh_min - points_min * scale
+
+    sums = np.zeros(num_triangles)
+    counts = np.zeros(num_triangles)
+    xs = (np.arange(width) + 0.5) * scale[0] + offset[0]
+    for start, stop in _row_chunks(height, width, chunk_pixels):
+        grid = np.empty((stop - start, width, 2))
+        grid[..., 0] = xs
+        grid[..., 1] = ((np.arange(start, stop) + 0.5) * scale[1] + offset[1])[:, None]
+        ids = triangulation.find_simplex(grid.reshape(-1, 2))
+
+        difference = a[start:stop].astype(np.float32) - b[start:stop]
+        pixel_error = (difference * difference).reshape(len(ids), -1).sum(axis=1)
+        inside = ids >= 0
+        sums += np.bincount(ids[inside], weights=pixel_error[inside], minlength=num_triangles)
+        counts += np.bincount(ids[inside], minlength=num_triangles)
+
+    channels = a.shape[2] if a.ndim == 3 else 1
+    return np.divide(sums, counts * channels, out=np.zeros(num_triangles), where=counts > 0)
+
+def report(source, art) -> dict:
+    """
+    All of the image metrics at once.
+
+    PARAMETERS:
+    source (image or array) - the original image
+    art (image or array) - the triangulation art, same size as the source
+
+    OUTPUT:
+    metrics (dict) - "mse", "psnr" and "ssim"
+    """
+    a, b = _as_array(source), _as_array(art)
+    error = mse(a, b)
+    return {"mse": error,
+            "psnr": float("inf") if error == 0 else float(10 * np.log10(255 ** 2 / error)),
+            "ssim": ssim(a, b)}
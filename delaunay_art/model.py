@@ -0,0 +1,1892 @@
+# The core of the Delaunay art: point distributions, triangulation, coloring and drawing. scipy is only imported
+# once something is triangulated, so importing the Model is quick
+
+from __future__ import annotations
+
+import hashlib
+import heapq
+import os
+import threading
+import numpy as np
+from collections import OrderedDict
+from PIL import Image, ImageDraw, ImageOps
+from typing import TYPE_CHECKING, Callable, Optional
+from enum import Enum
+from .instrumentation import Instrument
+from . import meshfile
+from . import tiled
+from . import vector
+
+if TYPE_CHECKING:
+    from scipy.spatial import Delaunay
+
+# Enumerated class for our distribution options
+class Distribution(Enum):
+    RANDOM = 0
+    UNIFORM = 1
+    CENTERED = 2
+    EDGES = 3
+    ADAPTIVE = 4
+    POISSON_DISK = 5
+
+# Enumerated class for how each triangle gets its color
+class Coloring(Enum):
+    VERTEX = 0
+    MEAN = 1
+    MEDIAN = 2
+    DOMINANT = 3
+    # Not one color per triangle: the colors of the three corners are blended across it
+    GOURAUD = 4
+
+class LRUCache:
+    """Size-bounded mapping that evicts the least recently used entry. Counts hits and misses. Safe to share between
+    the GUI and its worker thread
+    """
+
+    # Instance vars
+    maxsize: int
+    # With sizeof, the most bytes the entries may take together. An entry bigger than that isn't stored at all
+    maxbytes: Optional[int]
+    sizeof: Optional[Callable]
+    hits: int
+    misses: int
+
+    def __init__(self, maxsize: int, maxbytes: Optional[int] = None, sizeof: Optional[Callable] = None) -> None:
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the cached value or None, marking the entry as recently used
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value) -> None:
+        """Stores a value, evicting the oldest entries once the cache is full
+        """
+        size = 0 if self.sizeof is None else self.sizeof(value)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._sizes.pop(key, None)
+            if self.maxbytes is not None and size > self.maxbytes:
+                return
+            self._entries[key] = value
+            self._sizes[key] = size
+            while len(self._entries) > self.maxsize or (self.maxbytes is not None and self.nbytes() > self.maxbytes):
+                oldest, _ = self._entries.popitem(last=False)
+                del self._sizes[oldest]
+
+    def nbytes(self) -> int:
+        """Bytes the entries take, as sizeof counts them
+        """
+        return sum(self._sizes.values())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries), "maxsize": self.maxsize,
+                "bytes": self.nbytes()}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+# Functions:
+class Model:
+    # Instance vars
+    # Separate caches so a change that only touches rendering reuses the mesh. The points and their triangulation
+    # always go together, so one entry holds both. Both are bounded by bytes as well as entries, so a few huge meshes
+    # or full-size renders can't fill the memory
+    triangulation_cache: LRUCache
+    art_cache: LRUCache
+    # Images opened by open_image, and the decoded pixels of the images in use, so no stage decodes them again. Both
+    # are bounded by bytes too, a full-size photo bigger than that is decoded every time instead of being kept around
+    image_cache: LRUCache
+    pixel_cache: LRUCache
+
+    def __init__(self, triangulation_cache_size: int = 32, art_cache_size: int = 64, image_cache_size: int = 4, image_cache_bytes: int = 64 * 2 ** 20, triangulation_cache_bytes: int = 256 * 2 ** 20, art_cache_bytes: int = 256 * 2 ** 20) -> None:
+        self.triangulation_cache = LRUCache(triangulation_cache_size, triangulation_cache_bytes, self._mesh_bytes)
+        self.art_cache = LRUCache(art_cache_size, art_cache_bytes, self._image_bytes)
+        self.image_cache = LRUCache(image_cache_size, image_cache_bytes, self._image_bytes)
+        # An entry is (image, pixels) and keeps both alive
+        self.pixel_cache = LRUCache(image_cache_size, image_cache_bytes, lambda entry: 2 * entry[1].nbytes)
+
+    # Methods:
+    @staticmethod
+    def _image_bytes(img: Image) -> int:
+        """Bytes of the pixels of an image
+        """
+        return img.width * img.height * len(img.getbands())
+
+    @staticmethod
+    def _mesh_bytes(entry: tuple) -> int:
+        """Bytes of a (points, triangulation) entry, counting the arrays scipy keeps for the triangulation
+        """
+        points, triangulation = entry
+        arrays = (points, triangulation.points, triangulation.simplices, triangulation.neighbors, triangulation.equations)
+        return sum(array.nbytes for array in arrays)
+
+    def create_art(self, img: Image, num_points: int, distribution: Distribution, coloring: Coloring = Coloring.VERTEX, seed: Optional[int] = None, instrument: Optional[Instrument] = None) -> tuple:
+        """
+        Runs generate_points, del_triangulation and draw_triangulation, reusing cached results where it can.
+        Only seeded runs are cached, an unseeded run is random and always recomputed.
+
+        PARAMETERS:
+        img (image) - the image to draw, its size is the render size
+        num_points (integer) - the number of points in the pointset
+        distribution (Distribution) - how the points are placed
+        coloring (Coloring) - how the triangles are colored
+        seed (integer) - seed for the point generation
+        instrument (Instrument) - records the time and memory of every stage, None to not measure anything
+
+        OUTPUT:
+        (art, triangulation, points) - the picture with the art and the mesh it was drawn from
+        """
+        run = instrument or Instrument(enabled=False)
+        # Converted once for the hash and the drawing, even if the image is too big to stay in the pixel cache
+        pixels = self.image_pixels(img)
+        # Without a seed nothing is cached, every stage runs
+        mesh_key = None if seed is None else (self.image_hash(img, pixels), num_points, distribution, seed, img.size)
+
+        mesh = None if mesh_key is None else self.triangulation_cache.get(mesh_key)
+        if mesh is None:
+            with run.stage("generate", num_points):
+                points = self.generate_points(img, num_points, distribution, seed)
+            with run.stage("triangulate", len(points)) as record:
+                triangulation = self.del_triangulation(points)
+                record["triangles"] = len(triangulation.simplices)
+            if mesh_key is not None:
+                self.triangulation_cache.put(mesh_key, (points, triangulation))
+        else:
+            points, triangulation = mesh
+            run.cached("generate")
+            run.cached("triangulate")
+
+        art = None if mesh_key is None else self.art_cache.get(mesh_key + (coloring,))
+        if art is None:
+            art = self.draw_triangulation(img, triangulation, points, coloring, run, pixels=pixels)
+            if mesh_key is not None:
+                self.art_cache.put(mesh_key + (coloring,), art)
+        else:
+            run.cached("draw")
+
+        return art, triangulation, points
+
+    def image_hash(self, img: Image, pixels: Optional[np.ndarray] = None) -> str:
+        """
+        Fingerprint of the pixel content of an image, used in the cache keys. pixels can pass in img already decoded.
+        """
+        digest = hashlib.blake2b(self.image_pixels(img) if pixels is None else pixels, digest_size=16)
+        digest.update(f"{img.size}".encode())
+        return digest.hexdigest()
+
+    def open_image(self, filename: str, size: Optional[tuple] = None) -> Image:
+        """
+        Opens an image file turned upright with its EXIF orientation, and decodes its pixels once for every later
+        stage (see image_pixels). Opening the same file at the same size again returns the same image, as long as it
+        fits in the image cache.
+
+        PARAMETERS:
+        filename (string) - the image file
+        size (tuple) - (width, height) the image is shrunk to fit in, None for the full size. JPEGs are decoded at
+                       1/2, 1/4 or 1/8 scale when that is still twice as big, so a 40 megapixel photo opens for a
+                       300x300 preview in milliseconds instead of being decoded in full and shrunk
+
+        OUTPUT:
+        img (image) - the RGB image
+        """
+        key = (os.path.abspath(filename), os.path.getmtime(filename), size)
+        img = self.image_cache.get(key)
+        if img is not None:
+            return img
+
+        with Image.open(filename) as source:
+            if size is not None:
+                # Orientations 5 to 8 turn the image a quarter, so the box turns with it. Leave room for thumbnail's
+                # resampling like thumbnail's own draft call does
+                box = size[::-1] if source.getexif().get(0x0112, 1) in (5, 6, 7, 8) else size
+                source.draft("RGB", (2 * box[0], 2 * box[1]))
+            img = ImageOps.exif_transpose(source)
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        if size is not None:
+            img.thumbnail(size)
+
+        # Decoded now for every later stage. An image too big for the pixel cache would be decoded for nothing, every
+        # render converts it once itself
+        if 2 * self._image_bytes(img) <= self.pixel_cache.maxbytes:
+            self.image_pixels(img)
+        self.image_cache.put(key, img)
+        return img
+
+    def image_pixels(self, img: Image) -> np.ndarray:
+        """
+        The pixels of an image as a contiguous, read-only (height, width, 3) uint8 array. The image is only converted
+        the first time, every stage after that shares the array.
+
+        PARAMETERS:
+        img (image) - the image, it shouldn't be changed in place afterwards
+
+        OUTPUT:
+        pixels (np.ndarray) - the RGB pixels
+        """
+        # The cache holds on to the image, so no other image can get its id while it is cached
+        entry = self.pixel_cache.get(id(img))
+        if entry is not None and entry[0] is img:
+            return entry[1]
+        pixels = np.ascontiguousarray(np.asarray(img.convert("RGB")))
+        pixels.flags.writeable = False
+        self.pixel_cache.put(id(img), (img, pixels))
+        return pixels
+
+    def cache_stats(self) -> dict:
+        """
+        Hit and miss counters of every cache, to check how effective they are.
+        """
+        return {"triangulations": self.triangulation_cache.stats(),
+                "art": self.art_cache.stats(),
+                "images": self.image_cache.stats(),
+                "pixels": self.pixel_cache.stats()}
+
+    def clear_cache(self) -> None:
+        """
+        Empties every cache. The counters are kept.
+        """
+        self.triangulation_cache.clear()
+        self.art_cache.clear()
+        self.image_cache.clear()
+        self.pixel_cache.clear()
+
+    def draw_triangulation(self, img: Image, triangulation: Delaunay, points: np.ndarray, coloring: Coloring = Coloring.VERTEX, instrument: Optional[Instrument] = None, workers: Optional[int] = 1, palette: Optional[int] = None, pixels: Optional[np.ndarray] = None) -> Image:
+        """
+        This function draws the art given an image and triangulation.
+
+        PARAMETERS:
+        img (image) - the original image
+        triangulation (Delanay object) - the object that contains the information of the triangulation
+        points (array) - 2D array with the coordinates to draw, may be the triangulation's points scaled to the image size
+        coloring (Coloring) - VERTEX averages the three corners, MEAN/MEDIAN/DOMINANT use every pixel in the triangle,
+                              GOURAUD blends the corner colors smoothly across the triangle
+        instrument (Instrument) - records the locate (area colorings only), color and draw stages
+        workers (integer) - processes drawing the triangles, None for all cores. Only the VERTEX coloring draws polygons,
+                            the other colorings are array lookups that don't need them
+        palette (integer) - cluster the triangle colors into this many colors (at most 255) and draw a paletted "P"
+                            image, which saves as a much smaller PNG. GOURAUD is drawn with flat triangles then. None
+                            draws the colors as they are
+        pixels (np.ndarray) - img already decoded by image_pixels, None to decode it here. Either way it is converted
+                              once for the whole drawing, also when it is too big for the pixel cache
+
+        OUTPUT:
+        triangulation art (image) - the picture with the art
+        """
+        run = instrument or Instrument(enabled=False)
+        num_triangles = len(triangulation.simplices)
+        pixels = self.image_pixels(img) if pixels is None else pixels
+
+        if palette is not None:
+            return self.draw_paletted(img, triangulation, points, palette, coloring, run, workers, pixels)
+
+        if coloring == Coloring.GOURAUD:
+            with run.stage("color", len(points)) as record:
+                planes = self.color_planes(img, triangulation, points, pixels)
+                record["triangles"] = num_triangles
+            with run.stage("draw", len(points)) as record:
+                triangulation_art = self.shade(triangulation, img.size, points, planes)
+                record["triangles"] = num_triangles
+            return triangulation_art
+
+        if coloring != Coloring.VERTEX:
+            # Every pixel already knows its triangle, so the art is a single lookup
+            with run.stage("locate", len(points)) as record:
+                id_map = self.triangle_id_map(triangulation, img.size, points)
+                record["triangles"] = num_triangles
+            with run.stage("color", len(points)) as record:
+                colors = self.area_colors(img, triangulation, points, coloring, id_map, pixels=pixels)
+                record["triangles"] = num_triangles
+            with run.stage("draw", len(points)) as record:
+                # Pixels outside of the triangulation stay white like the polygon canvas
+                palette = np.vstack([colors, np.full((1, 3), 255, dtype=np.uint8)])
+                triangulation_art = Image.fromarray(palette[id_map])
+                record["triangles"] = num_triangles
+            return triangulation_art
+
+        img_width, img_height = img.size
+
+        # Colors for every triangle in one batch
+        with run.stage("color", len(points)) as record:
+            colors = self.triangle_colors(img, triangulation, points, pixels)
+            record["triangles"] = num_triangles
+
+        with run.stage("draw", len(points)) as record:
+            if workers != 1:
+                # Each process draws its share of tiles into one shared canvas, see tiled.draw
+                triangulation_art = tiled.draw(points[triangulation.simplices].reshape(-1, 6), colors, img.size, workers)
+                record["triangles"] = num_triangles
+                return triangulation_art
+
+            # Create a blank canvas for our art
+            triangulation_art = Image.new("RGB", (img_width, img_height), "white")
+            draw = ImageDraw.Draw(triangulation_art)
+
+            # Flatten each triangle to [x1, y1, x2, y2, x3, y3] for the polygon calls
+            triangles = points[triangulation.simplices].reshape(-1, 6).tolist()
+            for triangle, color in zip(triangles, colors.tolist()):
+                # Fill the triangle with the average color
+                draw.polygon(triangle, tuple(color))
+            record["triangles"] = num_triangles
+
+        return triangulation_art
+
+    def draw_paletted(self, img: Image, triangulation: Delaunay, points: np.ndarray, num_colors: int, coloring: Coloring = Coloring.VERTEX, instrument: Optional[Instrument] = None, workers: Optional[int] = 1, pixels: Optional[np.ndarray] = None) -> Image:
+        """
+        Draws the art with a palette of num_colors colors, picked by clustering the triangle colors (see
+        quantize_colors). The image is drawn with palette indices, so it is a third of the size of an RGB image and
+        saves as a paletted PNG. Index 255 is the white of the pixels outside of the triangulation.
+
+        PARAMETERS:
+        img (image) - the original image
+        triangulation (Delanay object) - the object that contains the information of the triangulation
+        points (array) - 2D array with the coordinates to draw, may be the triangulation's points scaled to the image size
+        num_colors (integer) - the number of colors in the palette, 1 to 255
+        coloring (Coloring) - how the triangles are colored before clustering, GOURAUD falls back to flat triangles
+        instrument (Instrument) - records the locate (area colorings only), color, quantize and draw stages
+        workers (integer) - processes drawing the triangles, None for all cores
+        pixels (np.ndarray) - img already decoded by image_pixels, None to decode it here
+
+        OUTPUT:
+        triangulation art (image) - the "P" mode picture with the art
+        """
+        if not 1 <= num_colors <= 255:
+            raise ValueError(f"A palette has 1 to 255 colors, not {num_colors}")
+        run = instrument or Instrument(enabled=False)
+        num_triangles = len(triangulation.simplices)
+        pixels = self.image_pixels(img) if pixels is None else pixels
+
+        id_map = None
+        if coloring not in (Coloring.VERTEX, Coloring.GOURAUD):
+            with run.stage("locate", len(points)) as record:
+                id_map = self.triangle_id_map(triangulation, img.size, points)
+                record["triangles"] = num_triangles
+        with run.stage("color", len(points)) as record:
+            if id_map is None:
+                colors = self.triangle_colors(img, triangulation, points, pixels)
+            else:
+                colors = self.area_colors(img, triangulation, points, coloring, id_map, pixels=pixels)
+            record["triangles"] = num_triangles
+
+        with run.stage("quantize", len(points)) as record:
+            # Weighted by area, so the colors that cover most of the picture get matched best
+            palette, labels = self.quantize_colors(colors, num_colors, self._areas(points[triangulation.simplices]))
+            record["triangles"] = num_triangles
+
+        with run.stage("draw", len(points)) as record:
+            if id_map is not None:
+                indices = np.append(labels, np.uint8(255))[id_map]
+            elif workers != 1:
+                # Drawn as gray levels, which the tiled renderer handles like any color, and the white outside is 255
+                gray = np.repeat(labels[:, None], 3, axis=1)
+                indices = np.asarray(tiled.draw(points[triangulation.simplices].reshape(-1, 6), gray, img.size, workers))[..., 0]
+            else:
+                indices = None
+                triangulation_art = Image.new("L", img.size, 255)
+                draw = ImageDraw.Draw(triangulation_art)
+                for triangle, label in zip(points[triangulation.simplices].reshape(-1, 6).tolist(), labels.tolist()):
+                    draw.polygon(triangle, label)
+            if indices is not None:
+                triangulation_art = Image.fromarray(np.ascontiguousarray(indices))
+
+            entries = np.zeros((256, 3), dtype=np.uint8)
+            entries[:len(palette)] = palette
+            entries[255] = 255
+            # Turns the "L" image into a "P" image
+            triangulation_art.putpalette(entries.tobytes())
+            record["triangles"] = num_triangles
+        return triangulation_art
+
+    def quantize_colors(self, colors: np.ndarray, num_colors: int, weights: Optional[np.ndarray] = None, iterations: int = 10, seed: int = 0, chunk: int = 2048) -> tuple:
+        """
+        Clusters colors into a palette with k-means. Only the distinct colors are clustered, with how often they occur
+        as their weight, and every step is a batch of NumPy operations over all of them.
+
+        PARAMETERS:
+        colors (np.ndarray) - (n, 3) uint8 array, like the colors of every triangle
+        num_colors (integer) - the most colors in the palette, fewer if there aren't that many distinct colors
+        weights (np.ndarray) - (n,) weight of every color, like the area of its triangle. None weighs them equally
+        iterations (integer) - the most k-means iterations, it stops early once no color changes cluster
+        seed (integer) - seed for picking the starting centers (k-means++), the same colors give the same palette
+        chunk (integer) - colors whose distances to the centers are computed at once, small enough to stay in the cache
+
+        OUTPUT:
+        (palette, labels) - (colors in the palette, 3) uint8 array and the (n,) uint8 palette index of every color
+        """
+        colors = np.asarray(colors, dtype=np.uint8)
+        packed = colors.astype(np.int64) @ np.array([1 << 16, 1 << 8, 1])
+        unique, inverse = np.unique(packed, return_inverse=True)
+        inverse = inverse.ravel()
+        counts = np.bincount(inverse, weights=weights, minlength=len(unique)).astype(np.float64)
+        samples = np.column_stack([unique >> 16, (unique >> 8) & 255, unique & 255]).astype(np.float32)
+        if len(unique) <= num_colors:
+            return samples.astype(np.uint8), inverse.astype(np.uint8)
+        if counts.sum() <= 0:
+            counts = np.ones_like(counts)
+
+        # k-means++: every next center is picked with a probability of its weighted squared distance to the closest one.
+        # A random 8192 of the colors are enough to spread the centers out, the iterations use all of them
+        rng = np.random.RandomState(seed)
+        subset = np.sort(rng.permutation(len(samples))[:8192])
+        candidates, candidate_counts = samples[subset], counts[subset]
+        centers = np.empty((num_colors, 3), dtype=np.float32)
+        centers[0] = candidates[np.argmax(candidate_counts)]
+        offsets = candidates - centers[0]
+        closest = np.einsum("ij,ij->i", offsets, offsets)
+        for i in range(1, num_colors):
+            chances = np.cumsum(closest * candidate_counts)
+            if chances[-1] <= 0:
+                # Fewer distinct colors than centers, the rest repeat and stay empty
+                centers[i:] = centers[0]
+                break
+            centers[i] = candidates[min(np.searchsorted(chances, rng.rand() * chances[-1], side="right"), len(candidates) - 1)]
+            np.subtract(candidates, centers[i], out=offsets)
+            np.minimum(closest, np.einsum("ij,ij->i", offsets, offsets), out=closest)
+
+        labels = np.zeros(len(samples), dtype=np.intp)
+        for iteration in range(iterations):
+            # |sample - center|^2 without the |sample|^2 term, which is the same for every center
+            previous = labels
+            labels = np.empty(len(samples), dtype=np.intp)
+            half_norms = (centers ** 2).sum(axis=1) / 2
+            for start in range(0, len(samples), chunk):
+                labels[start:start + chunk] = np.argmin(half_norms - samples[start:start + chunk] @ centers.T, axis=1)
+            if iteration and np.array_equal(labels, previous):
+                break
+
+            # Weighted mean of every cluster, an empty cluster keeps its center
+            totals = np.bincount(labels, weights=counts, minlength=num_colors)
+            filled = totals > 0
+            for channel in range(3):
+                sums = np.bincount(labels, weights=counts * samples[:, channel], minlength=num_colors)
+                centers[filled, channel] = sums[filled] / totals[filled]
+
+        palette = np.clip(np.round(centers), 0, 255).astype(np.uint8)
+        return palette, labels[inverse].astype(np.uint8)
+
+    @staticmethod
+    def _areas(corners: np.ndarray) -> np.ndarray:
+        """Area of every triangle in a (number of triangles, 3, 2) array of corners
+        """
+        # The cross product written out, np.cross of 2D vectors is deprecated since NumPy 2
+        sides = corners[:, 1:] - corners[:, :1]
+        return np.abs(sides[:, 0, 0] * sides[:, 1, 1] - sides[:, 0, 1] * sides[:, 1, 0]) / 2
+
+    def render_tiled(self, img: Image, triangulation: Delaunay, points: np.ndarray, filename: str, size: Optional[tuple] = None, coloring: Coloring = Coloring.VERTEX, tile_size: int = tiled.TILE_SIZE, workers: Optional[int] = 1, instrument: Optional[Instrument] = None, compress_level: int = 6) -> None:
+        """
+        Draws the art tile by tile straight into a file, for outputs too big for draw_triangulation's single canvas.
+        The colors are taken from img at its own size, then only one tile per worker is held in memory while drawing.
+
+        PARAMETERS:
+        img (image) - the original image
+        triangulation (Delanay object) - the object that contains the information of the triangulation
+        points (array) - 2D array with the coordinates of the triangulation, in pixels of img
+        filename (string) - where to save the art: .png, .tif/.tiff (needs tifffile) or .npy (memory-mappable)
+        size (tuple) - (width, height) of the output, None for the size of img
+        coloring (Coloring) - how the triangles are colored, GOURAUD falls back to flat corner average triangles
+        tile_size (integer) - width and height of a tile
+        workers (integer) - processes drawing tiles at the same time, None for all cores
+        instrument (Instrument) - records the color and draw stages
+        compress_level (integer) - zlib level of a PNG, from 0 (fastest) to 9 (smallest)
+        """
+        run = instrument or Instrument(enabled=False)
+        with run.stage("color", len(points)) as record:
+            colors = self.mesh_colors(img, triangulation, points, coloring)
+            record["triangles"] = len(triangulation.simplices)
+
+        size = img.size if size is None else tuple(size)
+        if size != img.size:
+            points = self.scale_points(points, img.size, size)
+        with run.stage("draw", len(points)) as record:
+            tiled.save(points[triangulation.simplices].reshape(-1, 6), colors, size, filename, tile_size, workers, compress_level)
+            record["triangles"] = len(triangulation.simplices)
+
+    def palette_colors(self, colors: np.ndarray, corners: np.ndarray, num_colors: int) -> np.ndarray:
+        """
+        Replaces the color of every triangle with its color in a palette of num_colors (see quantize_colors), so
+        vector images have big groups of triangles of the same color to write.
+
+        PARAMETERS:
+        colors (np.ndarray) - (number of triangles, 3) uint8 array with the color of every triangle
+        corners (np.ndarray) - (number of triangles, 3, 2) array with the corners of every triangle
+        num_colors (integer) - the most colors left, 1 to 255
+
+        OUTPUT:
+        colors (np.ndarray) - (number of triangles, 3) uint8 array with the palette color of every triangle
+        """
+        if not 1 <= num_colors <= 255:
+            raise ValueError(f"A palette has 1 to 255 colors, not {num_colors}")
+        # Weighted by area like draw_paletted, the colors that cover most of the picture get matched best
+        palette, labels = self.quantize_colors(colors, num_colors, self._areas(corners))
+        return palette[labels]
+
+    def export_vector(self, img: Image, triangulation: Delaunay, points: np.ndarray, filename: str, coloring: Coloring = Coloring.VERTEX, precision: int = 1, instrument: Optional[Instrument] = None, palette: Optional[int] = 255) -> None:
+        """
+        Saves the art as a vector image (.svg, .svgz or .pdf) that can be printed at any size. The triangles are
+        written a chunk at a time, grouped by color, so the colors are reduced to a palette first (see
+        palette_colors): every triangle having its own color would leave nothing to group.
+
+        PARAMETERS:
+        img (image) - the original image
+        triangulation (Delanay object) - the object that contains the information of the triangulation
+        points (array) - 2D array with the coordinates of the triangulation, in pixels of img
+        filename (string) - where to save the art
+        coloring (Coloring) - how the triangles are colored, GOURAUD falls back to flat corner average triangles
+        precision (integer) - decimals kept of every coordinate
+        instrument (Instrument) - records the color, quantize and save stages
+        palette (integer) - the most colors in the art, 1 to 255. None keeps the exact color of every triangle
+        """
+        run = instrument or Instrument(enabled=False)
+        with run.stage("color", len(points)) as record:
+            colors = self.mesh_colors(img, triangulation, points, coloring)
+            record["triangles"] = len(triangulation.simplices)
+
+        if palette is not None:
+            with run.stage("quantize", len(points)) as record:
+                colors = self.palette_colors(colors, points[triangulation.simplices], palette)
+                record["triangles"] = len(triangulation.simplices)
+
+        with run.stage("save", len(points)) as record:
+            vector.save(filename, points, triangulation.simplices, colors, img.size, precision)
+            record["triangles"] = len(triangulation.simplices)
+
+    def save_mesh(self, img: Image, triangulation: Delaunay, points: np.ndarray, filename: str, coloring: Coloring = Coloring.VERTEX, params: Optional[dict] = None, instrument: Optional[Instrument] = None) -> None:
+        """
+        Saves the mesh with the color of every triangle to a compact binary file (see meshfile), so it can be loaded
+        and drawn again at any size without generating or triangulating anything.
+
+        PARAMETERS:
+        img (image) - the original image, the colors are taken from it and its size is stored
+        triangulation (Delanay object) - the object that contains the information of the triangulation
+        points (array) - 2D array with the coordinates of the triangulation, in pixels of img
+        filename (string) - where to save the mesh, usually ending in .dmesh
+        coloring (Coloring) - how the triangles are colored, GOURAUD is stored as flat corner average triangles
+        params (dict) - how the mesh was generated (distribution, seed, ...), stored with it. The coloring is added
+        instrument (Instrument) - records the color and save stages
+        """
+        run = instrument or Instrument(enabled=False)
+        with run.stage("color", len(points)) as record:
+            colors = self.mesh_colors(img, triangulation, points, coloring)
+            record["triangles"] = len(triangulation.simplices)
+
+        with run.stage("save", len(points)) as record:
+            params = dict(params or {}, coloring=coloring.name, points=len(points))
+            meshfile.save(filename, points, triangulation.simplices, colors, img.size, params)
+            record["triangles"] = len(triangulation.simplices)
+
+    def load_mesh(self, filename: str, mmap: bool = True) -> meshfile.MeshFile:
+        """
+        Opens a mesh saved by save_mesh.
+
+        PARAMETERS:
+        filename (string) - the mesh file
+        mmap (bool) - memory-map the arrays instead of reading the file, multi-million triangle meshes open instantly
+
+        OUTPUT:
+        mesh (MeshFile) - the points, simplices, colors, size and generation parameters
+        """
+        return meshfile.load(filename, mmap)
+
+    def render_mesh(self, mesh: meshfile.MeshFile, size: Optional[tuple] = None, workers: Optional[int] = 1, instrument: Optional[Instrument] = None) -> Image:
+        """
+        Draws a loaded mesh at any size with its stored colors. Nothing is triangulated, the stored simplices are drawn.
+
+        PARAMETERS:
+        mesh (MeshFile) - a mesh from load_mesh
+        size (tuple) - (width, height) of the output, None for the size the mesh was saved at
+        workers (integer) - processes drawing the triangles, None for all cores
+        instrument (Instrument) - records the draw stage
+
+        OUTPUT:
+        triangulation art (image) - the picture with the art
+        """
+        run = instrument or Instrument(enabled=False)
+        with run.stage("draw", len(mesh.points)) as record:
+            art = meshfile.render(mesh, size, workers)
+            record["triangles"] = len(mesh)
+        return art
+
+    def mesh_colors(self, img: Image, triangulation: Delaunay, points: np.ndarray, coloring: Coloring = Coloring.VERTEX, pixels: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        The color of every triangle for any coloring, without drawing anything.
+
+        PARAMETERS:
+        img (image) - the original image
+        triangulation (Delanay object) - the object that contains the information of the triangulation
+        points (array) - 2D array with the coordinates of the triangulation, in pixels of img
+        coloring (Coloring) - how the triangles are colored
+        pixels (np.ndarray) - img already decoded by image_pixels, None to decode it here
+
+        OUTPUT:
+        colors (np.ndarray) - (number of triangles, 3) uint8 array with the RGB color of each triangle
+        """
+        pixels = self.image_pixels(img) if pixels is None else pixels
+        # A Gouraud triangle is flat colored with the blend at its centroid, which is the corner average
+        if coloring in (Coloring.VERTEX, Coloring.GOURAUD):
+            return self.triangle_colors(img, triangulation, points, pixels)
+        return self.area_colors(img, triangulation, points, coloring, pixels=pixels)
+
+    def triangle_colors(self, img: Image, triangulation: Delaunay, points: np.ndarray, pixels: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Calculates the color of every triangle as the average of its three corner pixels.
+
+        PARAMETERS:
+        img (image) - the original image
+        triangulation (Delanay object) - the object that contains the information of the triangulation
+        points (array) - 2D array with the generated coordinates for the triangulation
+        pixels (np.ndarray) - img already decoded by image_pixels, None to decode it here
+
+        OUTPUT:
+        colors (np.ndarray) - (number of triangles, 3) uint8 array with the RGB color of each triangle
+        """
+        # The decoded image instead of calling getpixel for every vertex
+        pixels = self.image_pixels(img) if pixels is None else pixels
+        img_height, img_width = pixels.shape[:2]
+
+        # Pixel coordinates of every corner, shape (triangles, 3, 2). getpixel truncates, so do the same
+        corners = points[triangulation.simplices].astype(np.intp)
+        x = np.clip(corners[..., 0], 0, img_width - 1)
+        y = np.clip(corners[..., 1], 0, img_height - 1)
+
+        # Gather the corner colors, shape (triangles, 3, 3), and average them per triangle
+        corner_colors = pixels[y, x].astype(np.uint16)
+        return (corner_colors.sum(axis=1) // 3).astype(np.uint8)
+
+    def color_planes(self, img: Image, triangulation: Delaunay, points: np.ndarray, pixels: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        The colors of the three corners of every triangle blended with barycentric coordinates, written as a plane per
+        triangle and channel: color = x * x_slope + y * y_slope + constant, in the space of the triangulation's points.
+
+        PARAMETERS:
+        img (image) - the original image
+        triangulation (Delanay object) - the object that contains the information of the triangulation
+        points (array) - 2D array with the coordinates to draw, may be the triangulation's points scaled to the image size
+        pixels (np.ndarray) - img already decoded by image_pixels, None to decode it here
+
+        OUTPUT:
+        planes (np.ndarray) - (number of triangles, 3, 3) float32 array, the rows of a triangle are the x slopes, the
+                              y slopes and the constants of its R, G and B
+        """
+        # Same corner pixels as triangle_colors, so the middle of a triangle gets the flat color
+        pixels = self.image_pixels(img) if pixels is None else pixels
+        img_height, img_width = pixels.shape[:2]
+        corners = points.astype(np.intp)
+        x = np.clip(corners[:, 0], 0, img_width - 1)
+        y = np.clip(corners[:, 1], 0, img_height - 1)
+        corner_colors = pixels[y, x].astype(np.float64)[triangulation.simplices]
+
+        # transform maps a point to its first two barycentric coordinates: b = T (p - r). Flat triangles have NaNs
+        transform = np.nan_to_num(triangulation.transform)
+        delta = corner_colors[:, :2] - corner_colors[:, 2:3]
+        slopes = np.einsum("nkc,nkd->ndc", delta, transform[:, :2])
+        constant = corner_colors[:, 2] - np.einsum("ndc,nd->nc", slopes, transform[:, 2])
+        return np.concatenate([slopes, constant[:, None]], axis=1).astype(np.float32)
+
+    def shade(self, triangulation: Delaunay, size: tuple, points: Optional[np.ndarray], planes: np.ndarray, chunk_pixels: int = 1 << 20) -> Image:
+        """
+        Draws Gouraud shaded art: every pixel is located in the triangulation and gets the color of its triangle's
+        planes at its center. Works on a few rows at a time, without any drawing calls per triangle.
+
+        PARAMETERS:
+        triangulation (Delanay object) - the object that contains the information of the triangulation
+        size (tuple) - (width, height) of the art
+        points (array) - the triangulation's points scaled to this size (see scale_points), None if they weren't scaled
+        planes (np.ndarray) - the color planes from color_planes
+        chunk_pixels (integer) - how many pixels are shaded at once, this bounds the temporary memory
+
+        OUTPUT:
+        triangulation art (image) - the picture with the art, white outside of the triangulation
+        """
+        img_width, img_height = size
+        art = np.empty((img_height, img_width, 3), dtype=np.uint8)
+        scale, offset = self._mesh_space(triangulation, points)
+
+        # find_simplex gives -1 outside of the triangulation, which picks the white plane added at the end
+        white = np.zeros((1, 3, 3), dtype=np.float32)
+        white[0, 2] = 255
+        planes = np.concatenate([planes, white]).reshape(-1, 9)
+
+        xs = ((np.arange(img_width) + 0.5) * scale[0] + offset[0]).astype(np.float32)
+        rows_per_chunk = max(1, chunk_pixels // img_width)
+        for start in range(0, img_height, rows_per_chunk):
+            stop = min(img_height, start + rows_per_chunk)
+            ys = ((np.arange(start, stop) + 0.5) * scale[1] + offset[1]).astype(np.float32)
+            grid = np.empty((stop - start, img_width, 2), dtype=np.float32)
+            grid[..., 0] = xs
+            grid[..., 1] = ys[:, None]
+            grid = grid.reshape(-1, 2)
+
+            # Evaluate the three planes of every pixel's triangle at the pixel, in place to save temporaries
+            pixel_planes = planes[triangulation.find_simplex(grid)]
+            colors = pixel_planes[:, 0:3] * grid[:, 0:1]
+            colors += pixel_planes[:, 3:6] * grid[:, 1:2]
+            colors += pixel_planes[:, 6:9]
+            colors += 0.5
+            np.clip(colors, 0, 255, out=colors)
+            art[start:stop] = colors.astype(np.uint8).reshape(stop - start, img_width, 3)
+
+        return Image.fromarray(art)
+
+    def _mesh_space(self, triangulation: Delaunay, points: Optional[np.ndarray]) -> tuple:
+        """(scale, offset) that map pixels of the drawn points back into the space of the triangulation's points
+        """
+        # Scaling is affine, so a pixel lies in the same triangle after mapping it back into the triangulation's space
+        scale, offset = np.ones(2), np.zeros(2)
+        if points is not None and points is not triangulation.points:
+            mesh_min, mesh_max = triangulation.points.min(axis=0), triangulation.points.max(axis=0)
+            points_min, points_max = points.min(axis=0), points.max(axis=0)
+            scale = (mesh_max - mesh_min) / (points_max - points_min)
+            offset = mesh_min - points_min * scale
+        return scale, offset
+
+    def triangle_id_map(self, triangulation: Delaunay, size: tuple, points: Optional[np.ndarray] = None, chunk_pixels: int = 1 << 20) -> np.ndarray:
+        """
+        Rasterizes the triangulation into a map holding the index of the triangle that covers each pixel.
+
+        PARAMETERS:
+        triangulation (Delanay object) - the object that contains the information of the triangulation
+        size (tuple) - (width, height) of the map
+        points (array) - the triangulation's points scaled to this size (see scale_points), None if they weren't scaled
+        chunk_pixels (integer) - how many pixels are located at once, this bounds the temporary memory
+
+        OUTPUT:
+        id_map (np.ndarray) - (height, width) int32 array, pixels outside of every triangle are -1
+        """
+        img_width, img_height = size
+        id_map = np.empty((img_height, img_width), dtype=np.int32)
+        for start, ids in self._located_rows(triangulation, size, points, chunk_pixels):
+            id_map[start:start + len(ids)] = ids
+        return id_map
+
+    def _located_rows(self, triangulation: Delaunay, size: tuple, points: Optional[np.ndarray], chunk_pixels: int):
+        """Locates the pixel centers a few rows at a time, yields (first row, (rows, width) triangle indices)
+        """
+        img_width, img_height = size
+        scale, offset = self._mesh_space(triangulation, points)
+
+        xs = (np.arange(img_width) + 0.5) * scale[0] + offset[0]
+        rows_per_chunk = max(1, chunk_pixels // img_width)
+        for start in range(0, img_height, rows_per_chunk):
+            stop = min(img_height, start + rows_per_chunk)
+            grid = np.empty((stop - start, img_width, 2))
+            grid[..., 0] = xs
+            grid[..., 1] = ((np.arange(start, stop) + 0.5) * scale[1] + offset[1])[:, None]
+            yield start, triangulation.find_simplex(grid.reshape(-1, 2)).reshape(stop - start, img_width)
+
+    def area_colors(self, img: Image, triangulation: Delaunay, points: np.ndarray, coloring: Coloring, id_map: Optional[np.ndarray] = None, chunk_pixels: int = 1 << 20, pixels: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Calculates the color of every triangle from all of the pixels it covers. The pixels are gone through a few rows
+        at a time, so the memory used besides the colors is bounded by chunk_pixels and the triangles crossing a row.
+
+        PARAMETERS:
+        img (image) - the original image
+        triangulation (Delanay object) - the object that contains the information of the triangulation
+        points (array) - 2D array with the generated coordinates for the triangulation, in pixels of img
+        coloring (Coloring) - MEAN, MEDIAN or DOMINANT (most common color, 5 bits per channel)
+        id_map (np.ndarray) - triangle index of every pixel from triangle_id_map, if the caller needs one anyway. None
+                              locates the pixels chunk by chunk without ever holding the whole map
+        chunk_pixels (integer) - how many pixels are looked at once
+        pixels (np.ndarray) - img already decoded by image_pixels, None to decode it here
+
+        OUTPUT:
+        colors (np.ndarray) - (number of triangles, 3) uint8 array with the RGB color of each triangle
+        """
+        num_triangles = len(triangulation.simplices)
+        pixels = self.image_pixels(img) if pixels is None else pixels
+        img_height, img_width = pixels.shape[:2]
+        if id_map is None:
+            chunks = self._located_rows(triangulation, img.size, points, chunk_pixels)
+        else:
+            rows_per_chunk = max(1, chunk_pixels // img_width)
+            chunks = ((start, id_map[start:start + rows_per_chunk]) for start in range(0, img_height, rows_per_chunk))
+
+        # Triangles too thin to cover a pixel center keep the corner average
+        colors = self.triangle_colors(img, triangulation, points, pixels)
+        sums = np.zeros((num_triangles, 3))
+        counts = np.zeros(num_triangles, dtype=np.int64)
+
+        # MEDIAN and DOMINANT count every value of a triangle (of each channel for MEDIAN), as sorted
+        # (group << bits | value) keys with their counts. The counts of a triangle are only kept until its last row was
+        # seen, after which its color is picked from them
+        bits = 8 if coloring == Coloring.MEDIAN else 15
+        # One row of slack, find_simplex may give a pixel right on an edge to either triangle
+        last_rows = np.floor(points[triangulation.simplices][:, :, 1].max(axis=1) - 0.5).astype(np.int64) + 1
+        open_keys = np.empty(0, dtype=np.int64)
+        open_counts = np.empty(0, dtype=np.int64)
+
+        for start, ids in chunks:
+            stop = start + len(ids)
+            ids = ids.ravel()
+            chunk = pixels[start:stop].reshape(-1, 3)
+            # Only pixels that are inside the triangulation take part
+            inside = ids >= 0
+            ids = ids[inside].astype(np.int64)
+            chunk = chunk[inside]
+
+            if coloring == Coloring.MEAN:
+                counts += np.bincount(ids, minlength=num_triangles)
+                for channel in range(3):
+                    sums[:, channel] += np.bincount(ids, weights=chunk[:, channel], minlength=num_triangles)
+                continue
+
+            if coloring == Coloring.MEDIAN:
+                keys = (((ids[:, None] * 3 + np.arange(3)) << 8) | chunk).ravel()
+            else:
+                quantized = (chunk >> 3).astype(np.int64)
+                keys = (ids << 15) | (quantized[:, 0] << 10) | (quantized[:, 1] << 5) | quantized[:, 2]
+            keys, key_counts = np.unique(keys, return_counts=True)
+            if len(open_keys):
+                keys, inverse = np.unique(np.concatenate([open_keys, keys]), return_inverse=True)
+                key_counts = np.bincount(inverse.ravel(), weights=np.concatenate([open_counts, key_counts])).astype(np.int64)
+
+            triangles = keys >> bits
+            if coloring == Coloring.MEDIAN:
+                triangles = triangles // 3
+            done = last_rows[triangles] < stop
+            self._pick_colors(colors, keys[done], key_counts[done], coloring)
+            open_keys, open_counts = keys[~done], key_counts[~done]
+
+        if coloring == Coloring.MEAN:
+            covered = counts > 0
+            colors[covered] = (sums[covered] / counts[covered, None]).astype(np.uint8)
+        else:
+            self._pick_colors(colors, open_keys, open_counts, coloring)
+        return colors
+
+    def _pick_colors(self, colors: np.ndarray, keys: np.ndarray, counts: np.ndarray, coloring: Coloring) -> None:
+        """Sets the MEDIAN or DOMINANT colors of the triangles in the value counts of area_colors
+        """
+        if not len(keys):
+            return
+        bits = 8 if coloring == Coloring.MEDIAN else 15
+        groups = keys >> bits
+        values = keys & ((1 << bits) - 1)
+        # The keys are sorted, so every group's values are one run in ascending order
+        starts = np.flatnonzero(np.r_[True, groups[1:] != groups[:-1]])
+
+        if coloring == Coloring.MEDIAN:
+            # The value at position count // 2 of the sorted run is the first whose running count goes past it
+            totals = np.add.reduceat(counts, starts)
+            running = np.cumsum(counts)
+            middle = np.searchsorted(running, running[starts] - counts[starts] + totals // 2, side="right")
+            colors[groups[starts] // 3, groups[starts] % 3] = values[middle]
+            return
+
+        # The most common value, the lowest one of those with the same count
+        largest = np.maximum.reduceat(counts, starts)
+        hits = np.flatnonzero(counts == np.repeat(largest, np.diff(np.r_[starts, len(keys)])))
+        first = hits[np.r_[True, groups[hits][1:] != groups[hits][:-1]]]
+        bins = values[first]
+        best_colors = np.stack([bins >> 10, (bins >> 5) & 0x1F, bins & 0x1F], axis=1)
+        colors[groups[first]] = (best_colors * 8 + 4).astype(np.uint8)
+
+    def generate_points(self, img: Image, num_points: int, distribution: Distribution, seed: Optional[int] = None, density: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        This function generates an array of random or uniform coordinates within the image. Exactly num_points are
+        generated for every distribution, plus the four corner points.
+
+        PARAMETERS:
+        num_points (integer) - the number of points in the pointset
+        distribution (Distribution) - RANDOM, UNIFORM, CENTERED, EDGES to place more points along the edges of the image,
+                                      ADAPTIVE to add points where the art differs most from the image, or POISSON_DISK
+                                      for random points that keep a minimum distance from each other (blue noise)
+        img (image) - the image that the pointset must fit within
+        seed (integer) - makes the points reproducible, None uses numpy's global random state
+        density (np.ndarray) - POISSON_DISK only: (height, width) map of how densely to place the points, for example
+                               importance_map(img). None spaces them evenly
+
+        OUTPUT:
+        points (np.ndarray) - 2D array that contains the points for our triangulation
+        """
+
+        img_width, img_height = img.size
+        size = np.array([img_width, img_height])
+        rng = np.random if seed is None else np.random.RandomState(seed)
+        # Generate points within the image boundaries, every distribution returns exactly num_points
+            # Random first
+        if distribution == Distribution.RANDOM:
+            # This will generate random numbers between 0 and 1 in a pair, then multiply by the array to fit the image
+            points = rng.rand(num_points, 2) * size
+
+            # Then the uniform distribution
+        if distribution == Distribution.UNIFORM:
+            # Pick a lattice with about the same spacing in x and y that has at least num_points cells
+            columns = max(1, int(round(np.sqrt(num_points * img_width / img_height))))
+            rows = max(1, -(-num_points // columns))
+            xs = (np.arange(columns) + 0.5) * (img_width / columns)
+            ys = (np.arange(rows) + 0.5) * (img_height / rows)
+            grid_x, grid_y = np.meshgrid(xs, ys)
+            lattice = np.column_stack([grid_x.ravel(), grid_y.ravel()])
+            # Drop the extra cells evenly across the lattice instead of leaving a gap at the end
+            points = lattice[np.arange(num_points) * len(lattice) // max(num_points, 1)]
+
+            # Distribution centered at the origin
+        if distribution == Distribution.CENTERED:
+            points = rng.standard_normal((num_points, 2))
+            points *= size / 8
+            points += size / 2
+            # Redraw the few points that landed outside the image until every point fits
+            missing = np.flatnonzero(self._outside(points, size))
+            while len(missing):
+                points[missing] = rng.normal(size / 2, size / 8, (len(missing), 2))
+                missing = missing[self._outside(points[missing], size)]
+
+            # Points placed one by one where the art is worst, they already include the corners
+        if distribution == Distribution.ADAPTIVE:
+            return self.refine_points(img, num_points, seed=seed).points
+
+            # Blue noise, random but never closer than a minimum distance
+        if distribution == Distribution.POISSON_DISK:
+            points = self.poisson_disk(img.size, num_points, rng, density)
+
+            # Distribution that follows the edges of the image
+        if distribution == Distribution.EDGES:
+            # Pick pixels with probability proportional to their importance, then jitter inside the pixel
+            probabilities = self.importance_map(img).ravel()
+            indices = rng.choice(probabilities.size, size=num_points, p=probabilities)
+            points = np.column_stack([indices % img_width, indices // img_width]) + rng.rand(num_points, 2)
+
+        # Ensure the corners have points to prevent weird borders
+        corner_points = [[1,1], [img_width-1, 1], [1, img_height-1], [img_width-1, img_height-1]]
+        points = np.concatenate([points, np.array(corner_points, dtype=float)])
+
+        return points
+        
+    def scale_points(self, points: np.ndarray, from_size: tuple, to_size: tuple) -> np.ndarray:
+        """
+        Moves a point set to another image size. The corner points generate_points adds stay on the corners, so the
+        same mesh can be drawn at preview size and again at the full size of the source.
+
+        PARAMETERS:
+        points (array) - the points, in pixels of from_size
+        from_size (tuple) - (width, height) the points were generated for
+        to_size (tuple) - (width, height) to move them to
+
+        OUTPUT:
+        points (np.ndarray) - the same points in pixels of to_size
+        """
+        from_size = np.array(from_size, dtype=float)
+        to_size = np.array(to_size, dtype=float)
+        # Maps 1 -> 1 and size - 1 -> size - 1 on both axes
+        return 1 + (points - 1) * (to_size - 2) / (from_size - 2)
+
+    def _outside(self, points: np.ndarray, size: np.ndarray) -> np.ndarray:
+        """Mask of the points that aren't strictly inside the (width, height) image
+        """
+        x, y = points[:, 0], points[:, 1]
+        return (x <= 0) | (x >= size[0]) | (y <= 0) | (y >= size[1])
+
+    def poisson_disk(self, size: tuple, num_points: int, rng=np.random, density: Optional[np.ndarray] = None, attempts: int = 4, max_ratio: float = 2.0) -> np.ndarray:
+        """
+        Poisson-disk sampling: random points where no two are closer than a radius, so there are no clusters and no
+        sliver triangles. Like Bridson's algorithm it uses a background grid with cells of radius / sqrt(2), which hold
+        at most one point, so a new point only has to be checked against the points of nearby cells. Instead of growing
+        the points one at a time, every cell tries a random point in rounds. Cells far enough apart can't conflict, so
+        each round is a few batches of NumPy operations and the whole sampling is O(n).
+
+        PARAMETERS:
+        size (tuple) - (width, height) of the area to fill
+        num_points (integer) - exactly this many points are returned
+        rng (RandomState) - the random generator
+        density (np.ndarray) - (height, width) map of how densely to place the points, the radius shrinks with
+                               1 / sqrt(density). None for an even radius
+        attempts (integer) - how many times a cell tries a point before it is left empty
+        max_ratio (float) - the largest radius is at most this many times the smallest, denser areas are clipped
+
+        OUTPUT:
+        points (np.ndarray) - (num_points, 2) array
+        """
+        # Like the other distributions, no points only leaves the corners
+        if num_points <= 0:
+            return np.empty((0, 2))
+        width, height = size
+        radius_map = None
+        if density is None:
+            density_sum = width * height
+        else:
+            density = np.asarray(density, dtype=np.float64)
+            if density.max() <= 0:
+                density = np.ones_like(density)
+            density = np.maximum(density, density.max() / max_ratio ** 2)
+            density_sum = density.sum()
+
+        # The radius that gives a few percent more points than asked for, they are thinned afterwards. The sparse areas
+        # of a density map pack less tightly, so it starts smaller there. Shrunk again if too few fit
+        packing = 0.76 if density is None else 0.7
+        while True:
+            if density is not None:
+                radius_map = (packing * np.sqrt(density_sum / (num_points * density))).astype(np.float32)
+            points = self._poisson_disk(size, packing * np.sqrt(density_sum / num_points), radius_map, rng, attempts)
+            if len(points) >= num_points:
+                break
+            packing *= 0.98 * np.sqrt(len(points) / num_points)
+
+        # Dropping a few random points keeps the spacing and leaves exactly num_points
+        keep = np.sort(rng.choice(len(points), num_points, replace=False))
+        return points[keep]
+
+    def _poisson_disk(self, size: tuple, radius: float, radius_map: Optional[np.ndarray], rng, attempts: int) -> np.ndarray:
+        """One Poisson-disk sampling with a fixed radius, or a radius per pixel. Two points with different radii keep
+        the larger one apart
+        """
+        width, height = size
+        r_min = r_max = radius
+        if radius_map is not None:
+            r_min, r_max = float(radius_map.min()), float(radius_map.max())
+        cell = r_min / np.sqrt(2)
+        columns, rows = int(np.ceil(width / cell)), int(np.ceil(height / cell))
+
+        # Points as close as r_max can be reach cells away. The grid is padded with reach empty cells on every side
+        # so lookups never leave it, and is kept flat so a neighbor is a fixed offset away
+        reach = int(np.ceil(r_max / cell))
+        stride = columns + 2 * reach
+        grid_x = np.full((rows + 2 * reach) * stride, np.nan, dtype=np.float32)
+        grid_y = grid_x.copy()
+        grid_r = np.zeros_like(grid_x)
+        # Closest cells first, in groups of 8. Most candidates are rejected by the first groups and the later groups
+        # only check the survivors
+        neighbors = sorted(((dy, dx) for dy in range(-reach, reach + 1) for dx in range(-reach, reach + 1)
+                            if (dy, dx) != (0, 0) and (max(abs(dy), abs(dx)) - 1) * cell < r_max),
+                           key=lambda offset: offset[0] ** 2 + offset[1] ** 2)
+        offsets = np.array([dy * stride + dx for dy, dx in neighbors])
+        groups = [offsets[start:start + 8] for start in range(0, len(offsets), 8)]
+
+        # Cells whose rows and columns match modulo reach + 1 are over r_max apart, so they can try points together
+        period = reach + 1
+        cell_y, cell_x = np.divmod(np.arange(rows * columns), columns)
+        phase = (cell_y % period) * period + cell_x % period
+        order = np.argsort(phase, kind="stable")
+        bounds = np.searchsorted(phase[order], np.arange(period * period + 1))
+        pending = [order[bounds[i]:bounds[i + 1]] for i in range(period * period)]
+        # Where the radius is large a point covers many cells, so those cells get fewer tries
+        tries = np.full(rows * columns, attempts, dtype=np.int32)
+        if radius_map is not None:
+            centers = radius_map[np.minimum((cell_y + 0.5) * cell, height - 1).astype(np.intp),
+                                 np.minimum((cell_x + 0.5) * cell, width - 1).astype(np.intp)]
+            tries = np.maximum(1, np.round(attempts * (r_min / centers) ** 2)).astype(np.int32)
+        tries = [tries[cells] for cells in pending]
+
+        while any(len(cells) for cells in pending):
+            for i, cells in enumerate(pending):
+                if not len(cells):
+                    continue
+                cy, cx = cell_y[cells], cell_x[cells]
+                x = ((cx + rng.rand(len(cells))) * cell).astype(np.float32)
+                y = ((cy + rng.rand(len(cells))) * cell).astype(np.float32)
+                # The last row and column of cells stick out of the image
+                rejected = (x >= width) | (y >= height)
+                r = radius_map[np.minimum(y, height - 1).astype(np.intp), np.minimum(x, width - 1).astype(np.intp)] \
+                    if radius_map is not None else np.float32(radius)
+
+                # Empty cells are NaN, which is never closer than anything
+                flat = (cy + reach) * stride + cx + reach
+                testing = np.flatnonzero(~rejected)
+                for group in groups:
+                    # Only the candidates that survived the closer cells
+                    testing = testing[~rejected[testing]]
+                    if not len(testing):
+                        break
+                    test_x, test_y, test_flat = x[testing], y[testing], flat[testing]
+                    test_r = r[testing] if radius_map is not None else r
+                    hit = np.zeros(len(testing), dtype=bool)
+                    for offset in group:
+                        neighbor = test_flat + offset
+                        distance = (grid_x[neighbor] - test_x) ** 2 + (grid_y[neighbor] - test_y) ** 2
+                        limit = np.maximum(test_r, grid_r[neighbor]) if radius_map is not None else test_r
+                        hit |= distance < limit * limit
+                    rejected[testing] = hit
+
+                accepted = ~rejected
+                grid_x[flat[accepted]] = x[accepted]
+                grid_y[flat[accepted]] = y[accepted]
+                if radius_map is not None:
+                    grid_r[flat[accepted]] = r[accepted]
+
+                # Cells that keep failing are most likely covered by their neighbors
+                left = tries[i][rejected] - 1
+                pending[i] = cells[rejected][left > 0]
+                tries[i] = left[left > 0]
+
+        filled = ~np.isnan(grid_x)
+        return np.column_stack([grid_x[filled], grid_y[filled]]).astype(np.float64)
+
+    def importance_map(self, img: Image, floor: float = 0.05) -> np.ndarray:
+        """
+        Calculates how much detail each pixel has using the Sobel gradient magnitude.
+
+        PARAMETERS:
+        img (image) - the image to measure
+        floor (float) - share of the probability spread evenly, so flat areas still get a few points
+
+        OUTPUT:
+        probabilities (np.ndarray) - (height, width) array that sums to 1
+        """
+        # The luma of convert("L"), from the decoded pixels
+        pixels = self.image_pixels(img).astype(np.uint32)
+        gray = ((pixels[..., 0] * 19595 + pixels[..., 1] * 38470 + pixels[..., 2] * 7471 + 0x8000) >> 16).astype(np.float32)
+        padded = np.pad(gray, 1, mode="edge")
+
+        # Sobel kernels written as shifted slices of the padded image
+        top, middle, bottom = padded[:-2], padded[1:-1], padded[2:]
+        left, center, right = slice(None, -2), slice(1, -1), slice(2, None)
+        gx = (top[:, right] + 2 * middle[:, right] + bottom[:, right]) - (top[:, left] + 2 * middle[:, left] + bottom[:, left])
+        gy = (bottom[:, left] + 2 * bottom[:, center] + bottom[:, right]) - (top[:, left] + 2 * top[:, center] + top[:, right])
+        magnitude = np.hypot(gx, gy).astype(np.float64)
+
+        total = magnitude.sum()
+        if total == 0:
+            # A flat image has no edges, fall back to an even spread
+            return np.full(gray.shape, 1 / gray.size)
+        return (1 - floor) * magnitude / total + floor / gray.size
+
+    def optimize_points(self, img: Image, points: np.ndarray, iterations: int = 20, step: float = 1.0, tolerance: float = 1e-4, callback: Optional[Callable[[int, float, float], None]] = None) -> tuple:
+        """
+        Moves the points to reduce the color error of the mean-colored triangles, following "Stylized Image
+        Triangulation" by Lawonn and Gunther. Every iteration re-triangulates the moved points, which does all the
+        edge flips needed to keep the mesh Delaunay at once.
+
+        The energy is the squared difference between the image and the triangle colors summed over all pixels. Moving
+        an edge changes which of its two triangles covers the pixels along it, so the gradient of a point is the
+        integral along its edges of (error with the color on one side - error with the color on the other side) times
+        the edge normal, weighted by how close the sample is to the point. Everything is computed for all edges at once.
+
+        PARAMETERS:
+        img (image) - the image to approximate, smaller images make each iteration faster
+        points (array) - 2D array with the starting points, the four corner points stay where they are
+        iterations (integer) - the maximum number of iterations
+        step (float) - how many pixels the point with the largest gradient moves in the first iteration
+        tolerance (float) - stop when the relative improvement of an iteration is smaller than this
+        callback (function) - called with (iteration, energy, step) after every iteration to report convergence
+
+        OUTPUT:
+        (points, triangulation, history) - the moved points, their triangulation and the energy of every iteration
+        """
+        pixels = self.image_pixels(img).astype(np.float64)
+        img_height, img_width = pixels.shape[:2]
+        flat_pixels = pixels.reshape(-1, 3)
+        points = np.array(points, dtype=float)
+
+        # The corners keep the border of the art filled
+        corners = np.array([[1, 1], [img_width - 1, 1], [1, img_height - 1], [img_width - 1, img_height - 1]])
+        fixed = (np.abs(points[:, None, :] - corners[None]).sum(axis=2) < 1e-9).any(axis=1)
+
+        # Samples along every edge, as the fraction of the way from its first to its second point
+        samples = (np.arange(8) + 0.5) / 8
+
+        triangulation, colors, energy = self._mean_color_energy(flat_pixels, points, (img_width, img_height))
+        history = [energy]
+        if callback is not None:
+            callback(0, energy, step)
+
+        for iteration in range(1, iterations + 1):
+            # Every inner edge once: triangle t and the neighbor opposite of its corner i share the other two corners
+            simplices = triangulation.simplices
+            neighbors = triangulation.neighbors
+            t, i = np.nonzero(neighbors > np.arange(len(simplices))[:, None])
+            other = neighbors[t, i]
+            a = simplices[t, (i + 1) % 3]
+            b = simplices[t, (i + 2) % 3]
+            pa, pb, opposite = points[a], points[b], points[simplices[t, i]]
+
+            # Normal of the edge pointing from t into its neighbor, as long as the edge
+            edge = pb - pa
+            normal = np.column_stack([edge[:, 1], -edge[:, 0]])
+            normal *= np.sign(((pa - opposite) * normal).sum(axis=1))[:, None]
+
+            # Image colors along the edges, shape (edges, samples, 3)
+            positions = pa[:, None, :] + samples[None, :, None] * edge[:, None, :]
+            x = np.clip(positions[..., 0].astype(np.intp), 0, img_width - 1)
+            y = np.clip(positions[..., 1].astype(np.intp), 0, img_height - 1)
+            along = pixels[y, x]
+            difference = ((along - colors[t][:, None, :]) ** 2).sum(axis=2) - ((along - colors[other][:, None, :]) ** 2).sum(axis=2)
+
+            # Each sample pushes the two points of its edge, weighted by how close it is to them
+            weight_a = (difference * (1 - samples)).mean(axis=1)
+            weight_b = (difference * samples).mean(axis=1)
+            gradient = np.zeros_like(points)
+            for axis in range(2):
+                gradient[:, axis] = (np.bincount(a, weights=weight_a * normal[:, axis], minlength=len(points))
+                                     + np.bincount(b, weights=weight_b * normal[:, axis], minlength=len(points)))
+            gradient[fixed] = 0
+
+            # Scale so a typical point moves step pixels, and no point moves further than that
+            length = np.sqrt((gradient ** 2).sum(axis=1))
+            scale = np.percentile(length[~fixed], 90) if (~fixed).any() else 0
+            if scale == 0:
+                break
+            displacement = gradient / scale
+            displacement /= np.maximum(1, length / scale)[:, None]
+            moved = points - step * displacement
+            moved[:, 0] = np.clip(moved[:, 0], 0, img_width)
+            moved[:, 1] = np.clip(moved[:, 1], 0, img_height)
+
+            moved_triangulation, moved_colors, moved_energy = self._mean_color_energy(flat_pixels, moved, (img_width, img_height))
+            improvement = energy - moved_energy
+            if improvement > 0:
+                points, triangulation, colors, energy = moved, moved_triangulation, moved_colors, moved_energy
+            else:
+                # The step overshot, stay put and try a smaller one
+                step /= 2
+
+            history.append(energy)
+            if callback is not None:
+                callback(iteration, energy, step)
+            if 0 < improvement < tolerance * energy or step < 1e-3:
+                break
+
+        return points, triangulation, history
+
+    def _mean_color_energy(self, flat_pixels: np.ndarray, points: np.ndarray, size: tuple) -> tuple:
+        """Triangulates the points and returns the triangulation, the mean color of every triangle and the mean
+        squared color error per pixel
+        """
+        triangulation = self.del_triangulation(points)
+        ids = self.triangle_id_map(triangulation, size).ravel()
+        inside = ids >= 0
+        ids = ids[inside]
+        num_triangles = len(triangulation.simplices)
+        counts = np.maximum(np.bincount(ids, minlength=num_triangles), 1)
+        colors = np.column_stack([np.bincount(ids, weights=flat_pixels[inside, channel], minlength=num_triangles)
+                                  for channel in range(3)]) / counts[:, None]
+        energy = ((flat_pixels[inside] - colors[ids]) ** 2).sum() / max(len(ids), 1)
+        return triangulation, colors, energy
+
+    def refine_points(self, img: Image, num_points: int, target_psnr: Optional[float] = None, coloring: Coloring = Coloring.MEAN, seed: Optional[int] = None) -> "Mesh":
+        """
+        Starts from the corner points and keeps adding a point inside the triangle with the largest color error, until
+        num_points were added or the art reaches target_psnr. The triangles are kept in a heap keyed on their error,
+        and every insertion only re-triangulates, recolors and re-measures the triangles it changed.
+
+        PARAMETERS:
+        img (image) - the image to approximate
+        num_points (integer) - the most points to add, on top of the four corners
+        target_psnr (float) - stop once the PSNR (dB) of the covered pixels reaches this, None to always add num_points
+        coloring (Coloring) - how the triangles are colored while refining
+        seed (integer) - unused, the refinement is deterministic. Accepted so it works like the other distributions
+
+        OUTPUT:
+        mesh (Mesh) - the refined mesh, its art is already drawn
+        """
+        points = self.generate_points(img, 0, Distribution.RANDOM)
+        triangulation = self.del_triangulation(points)
+        art = self.draw_triangulation(img, triangulation, points, coloring)
+        mesh = self.start_editing(img, triangulation, points, art, coloring, track_errors=True)
+
+        # Heap of (-error, sorted point indices, triangle index, insert position). Entries of triangles that an
+        # insertion replaced stay in the heap and are skipped when they come up, their row holds another triangle by then
+        heap = []
+
+        def push(indices: np.ndarray) -> None:
+            for index in indices.tolist():
+                # A triangle with only a few pixels can't get any better
+                if mesh.pixel_counts[index] >= 3 and mesh.errors[index] > 0:
+                    key = tuple(sorted(mesh.simplices[index].tolist()))
+                    heapq.heappush(heap, (-mesh.errors[index], key, index, tuple(mesh.worst[index])))
+
+        push(np.arange(len(mesh.simplices)))
+        added = 0
+        while added < num_points and heap:
+            if target_psnr is not None:
+                mse = mesh.errors.sum() / max(3 * mesh.pixel_counts.sum(), 1)
+                if mse == 0 or 10 * np.log10(255 ** 2 / mse) >= target_psnr:
+                    break
+
+            _, key, index, position = heapq.heappop(heap)
+            if tuple(sorted(mesh.simplices[index].tolist())) != key:
+                continue
+
+            # The point is inside the triangle, so the mesh doesn't have to search for it
+            changed = mesh.add_point(self._inside_point(mesh, key, position), index)
+            if not len(changed):
+                # Could not insert there, the entry is dropped so it isn't picked again
+                continue
+            added += 1
+            push(changed)
+
+        return mesh
+
+    def _inside_point(self, mesh: "Mesh", key: tuple, position: tuple) -> np.ndarray:
+        """Halfway between a triangle's centroid and its worst pixel, or just the centroid if that is too close to one of its points
+        """
+        corners = mesh.points[list(key)]
+        centroid = corners.mean(axis=0)
+        # Going all the way to the worst pixel chases noise and makes slivers, halfway did better on every test image
+        position = (centroid + np.asarray(position)) / 2
+        if (((corners - position) ** 2).sum(axis=1) < 0.25).any():
+            return centroid
+        return position
+
+    def start_editing(self, img: Image, triangulation: Delaunay, points: np.ndarray, art: Image, coloring: Coloring = Coloring.VERTEX, track_errors: bool = False) -> "Mesh":
+        """
+        Wraps drawn art in a Mesh, so points can be added and removed without re-triangulating and redrawing it all.
+
+        PARAMETERS:
+        img (image) - the image the art was drawn from
+        triangulation (Delanay object) - the triangulation the art was drawn with
+        points (array) - 2D array with the coordinates of the triangulation
+        art (image) - the art from draw_triangulation, it isn't modified
+        coloring (Coloring) - the coloring the art was drawn with
+        track_errors (bool) - keep the color error of every triangle up to date while editing
+
+        OUTPUT:
+        mesh (Mesh) - the editable mesh
+        """
+        pixels = self.image_pixels(img)
+        colors = self.mesh_colors(img, triangulation, points, coloring, pixels)
+        return Mesh(img, triangulation, points, colors, art, coloring, track_errors, pixels)
+
+    def del_triangulation(self, points: np.ndarray) -> Delaunay:
+        """
+        Performs the triangulation on the pointset.
+
+        PARAMETERS:
+        points (array) - array with all the points
+
+        OUTPUT:
+        del_triangulation (Denaunay) - the triangulation of Delaunay type
+        """
+        from scipy.spatial import Delaunay
+
+        # Perform Delaunay triangulation
+        del_triangulation = Delaunay(points)
+        return del_triangulation
+
+class Mesh:
+    """Delaunay triangulation that can be edited one point at a time. Only the triangles an edit touches are
+    recomputed, recolored and redrawn on the art.
+    """
+
+    # Per-triangle arrays. An edit reuses the rows of the triangles it removes, so a triangle keeps its index until
+    # it is removed
+    TRIANGLE_ARRAYS = ("simplices", "neighbors", "centers", "radii", "colors", "errors", "pixel_counts", "worst")
+
+    # Instance vars
+    points: np.ndarray
+    simplices: np.ndarray
+    # The triangle across the edge opposite of each point of a triangle, -1 on the border, like Delaunay.neighbors
+    neighbors: np.ndarray
+    # One of the triangles around every point, where a walk around the point starts
+    point_triangles: np.ndarray
+    colors: np.ndarray
+    art: Image
+    coloring: Coloring
+    # Only kept up to date with track_errors: squared color error, pixel count and worst pixel of every triangle
+    errors: Optional[np.ndarray]
+    pixel_counts: Optional[np.ndarray]
+    worst: Optional[np.ndarray]
+
+    def __init__(self, img: Image, triangulation: Delaunay, points: np.ndarray, colors: np.ndarray, art: Image, coloring: Coloring, track_errors: bool = False, pixels: Optional[np.ndarray] = None) -> None:
+        """
+        PARAMETERS:
+        img (image) - the image the art was drawn from, at the same size as the art
+        triangulation (Delanay object) - the triangulation of points
+        points (array) - 2D array with the coordinates of the triangulation
+        colors (array) - the color of every triangle
+        art (image) - the drawn art, it is copied and then edited in place
+        coloring (Coloring) - how new triangles are colored
+        track_errors (bool) - keep the color error of every triangle up to date, see triangle_errors
+        pixels (np.ndarray) - img already decoded by Model.image_pixels, None to decode it here
+        """
+        self.pixels = np.asarray(img.convert("RGB")) if pixels is None else pixels
+        self.art = art.copy()
+        self.coloring = coloring
+        self._draw = ImageDraw.Draw(self.art)
+        # The arrays are the first rows of bigger buffers, so new points and triangles usually fit without copying them
+        self._buffers = {}
+        self._store(points=np.array(points, dtype=float), simplices=np.array(triangulation.simplices),
+                    colors=np.array(colors, dtype=np.uint8))
+        centers, radii = self._circumcircles(self.simplices)
+        point_triangles = np.full(len(self.points), -1, dtype=np.intp)
+        point_triangles[self.simplices.ravel()] = np.repeat(np.arange(len(self.simplices)), 3)
+        self._store(centers=centers, radii=radii, neighbors=self._neighbors(self.simplices),
+                    point_triangles=point_triangles)
+        # Triangles taken out by the last edit
+        self.removed = np.empty((0, 3), dtype=self.simplices.dtype)
+
+        self.errors = self.pixel_counts = self.worst = None
+        if track_errors:
+            errors, counts, worst = self.triangle_errors(np.arange(len(self.simplices)))
+            self._store(errors=errors, pixel_counts=counts, worst=worst)
+
+    # Methods:
+    def add_point(self, point: tuple, start: Optional[int] = None) -> np.ndarray:
+        """
+        Inserts a point with the Bowyer-Watson algorithm: the triangles whose circumcircle contains the point are
+        removed and the hole is filled with a fan around the new point. Those triangles are found by walking over the
+        neighbors of the triangle containing the point, so an insertion only looks at the triangles around it.
+
+        PARAMETERS:
+        point (tuple) - (x, y) of the new point, it must be inside the triangulation
+        start (integer) - triangle the search for the point starts from, the closer the faster (see locate)
+
+        OUTPUT:
+        changed (np.ndarray) - indices of the new triangles, empty if the point couldn't be added
+        """
+        point = np.asarray(point, dtype=float)
+        first = self.locate(point, start)
+        # Outside of the mesh, or right on one of its points
+        if first < 0 or (self.points[self.simplices[first]] == point).all(axis=1).any():
+            return np.empty(0, dtype=int)
+        if not self._in_circle(first, point):
+            return np.empty(0, dtype=int)
+
+        # Grow the cavity over the neighbors whose circumcircle contains the point too. The edges to the ones that
+        # don't are the border of the hole, as (triangle, edge, triangle across it, its edge back)
+        cavity = [first]
+        inside = {first}
+        border = []
+        for triangle in cavity:
+            for edge, other in enumerate(self.neighbors[triangle].tolist()):
+                if other in inside:
+                    continue
+                if other >= 0 and self._in_circle(other, point):
+                    cavity.append(other)
+                    inside.add(other)
+                else:
+                    # Looked up before any row is reused
+                    back = self.neighbors[other].tolist().index(triangle) if other >= 0 else -1
+                    border.append((triangle, edge, other, back))
+
+        # Every border edge gets a triangle with the new point in place of the corner opposite of it
+        new_index = len(self.points)
+        self._grow(("points", "point_triangles"), new_index + 1)
+        self.points[new_index] = point
+        new_simplices = self.simplices[[triangle for triangle, _, _, _ in border]]
+        new_simplices[np.arange(len(border)), [edge for _, edge, _, _ in border]] = new_index
+        changed = self._replace(np.array(cavity), new_simplices)
+
+        # The new triangles neighbor the triangle across their border edge, and the two new triangles that share
+        # their other corners
+        ring = {}
+        for row, (_, edge, other, back), simplex in zip(changed.tolist(), border, new_simplices.tolist()):
+            self.neighbors[row, edge] = other
+            if other >= 0:
+                self.neighbors[other, back] = row
+            for corner in ((edge + 1) % 3, (edge + 2) % 3):
+                # The edge from the new point to this corner is opposite of the remaining corner
+                ring.setdefault(simplex[corner], []).append((row, 3 - edge - corner))
+        for (row, edge), (other, other_edge) in ring.values():
+            self.neighbors[row, edge] = other
+            self.neighbors[other, other_edge] = row
+        return changed
+
+    def remove_point(self, index: int) -> np.ndarray:
+        """
+        Removes a point. The hole left by its triangles is filled with the Delaunay triangles of the surrounding
+        points that lie inside the hole. Points on the outer border of the triangulation are kept. Like add_point,
+        only the triangles around the point are looked at: the last point takes the index of the removed one, and the
+        last triangles take the rows left over.
+
+        PARAMETERS:
+        index (integer) - index of the point in points
+
+        OUTPUT:
+        changed (np.ndarray) - indices of the new triangles, empty if the point couldn't be removed
+        """
+        star, border = self._star(index)
+        if border or len(star) < 3:
+            return np.empty(0, dtype=int)
+
+        # The edges opposite of the point form a closed polygon around it. Each one is kept with the triangle on its
+        # other side (-1 on the border of the mesh), and where that triangle points back
+        simplices = self.simplices[star]
+        outside = {}
+        for triangle, simplex in zip(star.tolist(), simplices.tolist()):
+            corner = simplex.index(index)
+            other = int(self.neighbors[triangle, corner])
+            edge = tuple(sorted((simplex[(corner + 1) % 3], simplex[(corner + 2) % 3])))
+            outside[edge] = (other, self.neighbors[other].tolist().index(triangle) if other >= 0 else -1)
+        opposite = simplices[simplices != index].reshape(-1, 2)
+        ring = np.unique(opposite)
+
+        from scipy.spatial import Delaunay
+
+        try:
+            hole = Delaunay(self.points[ring])
+        except Exception:
+            # Degenerate ring (e.g. all points on one line), leave the mesh as it is
+            return np.empty(0, dtype=int)
+
+        # Keep the triangles whose centroid is inside the polygon
+        centroids = self.points[ring][hole.simplices].mean(axis=1)
+        polygon = self.points[opposite]
+        inside = self._inside_polygon(centroids, polygon)
+        new_simplices = ring[hole.simplices[inside]]
+        # A polygon of n edges is always filled with n - 2 triangles, anything else means a degenerate ring
+        if len(new_simplices) != len(star) - 2:
+            return np.empty(0, dtype=int)
+        changed = self._replace(star, new_simplices)
+
+        # The new triangles neighbor the triangles outside of the polygon across its edges, and each other inside it
+        inner = {}
+        for row, simplex in zip(changed.tolist(), new_simplices.tolist()):
+            for corner in range(3):
+                edge = tuple(sorted((simplex[(corner + 1) % 3], simplex[(corner + 2) % 3])))
+                if edge in outside:
+                    other, back = outside[edge]
+                    self.neighbors[row, corner] = other
+                    if other >= 0:
+                        self.neighbors[other, back] = row
+                else:
+                    inner.setdefault(edge, []).append((row, corner))
+        for (row, corner), (other, other_corner) in inner.values():
+            self.neighbors[row, corner] = other
+            self.neighbors[other, other_corner] = row
+        moved = self._drop(star[len(new_simplices):])
+        changed = np.array([moved.get(row, row) for row in changed.tolist()], dtype=int)
+
+        # The last point moves into the index of the removed one
+        last = len(self.points) - 1
+        if index != last:
+            around, _ = self._star(last)
+            self.points[index] = self.points[last]
+            self.point_triangles[index] = self.point_triangles[last]
+            simplices = self.simplices[around]
+            simplices[simplices == last] = index
+            self.simplices[around] = simplices
+        self._grow(("points", "point_triangles"), last)
+        return changed
+
+    def _star(self, index: int) -> tuple:
+        """(triangles around a point, whether the point is on the border of the mesh). Turns around the point over the
+        neighbors, starting from its triangle in point_triangles
+        """
+        first = int(self.point_triangles[index])
+        if first < 0:
+            # A duplicate point the triangulation left out, it isn't part of the mesh
+            return np.empty(0, dtype=int), True
+        star = [first]
+        seen = {first}
+        border = False
+        for triangle in star:
+            corner = self.simplices[triangle].tolist().index(index)
+            # The two edges that meet at the point
+            for edge in ((corner + 1) % 3, (corner + 2) % 3):
+                other = int(self.neighbors[triangle, edge])
+                if other < 0:
+                    border = True
+                elif other not in seen:
+                    star.append(other)
+                    seen.add(other)
+        return np.array(star), border
+
+    def nearest_point(self, point: tuple) -> int:
+        """Index of the point closest to (x, y)
+        """
+        return int(((self.points - np.asarray(point, dtype=float)) ** 2).sum(axis=1).argmin())
+
+    def locate(self, point: np.ndarray, start: Optional[int] = None) -> int:
+        """Index of the triangle that contains the point, -1 if it is outside of the triangulation. Walks from the start
+        triangle (the last one in simplices by default) over the edges the point is behind, like Delaunay.find_simplex
+        """
+        x, y = np.asarray(point, dtype=float).tolist()
+        triangle = len(self.simplices) - 1 if start is None else start
+        # A walk through a Delaunay triangulation never visits a triangle twice
+        for _ in range(len(self.simplices)):
+            corners = self.points[self.simplices[triangle]].tolist()
+            for edge in range(3):
+                (ax, ay), (bx, by) = corners[(edge + 1) % 3], corners[(edge + 2) % 3]
+                side = (bx - ax) * (y - ay) - (by - ay) * (x - ax)
+                corner = (bx - ax) * (corners[edge][1] - ay) - (by - ay) * (corners[edge][0] - ax)
+                # The point and the triangle's own corner are on different sides of the edge
+                if side * corner < 0:
+                    triangle = int(self.neighbors[triangle, edge])
+                    break
+            else:
+                return triangle
+            if triangle < 0:
+                return -1
+        return -1
+
+    def _in_circle(self, triangle: int, point: np.ndarray) -> bool:
+        """Whether the point is strictly inside the circumcircle of a triangle
+        """
+        return ((self.centers[triangle] - point) ** 2).sum() < self.radii[triangle]
+
+    def _store(self, **arrays) -> None:
+        """Replaces whole arrays, they become the buffers that later rows are added to
+        """
+        for name, array in arrays.items():
+            self._buffers[name] = array
+            setattr(self, name, array)
+
+    def _grow(self, names: tuple, count: int) -> None:
+        """Makes the arrays the first count rows of their buffers. A buffer that is too small is swapped for one twice
+        as big, so adding one point at a time only copies the arrays every so often
+        """
+        for name in names:
+            if name not in self._buffers:
+                continue
+            buffer = self._buffers[name]
+            if len(buffer) < count:
+                grown = np.empty((max(count, 2 * len(buffer)),) + buffer.shape[1:], dtype=buffer.dtype)
+                grown[:len(buffer)] = buffer
+                self._buffers[name] = buffer = grown
+            setattr(self, name, buffer[:count])
+
+    def _replace(self, old: np.ndarray, new_simplices: np.ndarray) -> np.ndarray:
+        """Swaps the old triangles for the new ones, colors the new ones and draws them on the art. The new triangles
+        take the rows of the old ones, the neighbors of the new rows are left for the caller to set
+        """
+        self.removed = self.simplices[old]
+        centers, radii = self._circumcircles(new_simplices)
+        found = None
+        if self.coloring != Coloring.VERTEX or self.errors is not None:
+            found = self.triangle_pixels(new_simplices)
+        colors = self._triangle_colors(new_simplices, found)
+
+        # With fewer new triangles than old ones, the caller drops the old rows left over with _drop
+        size = len(self.simplices)
+        extra = max(len(new_simplices) - len(old), 0)
+        rows = np.concatenate([old, np.arange(size, size + extra)])[:len(new_simplices)]
+        self._grow(self.TRIANGLE_ARRAYS, size + extra)
+
+        self.simplices[rows] = new_simplices
+        self.point_triangles[new_simplices.ravel()] = np.repeat(rows, 3)
+        self.centers[rows] = centers
+        self.radii[rows] = radii
+        self.colors[rows] = colors
+        if self.errors is not None:
+            self.errors[rows], self.pixel_counts[rows], self.worst[rows] = self._measure(new_simplices, colors, found)
+
+        # The new triangles cover exactly the area of the removed ones, so drawing over it is enough
+        if self.coloring == Coloring.GOURAUD:
+            self._shade(new_simplices, found)
+        else:
+            for triangle, color in zip(self.points[new_simplices].reshape(-1, 6).tolist(), colors.tolist()):
+                self._draw.polygon(triangle, tuple(color))
+
+        return rows
+
+    def _drop(self, rows: np.ndarray) -> dict:
+        """Removes triangle rows by moving the last triangles into them, the neighbors of the moved ones are pointed to
+        their new rows. Returns {old row: new row} of the moved triangles
+        """
+        size = len(self.simplices) - len(rows)
+        dropped = set(rows.tolist())
+        holes = sorted(row for row in dropped if row < size)
+        tail = [row for row in range(size, size + len(rows)) if row not in dropped]
+        moved = {}
+        for hole, row in zip(holes, tail):
+            for name in self.TRIANGLE_ARRAYS:
+                if name in self._buffers:
+                    array = getattr(self, name)
+                    array[hole] = array[row]
+            for other in self.neighbors[hole].tolist():
+                if other >= 0:
+                    self.neighbors[other, self.neighbors[other].tolist().index(row)] = hole
+            self.point_triangles[self.simplices[hole]] = hole
+            moved[row] = hole
+        self._grow(self.TRIANGLE_ARRAYS, size)
+        return moved
+
+    @staticmethod
+    def _neighbors(simplices: np.ndarray) -> np.ndarray:
+        """The neighbors array of a whole triangulation, by matching up the triangles' edges
+        """
+        # Edge i of a triangle is the one opposite of its point i
+        edges = np.sort(simplices[:, [[1, 2], [2, 0], [0, 1]]].reshape(-1, 2), axis=1).astype(np.int64)
+        keys = edges[:, 0] * (int(simplices.max(initial=0)) + 1) + edges[:, 1]
+        order = np.argsort(keys, kind="stable")
+        # An inner edge is in two triangles, they are next to each other once sorted
+        pairs = np.flatnonzero(keys[order][1:] == keys[order][:-1])
+        neighbors = np.full(len(edges), -1, dtype=simplices.dtype)
+        neighbors[order[pairs]] = order[pairs + 1] // 3
+        neighbors[order[pairs + 1]] = order[pairs] // 3
+        return neighbors.reshape(-1, 3)
+
+    def _circumcircles(self, simplices: np.ndarray) -> tuple:
+        """Circumcenters and squared circumradii of the triangles
+        """
+        a, b, c = (self.points[simplices[:, i]] for i in range(3))
+        b = b - a
+        c = c - a
+        d = 2 * (b[:, 0] * c[:, 1] - b[:, 1] * c[:, 0])
+        # Flat triangles get an empty circle so they are never part of a cavity
+        d[d == 0] = np.inf
+        b2 = (b ** 2).sum(axis=1)
+        c2 = (c ** 2).sum(axis=1)
+        offset = np.column_stack([(c[:, 1] * b2 - b[:, 1] * c2) / d, (b[:, 0] * c2 - c[:, 0] * b2) / d])
+        return a + offset, (offset ** 2).sum(axis=1)
+
+    def _triangle_colors(self, simplices: np.ndarray, found: Optional[tuple] = None) -> np.ndarray:
+        """Colors of a few triangles, matching Model.triangle_colors and Model.area_colors. found can pass in the
+        result of triangle_pixels for these triangles
+        """
+        img_height, img_width = self.pixels.shape[:2]
+        corners = self.points[simplices].astype(np.intp)
+        x = np.clip(corners[..., 0], 0, img_width - 1)
+        y = np.clip(corners[..., 1], 0, img_height - 1)
+        colors = (self.pixels[y, x].astype(np.uint16).sum(axis=1) // 3).astype(np.uint8)
+        if self.coloring in (Coloring.VERTEX, Coloring.GOURAUD):
+            return colors
+
+        owner, xy, pixels = found if found is not None else self.triangle_pixels(simplices)
+        counts = np.bincount(owner, minlength=len(simplices))
+        covered = counts > 0
+        if self.coloring == Coloring.MEAN:
+            for channel in range(3):
+                sums = np.bincount(owner, weights=pixels[:, channel], minlength=len(simplices))
+                colors[covered, channel] = (sums[covered] / counts[covered]).astype(np.uint8)
+            return colors
+
+        # The pixels of every triangle are one run, in triangle order
+        starts = np.cumsum(counts) - counts
+        for i in np.flatnonzero(covered):
+            run = pixels[starts[i]:starts[i] + counts[i]]
+            if self.coloring == Coloring.MEDIAN:
+                colors[i] = np.sort(run, axis=0)[len(run) // 2]
+            elif self.coloring == Coloring.DOMINANT:
+                bins, bin_counts = np.unique(run >> 3, axis=0, return_counts=True)
+                colors[i] = bins[bin_counts.argmax()] * 8 + 4
+        return colors
+
+    def _shade(self, simplices: np.ndarray, found: tuple) -> None:
+        """Draws Gouraud shaded triangles like Model.shade: the corner colors blended with the barycentric coordinates
+        of every pixel found inside them
+        """
+        owner, xy, _ = found
+        if not len(owner):
+            return
+        img_height, img_width = self.pixels.shape[:2]
+        triangles = self.points[simplices]
+        corners = triangles.astype(np.intp)
+        x = np.clip(corners[..., 0], 0, img_width - 1)
+        y = np.clip(corners[..., 1], 0, img_height - 1)
+        corner_colors = self.pixels[y, x].astype(np.float64)
+
+        a, b, c = (triangles[owner, i] for i in range(3))
+        centers = xy + 0.5
+        area = self._cross(a, b, c)
+        # Flat triangles get the color of their last corner
+        area[area == 0] = np.inf
+        weight_a = self._cross(b, c, centers) / area
+        weight_b = self._cross(c, a, centers) / area
+        weight_c = 1 - weight_a - weight_b
+        colors = (weight_a[:, None] * corner_colors[owner, 0] + weight_b[:, None] * corner_colors[owner, 1]
+                  + weight_c[:, None] * corner_colors[owner, 2])
+
+        # Only the box around the new triangles is copied out of the art and pasted back
+        left, top = xy.min(axis=0)
+        right, bottom = xy.max(axis=0) + 1
+        box = (int(left), int(top), int(right), int(bottom))
+        region = np.array(self.art.crop(box))
+        region[xy[:, 1] - top, xy[:, 0] - left] = np.clip(np.rint(colors), 0, 255).astype(np.uint8)
+        self.art.paste(Image.fromarray(region), box)
+
+    def triangle_pixels(self, simplices: np.ndarray) -> tuple:
+        """
+        Finds the pixels whose centers are inside some triangles, all triangles at once.
+
+        PARAMETERS:
+        simplices (array) - (n, 3) indices of the triangles' points
+
+        OUTPUT:
+        (owner, xy, pixels) - for every pixel found: the row in simplices of its triangle (ascending), its integer
+        (x, y) and its color
+        """
+        img_height, img_width = self.pixels.shape[:2]
+        triangles = self.points[simplices]
+
+        # Every pixel row whose center line crosses a triangle, as (triangle, y) pairs
+        top = np.clip(np.ceil(triangles[:, :, 1].min(axis=1) - 0.5).astype(np.intp), 0, img_height)
+        bottom = np.clip(np.floor(triangles[:, :, 1].max(axis=1) - 0.5).astype(np.intp) + 1, 0, img_height)
+        rows = np.maximum(bottom - top, 0)
+        row_owner = np.repeat(np.arange(len(simplices)), rows)
+        y = top[row_owner] + np.arange(len(row_owner)) - np.repeat(np.cumsum(rows) - rows, rows)
+        center_y = y + 0.5
+
+        # Where the row's center line crosses the three edges gives the span of the row inside the triangle
+        left = np.full(len(row_owner), np.inf)
+        right = np.full(len(row_owner), -np.inf)
+        corner = triangles[row_owner]
+        for start, end in ((0, 1), (1, 2), (2, 0)):
+            p, q = corner[:, start], corner[:, end]
+            low, high = np.minimum(p[:, 1], q[:, 1]), np.maximum(p[:, 1], q[:, 1])
+            crossing = (low <= center_y) & (center_y <= high)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t = np.where(high > low, (center_y - p[:, 1]) / (q[:, 1] - p[:, 1]), 0)
+            x = p[:, 0] + t * (q[:, 0] - p[:, 0])
+            left = np.where(crossing, np.minimum(left, np.minimum(x, np.where(high > low, x, q[:, 0]))), left)
+            right = np.where(crossing, np.maximum(right, np.maximum(x, np.where(high > low, x, q[:, 0]))), right)
+
+        # Pixel centers x + 0.5 within [left, right]
+        first = np.clip(np.ceil(left - 0.5), 0, img_width).astype(np.intp)
+        last = np.clip(np.floor(right - 0.5) + 1, 0, img_width).astype(np.intp)
+        lengths = np.maximum(last - first, 0)
+
+        owner = np.repeat(row_owner, lengths)
+        xs = np.repeat(first, lengths) + np.arange(len(owner)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        xy = np.column_stack([xs, np.repeat(y, lengths)])
+        return owner, xy, self.pixels[xy[:, 1], xy[:, 0]]
+
+    def triangle_errors(self, indices: np.ndarray) -> tuple:
+        """
+        Squared color error of some triangles of the mesh.
+
+        PARAMETERS:
+        indices (array) - indices of the triangles in simplices
+
+        OUTPUT:
+        (errors, counts, worst) - summed squared error and pixel count of every triangle, and the (x, y) of the pixel
+        with the largest error in it (the centroid for triangles without pixels)
+        """
+        simplices = self.simplices[indices]
+        return self._measure(simplices, self.colors[indices], self.triangle_pixels(simplices))
+
+    def _measure(self, simplices: np.ndarray, colors: np.ndarray, found: tuple) -> tuple:
+        """triangle_errors for triangles with known colors and pixels
+        """
+        owner, xy, pixels = found
+        difference = pixels.astype(np.int32) - colors[owner]
+        pixel_errors = (difference * difference).sum(axis=1)
+        errors = np.bincount(owner, weights=pixel_errors, minlength=len(simplices))
+        counts = np.bincount(owner, minlength=len(simplices))
+
+        worst = self.points[simplices].mean(axis=1)
+        if len(owner):
+            # owner is ascending, so every triangle's pixels are one run and its largest error is one reduceat
+            covered = np.flatnonzero(counts)
+            largest = np.zeros(len(simplices))
+            largest[covered] = np.maximum.reduceat(pixel_errors, (np.cumsum(counts) - counts)[covered])
+            # The last pixel with the largest error of each triangle
+            hits = np.flatnonzero(pixel_errors == largest[owner])
+            last = hits[np.r_[owner[hits][1:] != owner[hits][:-1], True]]
+            worst[owner[last]] = xy[last] + 0.5
+        return errors, counts, worst
+
+    @staticmethod
+    def _cross(a: np.ndarray, b: np.ndarray, p: np.ndarray) -> np.ndarray:
+        """Which side of the line a -> b the points p are on
+        """
+        return (b[..., 0] - a[..., 0]) * (p[..., 1] - a[..., 1]) - (b[..., 1] - a[..., 1]) * (p[..., 0] - a[..., 0])
+
+    @staticmethod
+    def _inside_polygon(points: np.ndarray, edges: np.ndarray) -> np.ndarray:
+        """Even-odd test of points against a polygon given as an unordered list of (start, end) edges
+        """
+        start, end = edges[:, 0], edges[:, 1]
+        px, py = points[:, 0:1], points[:, 1:2]
+        crosses = (start[:, 1] > py) != (end[:, 1] > py)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            x_cross = start[:, 0] + (py - start[:, 1]) * (end[:, 0] - start[:, 0]) / (end[:, 1] - start[:, 1])
+        return (crosses & (px < x_cross)).sum(axis=1) % 2 == 1
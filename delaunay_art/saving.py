@@ -0,0 +1,198 @@
+# Saving images with the settings of every format, on background threads so rendering doesn't wait for the encoder
+
+import argparse
+import io
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from PIL import Image
+from typing import Callable, Optional
+
+# What PIL uses when nothing is given: zlib level 6 for PNG. JPEG and WebP default to 75, which blurs triangle edges
+PNG_COMPRESS_LEVEL = 6
+QUALITY = 90
+
+def save_options(path: str, compress_level: Optional[int] = None, optimize: bool = False, quality: Optional[int] = None) -> dict:
+    """
+    The keyword arguments of Image.save for the format of a path. Settings that don't apply to it are left out.
+
+    PARAMETERS:
+    path (string) - the file, its extension picks the format
+    compress_level (integer) - PNG zlib level, 0 (no compression, fastest) to 9 (smallest), None for 6
+    optimize (bool) - PNG and JPEG search for the smallest encoding, WebP uses its slowest method. Takes longer
+    quality (integer) - JPEG and WebP quality, 1 to 100, None for 90
+
+    OUTPUT:
+    options (dict) - keyword arguments for Image.save
+    """
+    extension = os.path.splitext(path)[1].lower()
+    quality = QUALITY if quality is None else quality
+    if extension == ".png":
+        return {"compress_level": PNG_COMPRESS_LEVEL if compress_level is None else compress_level, "optimize": optimize}
+    if extension in (".jpg", ".jpeg"):
+        return {"quality": quality, "optimize": optimize}
+    if extension == ".webp":
+        return {"quality": quality, "method": 6 if optimize else 4}
+    return {}
+
+def sized_path(path: str, size: tuple) -> str:
+    """art.png at (256, 203) becomes art_256x203.png
+    """
+    stem, extension = os.path.splitext(path)
+    return f"{stem}_{size[0]}x{size[1]}{extension}"
+
+def format_bytes(count: int) -> str:
+    """A file size for people, like 1.4 MB
+    """
+    if count < 1024:
+        return f"{count} bytes"
+    if count < 1024 ** 2:
+        return f"{count / 1024:.1f} KB"
+    return f"{count / 1024 ** 2:.1f} MB"
+
+def encode(art: Image, path: str, compress_level: Optional[int] = None, optimize: bool = False, quality: Optional[int] = None) -> bytes:
+    """
+    Encodes an image in memory in the format of a path.
+
+    PARAMETERS:
+    art (image) - the image
+    path (string) - the file it is meant for, its extension picks the format
+    compress_level, optimize, quality - see save_options
+
+    OUTPUT:
+    data (bytes) - the encoded file
+    """
+    extension = os.path.splitext(path)[1].lower()
+    image_format = Image.registered_extensions().get(extension)
+    if image_format is None:
+        raise ValueError(f"Can't save images as {extension or 'no extension'}")
+    # JPEG has no palette or transparency, the paletted art is saved with the same colors
+    if image_format == "JPEG" and art.mode not in ("RGB", "L"):
+        art = art.convert("RGB")
+    buffer = io.BytesIO()
+    art.save(buffer, image_format, **save_options(path, compress_level, optimize, quality))
+    return buffer.getvalue()
+
+def save_image(art: Image, path: str, sizes: Optional[list] = None, compress_level: Optional[int] = None, optimize: bool = False, quality: Optional[int] = None, progress: Optional[Callable[[int, int, dict], None]] = None) -> list:
+    """
+    Encodes and writes an image, and optionally smaller copies of it from the same render. Every file is encoded in
+    memory and written next to its path before being renamed, so a failed save never leaves half a file behind.
+
+    PARAMETERS:
+    art (image) - the image
+    path (string) - where to save the full size, its extension picks the format
+    sizes (list) - what to save: None for the full size at path, an integer for a copy whose longest side is at most
+                   that many pixels, saved as path with its size added (see sized_path). None saves only the full size
+    compress_level, optimize, quality - encoder settings, see save_options
+    progress (function) - called with (files done, number of files, result) after every file
+
+    OUTPUT:
+    results (list) - a dict per file: "path", "size" (width, height), "bytes" and the "seconds" it took
+    """
+    sizes = sizes or [None]
+    results = []
+    for index, longest in enumerate(sizes):
+        start = time.perf_counter()
+        image = art
+        if longest is not None and max(art.size) > longest:
+            image = art.copy()
+            image.thumbnail((longest, longest))
+        target = path if longest is None else sized_path(path, image.size)
+
+        data = encode(image, target, compress_level, optimize, quality)
+        try:
+            with open(target + ".part", "wb") as file:
+                file.write(data)
+            os.replace(target + ".part", target)
+        except OSError:
+            if os.path.exists(target + ".part"):
+                os.remove(target + ".part")
+            raise
+
+        result = {"path": target, "size": image.size, "bytes": len(data), "seconds": time.perf_counter() - start}
+        results.append(result)
+        if progress is not None:
+            progress(index + 1, len(sizes), result)
+    return results
+
+def written(path: str, size: tuple, seconds: float) -> dict:
+    """The result save_image gives, for a file that was written some other way, like a tiled PNG or an SVG
+    """
+    return {"path": path, "size": tuple(size), "bytes": os.path.getsize(path), "seconds": seconds}
+
+def fit(size: tuple, longest: int) -> tuple:
+    """The size of a copy of size whose longest side is at most longest pixels, like Image.thumbnail picks
+    """
+    scale = min(1.0, longest / max(size))
+    return max(1, round(size[0] * scale)), max(1, round(size[1] * scale))
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Adds the encoder settings to a command line parser, options_from_args reads them back
+    """
+    parser.add_argument("--compress-level", type=int, choices=range(10), metavar="0-9",
+                        help=f"PNG zlib level, 0 is fastest and 9 smallest (default: {PNG_COMPRESS_LEVEL})")
+    parser.add_argument("--optimize", action="store_true", help="smallest PNG/JPEG and slowest WebP method, takes longer")
+    parser.add_argument("--quality", type=int, help=f"JPEG/WebP quality from 1 to 100 (default: {QUALITY})")
+    parser.add_argument("--thumbnails", type=int, nargs="+", default=[], metavar="PIXELS",
+                        help="also save copies of the image whose longest side is this many pixels")
+
+def options_from_args(args: argparse.Namespace) -> dict:
+    """The keyword arguments of save_image and Saver.submit from the options add_arguments added
+    """
+    return {"sizes": [None] + args.thumbnails, "compress_level": args.compress_level, "optimize": args.optimize,
+            "quality": args.quality}
+
+class Saver:
+    """Encodes and writes images on background threads. submit returns right away while fewer than max_pending saves
+    are waiting, so the next image renders during the encoding of the last one without images piling up in memory
+    """
+
+    # Instance vars
+    max_pending: int
+
+    def __init__(self, workers: int = 1, max_pending: Optional[int] = None) -> None:
+        """
+        PARAMETERS:
+        workers (integer) - threads encoding at the same time. PIL lets go of the GIL while it compresses
+        max_pending (integer) - saves submitted but not finished before submit waits, None for twice the workers
+        """
+        self.max_pending = max_pending or 2 * workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="saver")
+        self._pending = deque()
+
+    # Methods:
+    def submit(self, art: Image, path: str, sizes: Optional[list] = None, progress: Optional[Callable[[int, int, dict], None]] = None, **options) -> Future:
+        """
+        Queues a save_image call. The image must not be changed afterwards.
+
+        PARAMETERS:
+        art (image) - the image
+        path (string) - where to save the full size
+        sizes (list) - the sizes to save, see save_image
+        progress (function) - called on the saving thread with (files done, number of files, result)
+        options - compress_level, optimize and quality, see save_options
+
+        OUTPUT:
+        future (Future) - gives the list of results of save_image, or raises its error
+        """
+        while self._pending and self._pending[0].done():
+            self._pending.popleft()
+        # Wait for the oldest saves, their errors stay on their futures for whoever submitted them
+        while len(self._pending) >= self.max_pending:
+            self._pending.popleft().exception()
+
+        future = self._executor.submit(save_image, art, path, sizes, progress=progress, **options)
+        self._pending.append(future)
+        return future
+
+    def close(self, wait: bool = True) -> None:
+        """Stops taking saves. With wait, returns once every submitted save is written
+        """
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self) -> "Saver":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,325 @@
+# Tiled rendering for outputs too big to hold in memory at once (large prints, gigapixel images)
+
+import os
+import zlib
+import struct
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from PIL import Image, ImageDraw
+from typing import Optional
+
+# The formats save can stream out tile by tile
+EXTENSIONS = (".npy", ".png", ".tif", ".tiff")
+
+# Tiles are square, this many pixels on a side. A tile canvas takes 3 * TILE_SIZE^2 bytes
+TILE_SIZE = 2048
+
+# Tiles are drawn with this many extra pixels around them (inside the image) and then cropped. PIL fills polygons
+# that cross the edge of the canvas slightly differently, so this keeps the seams identical to a single full-size draw
+MARGIN = 32
+
+# Rows are compressed this many at a time when a PNG is streamed out of the buffer
+PNG_ROWS = 256
+
+def tile_index(triangles: np.ndarray, size: tuple, tile_size: int = TILE_SIZE) -> tuple:
+    """
+    Spatial index over the bounding boxes of the triangles: a grid of tiles, each with the triangles whose bounding box
+    overlaps it. Stored like a sparse matrix, so the whole index is a few arrays no matter how many tiles there are.
+
+    PARAMETERS:
+    triangles (np.ndarray) - (number of triangles, 6) array of [x1, y1, x2, y2, x3, y3] in output pixels
+    size (tuple) - (width, height) of the output
+    tile_size (integer) - width and height of a tile
+
+    OUTPUT:
+    (offsets, order) - the triangles of tile t are order[offsets[t]:offsets[t + 1]], in drawing order. Tiles are
+                       numbered row by row
+    """
+    width, height = size
+    columns, rows = -(-width // tile_size), -(-height // tile_size)
+    xs, ys = triangles[:, 0::2], triangles[:, 1::2]
+
+    # Range of tiles covered by every bounding box, grown by the margin the tiles are drawn with
+    x0 = np.clip(np.floor(xs.min(axis=1) - MARGIN - 1) // tile_size, 0, columns - 1).astype(np.int64)
+    x1 = np.clip(np.floor(xs.max(axis=1) + MARGIN + 1) // tile_size, 0, columns - 1).astype(np.int64)
+    y0 = np.clip(np.floor(ys.min(axis=1) - MARGIN - 1) // tile_size, 0, rows - 1).astype(np.int64)
+    y1 = np.clip(np.floor(ys.max(axis=1) + MARGIN + 1) // tile_size, 0, rows - 1).astype(np.int64)
+
+    # One entry per (triangle, tile) pair. Most triangles are far smaller than a tile and only get one
+    spans_x, spans_y = x1 - x0 + 1, y1 - y0 + 1
+    counts = spans_x * spans_y
+    owner = np.repeat(np.arange(len(triangles)), counts)
+    step = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    tiles = (y0[owner] + step // spans_x[owner]) * columns + x0[owner] + step % spans_x[owner]
+
+    # A stable sort keeps the triangles of each tile in their original order, so shared edges end up like a full draw
+    order = owner[np.argsort(tiles, kind="stable")]
+    offsets = np.zeros(columns * rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(tiles, minlength=columns * rows), out=offsets[1:])
+    return offsets, order
+
+def draw_tile(shape: tuple, box: tuple, triangles: np.ndarray, colors: np.ndarray) -> np.ndarray:
+    """
+    Draws one tile of the image.
+
+    PARAMETERS:
+    shape (tuple) - (height, width) of the whole image
+    box (tuple) - (x0, y0, x1, y1) of the tile
+    triangles (np.ndarray) - (n, 6) array of the triangles that overlap the tile, in output pixels
+    colors (np.ndarray) - (n, 3) uint8 array with their colors
+
+    OUTPUT:
+    pixels (np.ndarray) - (y1 - y0, x1 - x0, 3) uint8 array, the same pixels a full-size draw has there
+    """
+    x0, y0, x1, y1 = box
+    # The margin stops at the edges of the image, where the full-size canvas ends too
+    left, top = max(0, x0 - MARGIN), max(0, y0 - MARGIN)
+    right, bottom = min(shape[1], x1 + MARGIN), min(shape[0], y1 + MARGIN)
+    canvas = Image.new("RGB", (right - left, bottom - top), "white")
+    draw = ImageDraw.Draw(canvas)
+
+    # Same polygon calls as Model.draw_triangulation, moved to the corner of the canvas. PIL truncates the corners to
+    # integers, so truncate before moving them or corners left of or above the canvas would round differently
+    shifted = (np.trunc(triangles) - np.tile([left, top], 3)).tolist()
+    for triangle, color in zip(shifted, colors.tolist()):
+        draw.polygon(triangle, tuple(color))
+
+    return np.asarray(canvas)[y0 - top:y1 - top, x0 - left:x1 - left]
+
+def render_tile(job: tuple) -> tuple:
+    """
+    Draws one tile and writes it into the memory-mapped output. Runs inside the process pool.
+
+    PARAMETERS:
+    job (tuple) - (buffer path, byte offset of the pixels, (height, width), (x0, y0, x1, y1) of the tile, triangles, colors)
+
+    OUTPUT:
+    box (tuple) - the tile that was written
+    """
+    path, offset, shape, box, triangles, colors = job
+    x0, y0, x1, y1 = box
+    output = np.memmap(path, dtype=np.uint8, mode="r+", offset=offset, shape=shape + (3,))
+    output[y0:y1, x0:x1] = draw_tile(shape, box, triangles, colors)
+    output.flush()
+    del output
+    return box
+
+def render_shared_tile(job: tuple) -> tuple:
+    """
+    Draws one tile straight into a canvas in shared memory, so the pixels never have to be sent back. Runs inside the
+    process pool.
+
+    PARAMETERS:
+    job (tuple) - (name of the shared memory, (height, width), (x0, y0, x1, y1) of the tile, triangles, colors)
+
+    OUTPUT:
+    box (tuple) - the tile that was written
+    """
+    name, shape, box, triangles, colors = job
+    x0, y0, x1, y1 = box
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        canvas = np.ndarray(shape + (3,), dtype=np.uint8, buffer=memory.buf)
+        canvas[y0:y1, x0:x1] = draw_tile(shape, box, triangles, colors)
+        del canvas
+    finally:
+        memory.close()
+    return box
+
+def tiles(size: tuple, triangles: np.ndarray, colors: np.ndarray, tile_size: int):
+    """Yields (box, triangles, colors) of every tile, computing the triangles of a tile only when it is needed
+    """
+    width, height = size
+    offsets, order = tile_index(triangles, size, tile_size)
+    columns = -(-width // tile_size)
+    for tile in range(len(offsets) - 1):
+        row, column = divmod(tile, columns)
+        box = (column * tile_size, row * tile_size, min(width, (column + 1) * tile_size), min(height, (row + 1) * tile_size))
+        members = order[offsets[tile]:offsets[tile + 1]]
+        yield box, triangles[members], colors[members]
+
+def run_jobs(function, jobs, workers: Optional[int] = 1) -> None:
+    """
+    Runs function on every job, in this process if workers is 1 and otherwise across a process pool.
+
+    PARAMETERS:
+    function (callable) - render_tile or render_shared_tile
+    jobs (iterable) - the jobs, generated lazily
+    workers (integer) - number of processes, None for all cores
+    """
+    if workers == 1:
+        for job in jobs:
+            function(job)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map would submit every job at once and keep all of their triangles in memory, so keep a few in flight
+        pending = []
+        limit = 2 * (workers or os.cpu_count() or 1)
+        for job in jobs:
+            pending.append(pool.submit(function, job))
+            if len(pending) >= limit:
+                pending.pop(0).result()
+        for future in pending:
+            future.result()
+
+def render(triangles: np.ndarray, colors: np.ndarray, size: tuple, path: str, tile_size: int = TILE_SIZE, workers: Optional[int] = 1, npy: bool = False) -> np.memmap:
+    """
+    Draws the triangles tile by tile into a memory-mapped (height, width, 3) uint8 file. Only one tile per worker is
+    in memory at a time, the rest of the image lives on disk.
+
+    PARAMETERS:
+    triangles (np.ndarray) - (number of triangles, 6) array of [x1, y1, x2, y2, x3, y3] in output pixels
+    colors (np.ndarray) - (number of triangles, 3) uint8 array with the color of every triangle
+    size (tuple) - (width, height) of the output
+    path (string) - the file for the buffer, it is overwritten
+    tile_size (integer) - width and height of a tile
+    workers (integer) - processes drawing tiles at the same time, None for all cores, 1 draws in this process
+    npy (bool) - write a .npy file (np.load with mmap_mode="r" opens it) instead of raw pixels
+
+    OUTPUT:
+    buffer (np.memmap) - read-only view of the finished image
+    """
+    width, height = size
+    # Reserve the file without writing it, the tiles fill it in
+    if npy:
+        buffer = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=(height, width, 3))
+        offset = buffer.offset
+        del buffer
+    else:
+        offset = 0
+        with open(path, "wb") as file:
+            file.truncate(width * height * 3)
+
+    shape = (height, width)
+    jobs = ((path, offset, shape) + tile for tile in tiles(size, np.asarray(triangles, dtype=np.float64),
+                                                             np.asarray(colors, dtype=np.uint8), tile_size))
+    run_jobs(render_tile, jobs, workers)
+    return np.memmap(path, dtype=np.uint8, mode="r", offset=offset, shape=(height, width, 3))
+
+def draw(triangles: np.ndarray, colors: np.ndarray, size: tuple, workers: Optional[int] = None, tile_size: Optional[int] = None) -> Image:
+    """
+    Draws the triangles in parallel: the image is split into tiles and every worker draws its tiles straight into one
+    canvas in shared memory. Gives the same pixels as drawing every triangle on one canvas.
+
+    PARAMETERS:
+    triangles (np.ndarray) - (number of triangles, 6) array of [x1, y1, x2, y2, x3, y3] in output pixels
+    colors (np.ndarray) - (number of triangles, 3) uint8 array with the color of every triangle
+    size (tuple) - (width, height) of the output
+    workers (integer) - processes drawing tiles at the same time, None for all cores
+    tile_size (integer) - width and height of a tile, None picks one that gives every worker about 4 tiles
+
+    OUTPUT:
+    art (image) - the drawn image
+    """
+    width, height = size
+    if tile_size is None:
+        # Enough tiles to balance the load, but not so small that the margins get drawn over and over
+        tile_size = int(np.clip(np.sqrt(width * height / (4 * (workers or os.cpu_count() or 1))), 256, TILE_SIZE))
+
+    shape = (height, width)
+    memory = shared_memory.SharedMemory(create=True, size=max(1, width * height * 3))
+    try:
+        jobs = ((memory.name, shape) + tile for tile in tiles(size, np.asarray(triangles, dtype=np.float64),
+                                                               np.asarray(colors, dtype=np.uint8), tile_size))
+        run_jobs(render_shared_tile, jobs, workers)
+        # Every pixel belongs to a tile, so the canvas is complete. Copy it out before the shared memory is freed
+        art = Image.fromarray(np.ndarray(shape + (3,), dtype=np.uint8, buffer=memory.buf).copy())
+    finally:
+        memory.close()
+        memory.unlink()
+    return art
+
+def read_rows(pixels: np.ndarray, start: int, stop: int) -> np.ndarray:
+    """Copies rows out of an image. Rows of a memmap are read from its file, reading through the mapping would keep
+    every page that was touched resident until the mapping is closed
+    """
+    if isinstance(pixels, np.memmap) and pixels.filename and pixels.flags.c_contiguous:
+        row_bytes = pixels.shape[1] * pixels.shape[2]
+        rows = np.fromfile(pixels.filename, dtype=np.uint8, count=(stop - start) * row_bytes,
+                           offset=pixels.offset + start * row_bytes)
+        return rows.reshape((stop - start,) + pixels.shape[1:])
+    return np.ascontiguousarray(pixels[start:stop])
+
+def write_png(pixels: np.ndarray, path: str, compress_level: int = 6) -> None:
+    """
+    Writes an (height, width, 3) uint8 array as a PNG a few rows at a time, so a memory-mapped image never has to be
+    loaded whole. PIL needs the full image in memory to save it.
+
+    PARAMETERS:
+    pixels (np.ndarray) - the image, usually a memmap
+    path (string) - where to save it
+    compress_level (integer) - zlib level from 0 (fastest) to 9 (smallest)
+    """
+    height, width = pixels.shape[:2]
+
+    def chunk(file, kind: bytes, data: bytes) -> None:
+        file.write(struct.pack(">I", len(data)) + kind + data)
+        file.write(struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+    compressor = zlib.compressobj(compress_level)
+    with open(path, "wb") as file:
+        file.write(b"\x89PNG\r\n\x1a\n")
+        # 8 bits per channel, RGB, default compression, filtering and no interlacing
+        chunk(file, b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+        for start in range(0, height, PNG_ROWS):
+            rows = read_rows(pixels, start, min(height, start + PNG_ROWS)).reshape(-1, width * 3)
+            # Every row starts with its filter type, 0 is none
+            filtered = np.zeros((len(rows), width * 3 + 1), dtype=np.uint8)
+            filtered[:, 1:] = rows
+            data = compressor.compress(filtered.tobytes())
+            if data:
+                chunk(file, b"IDAT", data)
+        chunk(file, b"IDAT", compressor.flush())
+        chunk(file, b"IEND", b"")
+
+def write_tiff(pixels: np.ndarray, path: str, tile_size: int = 256) -> None:
+    """
+    Writes an (height, width, 3) uint8 array as a tiled, deflate-compressed TIFF. Needs the tifffile package.
+
+    PARAMETERS:
+    pixels (np.ndarray) - the image, usually a memmap
+    path (string) - where to save it
+    tile_size (integer) - width and height of the TIFF tiles, a multiple of 16
+    """
+    try:
+        import tifffile
+    except ImportError:
+        raise ImportError("Saving tiled TIFFs needs the tifffile package (pip install tifffile)") from None
+    # BigTIFF once the image gets near the 4 GB limit of a classic TIFF
+    tifffile.imwrite(path, pixels, tile=(tile_size, tile_size), photometric="rgb", compression="zlib",
+                     bigtiff=pixels.nbytes > 2 ** 31)
+
+def save(triangles: np.ndarray, colors: np.ndarray, size: tuple, path: str, tile_size: int = TILE_SIZE, workers: Optional[int] = 1, compress_level: int = 6) -> None:
+    """
+    Renders tile by tile and saves the result. .npy keeps the memory-mapped buffer as the output (np.load with
+    mmap_mode="r" opens it), .png and .tif/.tiff are streamed out of a temporary buffer next to the output.
+
+    PARAMETERS:
+    triangles (np.ndarray) - (number of triangles, 6) array of [x1, y1, x2, y2, x3, y3] in output pixels
+    colors (np.ndarray) - (number of triangles, 3) uint8 array with the color of every triangle
+    size (tuple) - (width, height) of the output
+    path (string) - where to save the image
+    tile_size (integer) - width and height of a tile
+    workers (integer) - processes drawing tiles at the same time, None for all cores
+    compress_level (integer) - zlib level of a PNG, from 0 (fastest) to 9 (smallest)
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in EXTENSIONS:
+        raise ValueError(f"Tiled rendering saves .png, .tif, .tiff or .npy, not {extension or 'no extension'}")
+
+    if extension == ".npy":
+        render(triangles, colors, size, path, tile_size, workers, npy=True)
+        return
+
+    buffer_path = path + ".part"
+    try:
+        pixels = render(triangles, colors, size, buffer_path, tile_size, workers)
+        if extension == ".png":
+            write_png(pixels, path, compress_level)
+        else:
+            write_tiff(pixels, path)
+        del pixels
+    finally:
+        if os.path.exists(buffer_path):
+            os.remove(buffer_path)
@@ -0,0 +1,195 @@
+# Vector export of the triangulation art (SVG and PDF), written a chunk of triangles at a time
+
+import gzip
+import os
+import zlib
+import numpy as np
+
+EXTENSIONS = (".svg", ".svgz", ".pdf")
+
+# Triangles per <path> element (or PDF fill), so no single string gets big
+CHUNK_TRIANGLES = 20000
+
+def numbers(values: np.ndarray, precision: int = 1) -> list:
+    """
+    Formats numbers rounded to precision decimals, without trailing zeros, so "12.0" is written as "12" and "-0" as "0".
+
+    PARAMETERS:
+    values (np.ndarray) - array of the numbers, any shape
+    precision (integer) - decimals kept
+
+    OUTPUT:
+    text (list) - one string per number, in the order of values.ravel()
+    """
+    # Whole part and decimals as integers, the decimals looked up as ".25"-like text that is "" for none
+    scale = 10 ** precision
+    scaled = np.rint(values.ravel() * scale).astype(np.int64)
+    magnitude = np.abs(scaled)
+    decimals = [("." + f"{fraction:0{precision}d}").rstrip("0").rstrip(".") for fraction in range(scale)]
+    signs = np.where(scaled < 0, "-", "")
+    return [f"{sign}{whole}{decimals[fraction]}" for sign, whole, fraction
+            in zip(signs.tolist(), (magnitude // scale).tolist(), (magnitude % scale).tolist())]
+
+def corners(points: np.ndarray, triangles: np.ndarray, relative: bool = False) -> np.ndarray:
+    """
+    Looks up the rounded corners of a chunk of triangles, so only the text of one chunk is ever made at a time.
+
+    PARAMETERS:
+    points (np.ndarray) - 2D array with the coordinates, already rounded
+    triangles (np.ndarray) - (number of triangles, 3) array of point indices
+    relative (boolean) - give the second and third corner as the step from the corner before, like SVG "l" does.
+                         The steps are taken between rounded points, so the corners add up to the same points
+
+    OUTPUT:
+    corners (np.ndarray) - (number of triangles, 6) array of x, y for every corner
+    """
+    values = points[triangles].reshape(-1, 6)
+    if relative:
+        values[:, 2:] -= points[triangles[:, :2]].reshape(-1, 4)
+    return values
+
+def color_groups(colors: np.ndarray, chunk: int = CHUNK_TRIANGLES):
+    """
+    Yields (color, triangle indices) with the triangles grouped by color, at most chunk triangles at a time. Colors
+    only have to be written once per group that way, and art with few colors gets very compact, which is why
+    Model.export_vector reduces the colors to a palette first.
+
+    PARAMETERS:
+    colors (np.ndarray) - (number of triangles, 3) uint8 array with the color of every triangle
+    chunk (integer) - the most triangles in one group
+    """
+    packed = colors.astype(np.int64) @ np.array([1 << 16, 1 << 8, 1])
+    order = np.argsort(packed, kind="stable")
+    sorted_colors = packed[order]
+    starts = np.flatnonzero(np.r_[True, sorted_colors[1:] != sorted_colors[:-1]])
+    ends = np.r_[starts[1:], len(order)]
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        color = colors[order[start]]
+        for first in range(start, end, chunk):
+            yield color, order[first:min(end, first + chunk)]
+
+def svg_chunks(points: np.ndarray, simplices: np.ndarray, colors: np.ndarray, size: tuple, precision: int = 1):
+    """
+    Generates an SVG document piece by piece. Every color gets one path of "M x y l dx dy dx dyz" subpaths, with a
+    stroke of the same color so anti-aliasing doesn't leave hairline gaps between the triangles. The steps between
+    corners are short, so they take fewer characters than the corners themselves.
+
+    PARAMETERS:
+    points (np.ndarray) - 2D array with the coordinates of the triangulation, in pixels
+    simplices (np.ndarray) - (number of triangles, 3) array of point indices
+    colors (np.ndarray) - (number of triangles, 3) uint8 array with the color of every triangle
+    size (tuple) - (width, height) of the art, the viewBox of the SVG
+    precision (integer) - decimals kept of every coordinate
+
+    OUTPUT:
+    chunks (generator) - strings that make up the SVG when written one after another
+    """
+    width, height = size
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" viewBox="0 0 {width} {height}">\n'
+           f'<rect width="{width}" height="{height}" fill="#fff"/>\n'
+           '<g stroke-width=".5" stroke-linejoin="round">\n')
+    # Only the rounded array is kept for every point, the text is made a chunk at a time
+    points = np.round(points, precision)
+    for color, members in color_groups(colors):
+        hex_color = "#%02x%02x%02x" % tuple(color.tolist())
+        text = numbers(corners(points, simplices[members], relative=True), precision)
+        subpaths = "".join(f"M{text[i]} {text[i + 1]}l{text[i + 2]} {text[i + 3]} {text[i + 4]} {text[i + 5]}z"
+                           for i in range(0, len(text), 6))
+        yield f'<path fill="{hex_color}" stroke="{hex_color}" d="{subpaths}"/>\n'
+    yield "</g>\n</svg>\n"
+
+def write_svg(path: str, points: np.ndarray, simplices: np.ndarray, colors: np.ndarray, size: tuple, precision: int = 1) -> None:
+    """
+    Saves the art as an SVG, or a gzipped SVG if the path ends in .svgz.
+
+    PARAMETERS:
+    path (string) - where to save it
+    points, simplices, colors, size, precision - see svg_chunks
+    """
+    opener = gzip.open if path.lower().endswith(".svgz") else open
+    with opener(path, "wt", encoding="utf-8") as file:
+        for chunk in svg_chunks(points, simplices, colors, size, precision):
+            file.write(chunk)
+
+def pdf_chunks(points: np.ndarray, simplices: np.ndarray, colors: np.ndarray, size: tuple, precision: int = 1):
+    """
+    Generates the page content of a PDF piece by piece: one fill color and one filled path per color group. The
+    y axis is flipped once at the start, since PDF counts from the bottom of the page.
+    """
+    width, height = size
+    yield f"1 0 0 -1 0 {height} cm\n1 1 1 rg 0 0 {width} {height} re f\n0.5 w 1 j\n"
+    points = np.round(points, precision)
+    for color, members in color_groups(colors):
+        rgb = " ".join(f"{channel / 255:.3g}" for channel in color.tolist())
+        text = numbers(corners(points, simplices[members]), precision)
+        subpaths = "".join(f"{text[i]} {text[i + 1]} m {text[i + 2]} {text[i + 3]} l {text[i + 4]} {text[i + 5]} l h\n"
+                           for i in range(0, len(text), 6))
+        # B fills and strokes, the stroke closes the anti-aliasing gaps like in the SVG
+        yield f"{rgb} rg {rgb} RG\n{subpaths}B\n"
+
+def write_pdf(path: str, points: np.ndarray, simplices: np.ndarray, colors: np.ndarray, size: tuple, precision: int = 1) -> None:
+    """
+    Saves the art as a single page PDF with a page the size of the art (one pixel is one point). The content stream
+    is compressed while it is written, so it is never held in memory.
+
+    PARAMETERS:
+    path (string) - where to save it
+    points, simplices, colors, size, precision - see svg_chunks
+    """
+    width, height = size
+    offsets = []
+    with open(path, "wb") as file:
+        def start_object() -> None:
+            offsets.append(file.tell())
+            file.write(f"{len(offsets)} 0 obj\n".encode())
+
+        file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        start_object()
+        file.write(b"<< /Type /Catalog /Pages 2 0 R >>\nendobj\n")
+        start_object()
+        file.write(b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>\nendobj\n")
+        start_object()
+        file.write(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width} {height}] /Contents 4 0 R >>\nendobj\n".encode())
+
+        # The length isn't known until the stream is written, so it is its own object after the stream
+        start_object()
+        file.write(b"<< /Length 5 0 R /Filter /FlateDecode >>\nstream\n")
+        compressor = zlib.compressobj()
+        length = 0
+        for chunk in pdf_chunks(points, simplices, colors, size, precision):
+            data = compressor.compress(chunk.encode())
+            file.write(data)
+            length += len(data)
+        data = compressor.flush()
+        file.write(data)
+        length += len(data)
+        file.write(b"\nendstream\nendobj\n")
+        start_object()
+        file.write(f"{length}\nendobj\n".encode())
+
+        xref = file.tell()
+        file.write(f"xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n".encode())
+        for offset in offsets:
+            file.write(f"{offset:010d} 00000 n \n".encode())
+        file.write(f"trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+
+def save(path: str, points: np.ndarray, simplices: np.ndarray, colors: np.ndarray, size: tuple, precision: int = 1) -> None:
+    """
+    Saves the art as .svg, .svgz or .pdf depending on the extension of the path.
+
+    PARAMETERS:
+    path (string) - where to save it
+    points (np.ndarray) - 2D array with the coordinates of the triangulation, in pixels
+    simplices (np.ndarray) - (number of triangles, 3) array of point indices
+    colors (np.ndarray) - (number of triangles, 3) uint8 array with the color of every triangle
+    size (tuple) - (width, height) of the art
+    precision (integer) - decimals kept of every coordinate
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".pdf":
+        write_pdf(path, points, simplices, colors, size, precision)
+    elif extension in (".svg", ".svgz"):
+        write_svg(path, points, simplices, colors, size, precision)
+    else:
+        raise ValueError(f"Vector export saves {', '.join(EXTENSIONS)}, not {extension or 'no extension'}")
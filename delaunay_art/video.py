@@ -0,0 +1,250 @@
+# Triangulation art for videos and frame sequences. The points and the mesh are kept from frame to frame, so the
+# art doesn't flicker and most frames only have to be recolored
+
+import argparse
+import os
+import time
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageSequence
+from typing import Optional
+
+from .model import Model, Distribution, Coloring
+
+FRAME_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".avi", ".mkv", ".webm", ".m4v")
+
+# Frames are compared at this size, small enough to be nearly free and big enough to notice a cut
+CHANGE_SIZE = (64, 64)
+
+# Mean absolute difference (0-255) from the frame the mesh was built on that makes a new mesh
+REMESH_THRESHOLD = 12.0
+
+def read_frames(path: str):
+    """
+    Yields the frames of a video, one RGB image at a time so the whole video is never in memory.
+
+    PARAMETERS:
+    path (string) - a directory of numbered images, a video file (needs the imageio package) or an animated
+                    GIF/PNG/WebP
+    """
+    if os.path.isdir(path):
+        names = sorted(name for name in os.listdir(path) if name.lower().endswith(FRAME_EXTENSIONS))
+        for name in names:
+            with Image.open(os.path.join(path, name)) as frame:
+                yield frame.convert("RGB")
+    elif path.lower().endswith(VIDEO_EXTENSIONS):
+        try:
+            import imageio.v3 as iio
+        except ImportError:
+            raise ImportError("Reading video files needs the imageio package (pip install imageio[ffmpeg])") from None
+        for pixels in iio.imiter(path):
+            yield Image.fromarray(pixels).convert("RGB")
+    else:
+        with Image.open(path) as animation:
+            for frame in ImageSequence.Iterator(animation):
+                yield frame.convert("RGB")
+
+def thumbnail(frame: Image) -> np.ndarray:
+    """Small grayscale copy of a frame for change detection
+    """
+    return np.asarray(frame.convert("L").resize(CHANGE_SIZE, Image.BILINEAR), dtype=np.float32)
+
+def mesh_frames(frames, num_points: int, distribution: Distribution, seed: int = 0, threshold: float = REMESH_THRESHOLD, model: Optional[Model] = None):
+    """
+    Pairs every frame with a mesh. The mesh is only rebuilt when the frame differs enough from the frame it was built
+    on (or changes size). It is rebuilt with the same seed, so image independent distributions keep their points and
+    the others only move the points the image moved.
+
+    PARAMETERS:
+    frames (iterable) - RGB images, see read_frames
+    num_points (integer) - the number of points in the pointset
+    distribution (Distribution) - how the points are placed
+    seed (integer) - seed for the point generation
+    threshold (float) - mean absolute difference (0-255) of the thumbnails that rebuilds the mesh
+    model (Model) - the model that generates and triangulates the points
+
+    OUTPUT:
+    frames (generator) - (frame, points, triangulation, rebuilt) for every frame
+    """
+    model = model or Model()
+    key = points_size = points = triangulation = None
+    for frame in frames:
+        small = thumbnail(frame)
+        rebuilt = key is None or points_size != frame.size or np.abs(small - key).mean() > threshold
+        if rebuilt:
+            key, points_size = small, frame.size
+            points = model.generate_points(frame, num_points, distribution, seed)
+            triangulation = model.del_triangulation(points)
+        yield frame, points, triangulation, rebuilt
+
+def render_frame(job: tuple) -> tuple:
+    """
+    Colors and draws one frame, and saves it if it has a path. Runs inside the process pool.
+
+    PARAMETERS:
+    job (tuple) - (frame index, frame pixels, points, triangulation, coloring, output path or None)
+
+    OUTPUT:
+    (index, art pixels or None if it was saved, seconds) - the art only comes back if the caller writes it
+    """
+    index, pixels, points, triangulation, coloring, path = job
+    start = time.perf_counter()
+    art = Model().draw_triangulation(Image.fromarray(pixels), triangulation, points, coloring)
+    if path:
+        art.save(path)
+        return index, None, time.perf_counter() - start
+    return index, np.asarray(art), time.perf_counter() - start
+
+class FrameWriter:
+    """Writes the art of every frame in order: numbered images in a directory, or a video file through imageio
+    """
+
+    # Instance vars
+    output: str
+    video: bool
+    frames: int
+
+    def __init__(self, output: str, fps: float = 30.0, extension: str = ".png") -> None:
+        """
+        PARAMETERS:
+        output (string) - a directory for the frames, or a video file if it ends in a video extension
+        fps (float) - frame rate of a video file
+        extension (string) - image format of the frames in a directory
+        """
+        self.output = output
+        self.video = output.lower().endswith(VIDEO_EXTENSIONS)
+        self.extension = extension
+        self.frames = 0
+        self._writer = None
+        if self.video:
+            try:
+                import imageio
+            except ImportError:
+                raise ImportError("Writing video files needs the imageio package (pip install imageio[ffmpeg])") from None
+            self._writer = imageio.get_writer(output, fps=fps)
+        else:
+            os.makedirs(output, exist_ok=True)
+
+    # Methods:
+    def path(self, index: int) -> Optional[str]:
+        """Where a worker saves frame index itself, None if the frame has to come back to be written here
+        """
+        return None if self.video else os.path.join(self.output, f"frame_{index:06d}{self.extension}")
+
+    def write(self, pixels: Optional[np.ndarray]) -> None:
+        """Takes the next frame in order, pixels is None if the worker already saved it
+        """
+        if pixels is not None:
+            self._writer.append_data(pixels)
+        self.frames += 1
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+def render_video(source: str, output: str, num_points: int, distribution: Distribution, coloring: Coloring = Coloring.VERTEX,
+                 seed: int = 0, threshold: float = REMESH_THRESHOLD, workers: Optional[int] = None, fps: float = 30.0,
+                 quiet: bool = False) -> dict:
+    """
+    Streams a video through the pipeline: frames are read lazily, meshed (reusing the mesh while the picture stays
+    similar), recolored and drawn across a process pool and written out in order. Only a few frames per worker are in
+    flight at once.
+
+    PARAMETERS:
+    source (string) - the frames, see read_frames
+    output (string) - a directory for numbered PNG frames or a video file, see FrameWriter
+    num_points (integer) - the number of points in the pointset
+    distribution (Distribution) - how the points are placed
+    coloring (Coloring) - how the triangles are colored
+    seed (integer) - seed for the point generation
+    threshold (float) - how much a frame has to change to rebuild the mesh, see mesh_frames
+    workers (integer) - processes drawing frames, None for all cores, 1 draws in this process
+    fps (float) - frame rate of a video file
+    quiet (bool) - don't print every frame
+
+    OUTPUT:
+    stats (dict) - "frames", "meshes" (how many times the mesh was built), "seconds", "fps", "mesh_seconds" (reading
+                   and meshing the frames) and "draw_seconds" (coloring, drawing and saving, summed over the workers)
+    """
+    writer = FrameWriter(output, fps)
+    stats = {"frames": 0, "meshes": 0, "mesh_seconds": 0.0, "draw_seconds": 0.0}
+
+    def finish(result: tuple) -> None:
+        index, pixels, seconds = result
+        writer.write(pixels)
+        stats["draw_seconds"] += seconds
+        if not quiet:
+            print(f"frame {index}: {seconds * 1000:.0f} ms")
+
+    def jobs():
+        # Reading and meshing happen lazily inside next(), so they are timed around it
+        meshed = mesh_frames(read_frames(source), num_points, distribution, seed, threshold)
+        while True:
+            start = time.perf_counter()
+            try:
+                frame, points, triangulation, rebuilt = next(meshed)
+            except StopIteration:
+                return
+            stats["mesh_seconds"] += time.perf_counter() - start
+            stats["meshes"] += rebuilt
+            index = stats["frames"]
+            stats["frames"] += 1
+            yield index, np.asarray(frame), points, triangulation, coloring, writer.path(index)
+
+    start = time.perf_counter()
+    try:
+        if workers == 1:
+            for job in jobs():
+                finish(render_frame(job))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                # Futures finish in any order but are collected first in first out, so frames are written in order
+                pending = deque()
+                limit = 2 * (workers or os.cpu_count() or 1)
+                for job in jobs():
+                    pending.append(pool.submit(render_frame, job))
+                    if len(pending) >= limit:
+                        finish(pending.popleft().result())
+                while pending:
+                    finish(pending.popleft().result())
+    finally:
+        writer.close()
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["fps"] = stats["frames"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+def parse_args(argv: Optional[list] = None) -> argparse.Namespace:
+    """
+    Reads the command line options for rendering a video.
+    """
+    parser = argparse.ArgumentParser(description="Render Delaunay triangulation art for every frame of a video.")
+    parser.add_argument("source", help="directory of frames, video file (needs imageio) or animated GIF/PNG/WebP")
+    parser.add_argument("output", help="directory for the numbered frames, or a video file (needs imageio)")
+    parser.add_argument("-n", "--points", type=int, default=5000, help="number of points")
+    parser.add_argument("-d", "--distribution", default="random", choices=[d.name.lower() for d in Distribution])
+    parser.add_argument("-c", "--coloring", default="vertex", choices=[c.name.lower() for c in Coloring])
+    parser.add_argument("-s", "--seed", type=int, default=0, help="seed for the point generation")
+    parser.add_argument("-t", "--threshold", type=float, default=REMESH_THRESHOLD,
+                        help="mean change (0-255) from the frame of the current mesh that builds a new mesh")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of processes (default: all cores)")
+    parser.add_argument("--fps", type=float, default=30.0, help="frame rate of a video output")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print the summary")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[list] = None) -> None:
+    """Renders a video from the command line, argv defaults to sys.argv[1:]
+    """
+    args = parse_args(argv)
+    stats = render_video(args.source, args.output, args.points, Distribution[args.distribution.upper()],
+                         Coloring[args.coloring.upper()], args.seed, args.threshold, args.workers, args.fps, args.quiet)
+    frames = stats["frames"] or 1
+    print(f"Rendered {stats['frames']} frames in {stats['seconds']:.2f}s ({stats['fps']:.2f} frames/sec), "
+          f"built the mesh {stats['meshes']} times")
+    print(f"  read + mesh  avg {stats['mesh_seconds'] / frames * 1000:8.1f}ms")
+    print(f"  draw + save  avg {stats['draw_seconds'] / frames * 1000:8.1f}ms (per worker)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+# Shared fixtures: a Model and a small copy of the packaged image, so every test runs in a fraction of a second
+
+import pytest
+from delaunay_art import Model, STARRY_NIGHT
+
+@pytest.fixture
+def model() -> Model:
+    return Model()
+
+@pytest.fixture
+def image(model: Model):
+    return model.open_image(STARRY_NIGHT, (300, 240))
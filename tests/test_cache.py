@@ -0,0 +1,55 @@
+# create_art reuses the mesh and the art of seeded runs, and the caches stay within their entries and bytes
+
+import numpy as np
+from delaunay_art import Coloring, Distribution, Instrument, LRUCache, Model
+
+def counters(model: Model, name: str) -> tuple:
+    stats = model.cache_stats()[name]
+    return stats["hits"], stats["misses"]
+
+def test_create_art_hits_and_misses(model, image):
+    art, _, points = model.create_art(image, 200, Distribution.RANDOM, seed=1)
+    assert counters(model, "triangulations") == (0, 1)
+    assert counters(model, "art") == (0, 1)
+
+    # The same run again is all hits and gives the same art
+    with Instrument() as run:
+        again, _, same_points = model.create_art(image, 200, Distribution.RANDOM, seed=1, instrument=run)
+    assert counters(model, "triangulations") == (1, 1)
+    assert counters(model, "art") == (1, 1)
+    assert np.array_equal(np.asarray(again), np.asarray(art))
+    assert np.array_equal(same_points, points)
+    assert [record["stage"] for record in run.stages if record.get("cached")] == ["generate", "triangulate", "draw"]
+
+    # Another coloring reuses the mesh but draws again
+    model.create_art(image, 200, Distribution.RANDOM, Coloring.MEAN, seed=1)
+    assert counters(model, "triangulations") == (2, 1)
+    assert counters(model, "art") == (1, 2)
+
+    # Another seed misses both
+    model.create_art(image, 200, Distribution.RANDOM, seed=2)
+    assert counters(model, "triangulations") == (2, 2)
+    assert counters(model, "art") == (1, 3)
+
+def test_unseeded_runs_are_not_cached(model, image):
+    model.create_art(image, 200, Distribution.RANDOM)
+    model.create_art(image, 200, Distribution.RANDOM)
+    assert counters(model, "triangulations") == (0, 0)
+    assert len(model.triangulation_cache) == 0
+    assert len(model.art_cache) == 0
+
+def test_byte_budget(image):
+    # Room for one 300x240 render, not two
+    model = Model(art_cache_bytes=300 * 240 * 3)
+    model.create_art(image, 200, Distribution.RANDOM, seed=1)
+    model.create_art(image, 200, Distribution.RANDOM, seed=2)
+    assert len(model.art_cache) == 1
+    assert model.cache_stats()["art"]["bytes"] <= 300 * 240 * 3
+
+    # Too big for the budget at all, so not stored
+    cache = LRUCache(8, maxbytes=10, sizeof=len)
+    cache.put("small", b"12345")
+    cache.put("big", b"12345678901")
+    assert cache.get("big") is None and cache.get("small") == b"12345"
+    cache.put("other", b"123456")
+    assert cache.get("small") is None and len(cache) == 1
@@ -0,0 +1,44 @@
+# Drawing tile by tile, on disk or across processes, has to give the same pixels as drawing everything at once
+
+import numpy as np
+import pytest
+from PIL import Image
+from delaunay_art import Coloring, Distribution, tiled
+
+@pytest.fixture
+def mesh(model, image) -> tuple:
+    points = model.generate_points(image, 300, Distribution.RANDOM, seed=1)
+    return model.del_triangulation(points), points
+
+def test_tiled_render_matches_full_draw(model, image, mesh, tmp_path):
+    triangulation, points = mesh
+    full = np.asarray(model.draw_triangulation(image, triangulation, points))
+    colors = model.mesh_colors(image, triangulation, points)
+
+    # Tiles smaller than the image, so triangles cross tile borders
+    buffer = tiled.render(points[triangulation.simplices].reshape(-1, 6), colors, image.size,
+                          str(tmp_path / "art.npy"), tile_size=64, npy=True)
+    assert np.array_equal(np.load(tmp_path / "art.npy"), full)
+    assert np.array_equal(buffer, full)
+
+@pytest.mark.parametrize("extension", [".png", ".npy"])
+def test_render_tiled_file(model, image, mesh, tmp_path, extension):
+    triangulation, points = mesh
+    path = str(tmp_path / ("art" + extension))
+    model.render_tiled(image, triangulation, points, path, tile_size=64)
+    saved = np.load(path) if extension == ".npy" else np.asarray(Image.open(path).convert("RGB"))
+    assert np.array_equal(saved, np.asarray(model.draw_triangulation(image, triangulation, points)))
+
+def test_parallel_draw_matches_full_draw(model, image, mesh):
+    triangulation, points = mesh
+    colors = model.mesh_colors(image, triangulation, points)
+    drawn = tiled.draw(points[triangulation.simplices].reshape(-1, 6), colors, image.size, workers=2, tile_size=64)
+    assert np.array_equal(np.asarray(drawn), np.asarray(model.draw_triangulation(image, triangulation, points)))
+
+@pytest.mark.parametrize("coloring", [Coloring.VERTEX, Coloring.MEAN])
+@pytest.mark.parametrize("palette", [None, 16])
+def test_draw_workers(model, image, mesh, coloring, palette):
+    triangulation, points = mesh
+    full = model.draw_triangulation(image, triangulation, points, coloring, palette=palette)
+    parallel = model.draw_triangulation(image, triangulation, points, coloring, workers=2, palette=palette)
+    assert np.array_equal(np.asarray(parallel), np.asarray(full))
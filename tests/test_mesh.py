@@ -0,0 +1,56 @@
+# Incremental edits of a Mesh have to end up with the same triangles as triangulating the points from scratch
+
+import numpy as np
+import pytest
+from delaunay_art import Coloring, Distribution, Mesh
+
+def triangles(simplices: np.ndarray) -> set:
+    return {tuple(sorted(triangle)) for triangle in simplices.tolist()}
+
+@pytest.mark.parametrize("coloring", [Coloring.VERTEX, Coloring.MEAN, Coloring.GOURAUD])
+def test_edits_match_scipy(model, image, coloring):
+    points = model.generate_points(image, 200, Distribution.RANDOM, seed=1)
+    triangulation = model.del_triangulation(points)
+    art = model.draw_triangulation(image, triangulation, points, coloring)
+    mesh = model.start_editing(image, triangulation, points, art, coloring, track_errors=True)
+
+    rng = np.random.default_rng(0)
+    for _ in range(300):
+        point = rng.random(2) * image.size
+        if rng.random() < 0.7:
+            mesh.add_point(point)
+        else:
+            mesh.remove_point(mesh.nearest_point(point))
+
+    assert triangles(mesh.simplices) == triangles(model.del_triangulation(mesh.points).simplices)
+    # The neighbors patched around every edit are the ones a full rebuild finds
+    assert (mesh.neighbors == Mesh._neighbors(mesh.simplices)).all()
+    # Every point is used, and the triangle kept for it has it as a corner
+    assert len(np.unique(mesh.simplices)) == len(mesh.points)
+    assert all(index in mesh.simplices[triangle] for index, triangle in enumerate(mesh.point_triangles.tolist()))
+    errors, counts, _ = mesh.triangle_errors(np.arange(len(mesh.simplices)))
+    assert np.allclose(errors, mesh.errors)
+    assert (counts == mesh.pixel_counts).all()
+
+def test_rejected_edits(model, image):
+    points = model.generate_points(image, 50, Distribution.RANDOM, seed=1)
+    triangulation = model.del_triangulation(points)
+    mesh = model.start_editing(image, triangulation, points, model.draw_triangulation(image, triangulation, points))
+
+    # Outside the art, on another point and on the border nothing changes
+    assert mesh.add_point((-5, 10)).size == 0
+    assert mesh.add_point(tuple(mesh.points[10])).size == 0
+    assert mesh.remove_point(int(triangulation.convex_hull[0, 0])).size == 0
+    assert len(mesh.points) == len(points)
+
+@pytest.mark.parametrize("num_points", [0, 1, 150])
+def test_refine_adds_every_point(model, image, num_points):
+    mesh = model.refine_points(image, num_points)
+    # The four corners it starts from plus one point per insertion
+    assert len(mesh.points) == num_points + 4
+    assert triangles(mesh.simplices) == triangles(model.del_triangulation(mesh.points).simplices)
+
+def test_refine_stops_at_target(model, image):
+    full = model.refine_points(image, 300)
+    stopped = model.refine_points(image, 300, target_psnr=17.0)
+    assert 4 < len(stopped.points) < len(full.points)
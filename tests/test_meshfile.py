@@ -0,0 +1,71 @@
+# A saved mesh has to load back as the same mesh and draw the same art without triangulating again
+
+import re
+import numpy as np
+import pytest
+from delaunay_art import Coloring, Distribution, meshfile
+
+@pytest.fixture
+def saved(model, image, tmp_path) -> tuple:
+    points = model.generate_points(image, 300, Distribution.RANDOM, seed=1)
+    triangulation = model.del_triangulation(points)
+    path = str(tmp_path / "art.dmesh")
+    model.save_mesh(image, triangulation, points, path, Coloring.MEAN, params={"seed": 1})
+    return triangulation, points, path
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_load_round_trip(model, image, saved, mmap):
+    triangulation, points, path = saved
+    mesh = model.load_mesh(path, mmap)
+    assert mesh.size == image.size
+    assert mesh.params == {"seed": 1, "coloring": "MEAN", "points": len(points)}
+    assert np.array_equal(mesh.simplices, triangulation.simplices)
+    assert np.array_equal(mesh.colors, model.mesh_colors(image, triangulation, points, Coloring.MEAN))
+    # Stored as float32 between 0 and 1, so a few thousandths of a pixel off at most
+    assert np.abs(mesh.pixel_points() - points).max() < 1e-3
+
+def test_render_matches_draw(model, image, tmp_path):
+    points = model.generate_points(image, 300, Distribution.RANDOM, seed=2)
+    triangulation = model.del_triangulation(points)
+    path = str(tmp_path / "vertex.dmesh")
+    model.save_mesh(image, triangulation, points, path)
+    mesh = model.load_mesh(path)
+    drawn = np.asarray(model.render_mesh(mesh))
+    assert np.array_equal(drawn, np.asarray(model.draw_triangulation(image, triangulation, points)))
+    # Drawn at another size, the art scales with it
+    assert model.render_mesh(mesh, (600, 480)).size == (600, 480)
+
+def test_export_round_trip(model, saved, tmp_path):
+    _, _, path = saved
+    mesh = model.load_mesh(path)
+    copy = str(tmp_path / "copy.dmesh")
+    meshfile.export(mesh, copy)
+    loaded = model.load_mesh(copy)
+    assert np.array_equal(loaded.points, mesh.points)
+    assert np.array_equal(loaded.simplices, mesh.simplices)
+    assert np.array_equal(loaded.colors, mesh.colors)
+
+    # Every triangle is written to the SVG, with at most the palette's colors
+    svg = str(tmp_path / "art.svg")
+    meshfile.export(mesh, svg, palette=16)
+    text = open(svg).read()
+    assert text.count("M") == len(mesh)
+    assert len(set(re.findall(r'<path fill="(#[0-9a-f]{6})"', text))) <= 16
+
+def test_bad_files(tmp_path, saved):
+    _, _, path = saved
+    not_mesh = tmp_path / "not.dmesh"
+    not_mesh.write_bytes(b"not a mesh")
+    with pytest.raises(ValueError):
+        meshfile.load(str(not_mesh))
+    with open(path, "rb") as file:
+        (tmp_path / "cut.dmesh").write_bytes(file.read()[:-10])
+    with pytest.raises(ValueError):
+        meshfile.load(str(tmp_path / "cut.dmesh"))
+
+    # The command line reports them as usage errors instead of tracebacks
+    with pytest.raises(SystemExit) as exit:
+        meshfile.main([str(not_mesh), str(tmp_path / "out.png")])
+    assert exit.value.code == 2
+    with pytest.raises(SystemExit):
+        meshfile.main([path, str(tmp_path / "out.xyz")])
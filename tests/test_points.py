@@ -0,0 +1,23 @@
+# Every distribution gives exactly the points asked for, inside the image and the same for the same seed
+
+import numpy as np
+import pytest
+from delaunay_art import Distribution
+
+@pytest.mark.parametrize("distribution", list(Distribution))
+@pytest.mark.parametrize("num_points", [0, 1, 7, 500])
+def test_exact_count(model, image, distribution, num_points):
+    points = model.generate_points(image, num_points, distribution, seed=1)
+    # Plus the four corners
+    assert points.shape == (num_points + 4, 2)
+    assert (points >= 0).all() and (points < image.size).all()
+    assert np.array_equal(points, model.generate_points(image, num_points, distribution, seed=1))
+
+def test_poisson_disk(model):
+    assert model.poisson_disk((300, 240), 0).shape == (0, 2)
+    points = model.poisson_disk((300, 240), 400, np.random.RandomState(1))
+    assert points.shape == (400, 2)
+    # 400 random points in that area come within a pixel of each other, blue noise keeps them about 10 apart
+    distances = np.linalg.norm(points[:, None] - points[None], axis=2)
+    np.fill_diagonal(distances, np.inf)
+    assert distances.min() > 5